@@ -0,0 +1,231 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque, OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Optional, Any, Deque
+
+from pdf_backend import page_count
+
+# Admission control for parse requests. A parse holds decoded pages in memory
+# roughly in proportion to pages x bytes, so each request is costed that way
+# (in page-megabytes) before it starts. Parses run while their summed cost
+# fits CAPACITY; the rest wait in per-client FIFO queues served round-robin,
+# so one client's burst cannot starve the others. When the queued cost would
+# exceed QUEUE_CAPACITY, a client already has CLIENT_QUEUE requests (or
+# CLIENT_SHARE of the queue) waiting, or a request waited MAX_WAIT seconds, it
+# is rejected with a Retry-After estimate instead of piling onto a node that
+# is out of memory. Clients are told apart by peer address: a header the
+# client sets itself would let it open a fresh queue per request.
+
+CAPACITY = float(os.environ.get('ADMISSION_CAPACITY', '2000'))
+QUEUE_CAPACITY = float(os.environ.get('ADMISSION_QUEUE', '8000'))
+CLIENT_QUEUE = int(os.environ.get('ADMISSION_CLIENT_QUEUE', '4'))
+# Fraction of QUEUE_CAPACITY one client may fill, leaving room for the others
+CLIENT_SHARE = 0.5
+MAX_WAIT = float(os.environ.get('ADMISSION_MAX_WAIT', '120'))
+# Page size assumed when the page count cannot be read
+AVG_PAGE_BYTES = 64 * 1024
+# Recent admissions kept for the wait-time percentiles
+WAIT_SAMPLES = 1000
+
+
+def document_cost(file_path: str, size: Optional[int] = None) -> float:
+    """Estimated parse cost of a PDF in page-megabytes (pages x bytes / 1 MiB)."""
+    size = os.path.getsize(file_path) if size is None else size
+    try:
+        pages = page_count(file_path)
+    except Exception:
+        pages = None
+    if not pages:
+        pages = max(1, size // AVG_PAGE_BYTES)
+    return max(1.0, pages * size / (1024 * 1024))
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("client", "cost", "enqueued_at", "granted", "notify")
+
+    def __init__(self, client: str, cost: float, notify):
+        self.client = client
+        self.cost = cost
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.notify = notify
+
+
+class AdmissionController:
+    def __init__(self, capacity: float = CAPACITY, queue_capacity: float = QUEUE_CAPACITY,
+                 client_queue: int = CLIENT_QUEUE, max_wait: float = MAX_WAIT):
+        self.capacity = capacity
+        self.queue_capacity = queue_capacity
+        self.client_queue = client_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        # client -> waiting tickets; order of the dict is the round-robin order
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._queued_cost = 0.0
+        self._running_cost = 0.0
+        self._running = 0
+        # Smoothed seconds of parsing per unit of cost, for Retry-After
+        self._seconds_per_cost: Optional[float] = None
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._counts = {"admitted": 0, "rejected_full": 0, "rejected_client": 0, "timed_out": 0, "abandoned": 0}
+
+    def _fits(self, cost: float) -> bool:
+        # A document costlier than the whole capacity still runs, alone
+        return self._running == 0 or self._running_cost + cost <= self.capacity
+
+    def _retry_after(self) -> int:
+        # Parses drain about capacity / seconds_per_cost cost units per second
+        rate = self._seconds_per_cost if self._seconds_per_cost is not None else 0.01
+        backlog = self._queued_cost + self._running_cost
+        return min(300, max(1, math.ceil(backlog * rate / self.capacity)))
+
+    def _start(self, ticket: _Ticket):
+        ticket.granted = True
+        self._running += 1
+        self._running_cost += ticket.cost
+        self._counts["admitted"] += 1
+        self._waits.append(time.monotonic() - ticket.enqueued_at)
+
+    def _dispatch(self):
+        """Grants waiting tickets round-robin over clients while they fit (lock held)."""
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            # Strict order: a large head waits for room rather than being overtaken forever
+            if not self._fits(ticket.cost):
+                return
+            queue.popleft()
+            self._queued_cost -= ticket.cost
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            self._start(ticket)
+            ticket.notify()
+
+    def _enqueue(self, client: str, cost: float, notify) -> _Ticket:
+        # Anything costlier than the capacity runs alone; counting it at the
+        # capacity keeps it from never fitting the queue
+        cost = min(cost, self.capacity)
+        with self._lock:
+            ticket = _Ticket(client, cost, notify)
+            if not self._queues and self._fits(cost):
+                self._start(ticket)
+                return ticket
+            queue = self._queues.get(client)
+            if queue is not None and (len(queue) >= self.client_queue or
+                                      sum(t.cost for t in queue) + cost > self.queue_capacity * CLIENT_SHARE):
+                self._counts["rejected_client"] += 1
+                raise Rejected("Too many parse requests queued for this client", self._retry_after())
+            if self._queued_cost + cost > self.queue_capacity:
+                self._counts["rejected_full"] += 1
+                raise Rejected("Parse queue is full", self._retry_after())
+            if queue is None:
+                queue = self._queues[client] = deque()
+            queue.append(ticket)
+            self._queued_cost += cost
+            return ticket
+
+    def _abandon(self, ticket: _Ticket, outcome: str) -> bool:
+        """Removes a ticket that stopped waiting; False when it was granted meanwhile."""
+        with self._lock:
+            if ticket.granted:
+                return False
+            queue = self._queues.get(ticket.client)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                self._queued_cost -= ticket.cost
+                if not queue:
+                    del self._queues[ticket.client]
+            self._counts[outcome] += 1
+            # The head of the queue may have been this ticket
+            self._dispatch()
+            return True
+
+    def _release(self, ticket: _Ticket, elapsed: Optional[float]):
+        with self._lock:
+            self._running -= 1
+            self._running_cost -= ticket.cost
+            if elapsed is not None:
+                per_cost = elapsed / ticket.cost
+                if self._seconds_per_cost is None:
+                    self._seconds_per_cost = per_cost
+                else:
+                    self._seconds_per_cost = 0.8 * self._seconds_per_cost + 0.2 * per_cost
+            self._dispatch()
+
+    def _timeout(self) -> Rejected:
+        with self._lock:
+            return Rejected("Timed out waiting for a parse slot", self._retry_after())
+
+    @contextmanager
+    def admit(self, client: str, cost: float):
+        """Blocks until the parse may start (threaded servers); raises Rejected."""
+        event = threading.Event()
+        ticket = self._enqueue(client, cost, event.set)
+        if not ticket.granted and not event.wait(self.max_wait) and self._abandon(ticket, "timed_out"):
+            raise self._timeout()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(ticket, time.monotonic() - start)
+
+    @asynccontextmanager
+    async def admit_async(self, client: str, cost: float):
+        """Awaits until the parse may start (event loop servers); raises Rejected."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket = self._enqueue(client, cost, notify)
+        if not ticket.granted:
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), self.max_wait)
+            except asyncio.TimeoutError:
+                if self._abandon(ticket, "timed_out"):
+                    raise self._timeout()
+            except asyncio.CancelledError:
+                # Client went away; give the slot back if it was granted meanwhile
+                if not self._abandon(ticket, "abandoned"):
+                    self._release(ticket, None)
+                raise
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(ticket, time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            pct = lambda p: round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1) if waits else 0.0
+            return {
+                **self._counts,
+                "running": self._running,
+                "running_cost": round(self._running_cost, 1),
+                "queued": sum(len(q) for q in self._queues.values()),
+                "queued_cost": round(self._queued_cost, 1),
+                "queued_clients": len(self._queues),
+                "capacity": self.capacity,
+                "queue_capacity": self.queue_capacity,
+                "wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": pct(1.0)},
+            }
+
+
+def client_key(address: Optional[str]) -> str:
+    """Fairness key of a request: its peer address."""
+    return address or 'unknown'
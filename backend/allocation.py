@@ -0,0 +1,191 @@
+import time
+from typing import List, Dict, Any, Optional, Tuple, Set
+
+# Allocates the quantities of a whole RFQ across vendors. Every item has a
+# list of scored vendor matches (see matcher.match_item); stock is shared by
+# all items drawing on the same vendor product, and the RFQ may cap the number
+# of distinct vendors ("up to two (2) vendors", RFQParser's vendors_to_select).
+#
+# The objective is the quantity-weighted match score of each item, averaged
+# over items, so an unfilled unit is worth nothing and an item matters the
+# same however large it is. For a fixed vendor set, quantities are filled
+# greedily by value per unit; the vendor set is grown greedily by estimated
+# marginal gain and then improved by swaps until the time budget runs out.
+
+DEFAULT_TIME_BUDGET = 0.2
+# Vendors re-evaluated exactly per step, out of those with the best estimated gain
+EXACT_EVALUATIONS = 8
+
+
+class Problem:
+    def __init__(self, demands: List[int], candidates: List[List[Dict[str, Any]]]):
+        self.demands = [max(0, int(q)) for q in demands]
+        self.vendor_ids: List[Any] = []
+        self.stock: List[float] = []
+        vendor_idx: Dict[Any, int] = {}
+        stock_idx: Dict[Tuple[Any, Any], int] = {}
+
+        # pairs: (value per unit, item, vendor, stock, score, match record)
+        self.pairs: List[Tuple[float, int, int, int, float, Dict[str, Any]]] = []
+        self.by_vendor: Dict[int, List[int]] = {}
+        for i, matches in enumerate(candidates):
+            if not self.demands[i]:
+                continue
+            for m in matches:
+                vid = m.get('vendor_id')
+                v = vendor_idx.get(vid)
+                if v is None:
+                    v = vendor_idx[vid] = len(self.vendor_ids)
+                    self.vendor_ids.append(vid)
+                # Stock belongs to the vendor product when the catalogue names one
+                skey = (vid, m.get('product'))
+                s = stock_idx.get(skey)
+                if s is None:
+                    s = stock_idx[skey] = len(self.stock)
+                    self.stock.append(float(m.get('availableQty', 0) or 0))
+                self.pairs.append((m['score'] / self.demands[i], i, v, s, m['score'], m))
+        self.pairs.sort(key=lambda p: -p[0])
+        for n, (_, _, v, _, _, _) in enumerate(self.pairs):
+            self.by_vendor.setdefault(v, []).append(n)
+
+    def fill(self, selected: Optional[Set[int]]) -> Tuple[float, List[float], List[Tuple[int, int, float]]]:
+        """Greedy fill restricted to `selected` vendors (all when None): (objective, item values, assignments)."""
+        remaining = list(self.stock)
+        open_qty = [float(q) for q in self.demands]
+        values = [0.0] * len(self.demands)
+        assignments = []
+        if selected is None:
+            order = range(len(self.pairs))
+        else:
+            # Only the pairs of the selected vendors, still in value order
+            order = sorted(n for v in selected for n in self.by_vendor.get(v, ()))
+        for n in order:
+            _, i, v, s, score, _ = self.pairs[n]
+            q = min(open_qty[i], remaining[s])
+            if q <= 0:
+                continue
+            open_qty[i] -= q
+            remaining[s] -= q
+            values[i] += score * q
+            assignments.append((n, i, q))
+        return self.objective(values), values, assignments
+
+    def objective(self, values: List[float]) -> float:
+        items = [(val, q) for val, q in zip(values, self.demands) if q]
+        return sum(val / q for val, q in items) / len(items) if items else 0.0
+
+    def estimate_gain(self, v: int, values: List[float]) -> float:
+        """Upper-bound-ish gain of adding vendor v on top of the current item values."""
+        used: Dict[int, float] = {}
+        gain = 0.0
+        for n in self.by_vendor.get(v, ()):
+            _, i, _, s, score, _ = self.pairs[n]
+            q = min(self.demands[i], self.stock[s] - used.get(s, 0.0))
+            if q <= 0:
+                continue
+            delta = (score * q - values[i]) / self.demands[i]
+            if delta > 0:
+                gain += delta
+                used[s] = used.get(s, 0.0) + q
+        return gain
+
+
+def _best_additions(problem: Problem, selected: Set[int], values: List[float], exclude: Set[int],
+                    limit: Optional[int] = EXACT_EVALUATIONS) -> List[int]:
+    estimates = [
+        (problem.estimate_gain(v, values), v)
+        for v in range(len(problem.vendor_ids))
+        if v not in selected and v not in exclude
+    ]
+    estimates.sort(key=lambda e: (-e[0], e[1]))
+    return [v for gain, v in estimates[:limit] if gain > 0]
+
+
+def solve(problem: Problem, max_vendors: Optional[int] = None,
+          time_budget: float = DEFAULT_TIME_BUDGET) -> Tuple[Optional[Set[int]], Dict[str, Any]]:
+    """Vendor set (None = unrestricted) and solver stats."""
+    deadline = time.perf_counter() + time_budget
+    stats = {"evaluations": 0, "swaps": 0, "timed_out": False}
+
+    if max_vendors is None or max_vendors >= len(problem.vendor_ids):
+        stats["evaluations"] = 1
+        return None, stats
+
+    # Greedy construction
+    selected: Set[int] = set()
+    best, values, _ = problem.fill(selected)
+    while len(selected) < max_vendors and time.perf_counter() < deadline:
+        step = None
+        for v in _best_additions(problem, selected, values, set()):
+            obj, vals, _ = problem.fill(selected | {v})
+            stats["evaluations"] += 1
+            if obj > best + 1e-12 and (step is None or obj > step[0]):
+                step = (obj, v, vals)
+        if step is None:
+            break
+        best, values = step[0], step[2]
+        selected.add(step[1])
+    stats["greedy_objective"] = round(best, 4)
+
+    # Local search: replace one selected vendor while it improves the objective;
+    # every replacement is tried, most promising first, until the deadline
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for out in sorted(selected):
+            rest = selected - {out}
+            _, rest_values, _ = problem.fill(rest)
+            for v in _best_additions(problem, rest, rest_values, {out}, limit=None):
+                if time.perf_counter() >= deadline:
+                    break
+                obj, vals, _ = problem.fill(rest | {v})
+                stats["evaluations"] += 1
+                if obj > best + 1e-12:
+                    best, values, selected = obj, vals, rest | {v}
+                    stats["swaps"] += 1
+                    improved = True
+                    break
+            if improved or time.perf_counter() >= deadline:
+                break
+    stats["timed_out"] = time.perf_counter() >= deadline
+    return selected, stats
+
+
+def allocate(demands: List[int], candidates: List[List[Dict[str, Any]]], max_vendors: Optional[int] = None,
+             time_budget: float = DEFAULT_TIME_BUDGET) -> Dict[str, Any]:
+    """
+    Quantities per item and vendor for a whole RFQ. `candidates[i]` are the
+    scored matches of item i with `demands[i]` units wanted.
+    """
+    start = time.perf_counter()
+    problem = Problem(demands, candidates)
+    selected, stats = solve(problem, max_vendors, time_budget)
+    objective, values, assignments = problem.fill(selected)
+
+    per_item: List[List[Dict[str, Any]]] = [[] for _ in demands]
+    for n, i, q in assignments:
+        match = problem.pairs[n][5]
+        per_item[i].append({**match, "allocatedQty": int(q) if float(q).is_integer() else q})
+
+    used = sorted({problem.vendor_ids[problem.pairs[n][2]] for n, _, _ in assignments}, key=str)
+    total = sum(problem.demands)
+    filled = sum(q for _, _, q in assignments)
+    stats.update(
+        objective=round(objective, 4),
+        vendors_used=len(used),
+        fill_rate=round(filled / total, 4) if total else 1.0,
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 1),
+        candidate_vendors=len(problem.vendor_ids),
+    )
+    return {
+        "items": [
+            {
+                "allocations": per_item[i],
+                "unfilled": problem.demands[i] - sum(a["allocatedQty"] for a in per_item[i]),
+                "score": round(values[i] / problem.demands[i], 2) if problem.demands[i] else None,
+            }
+            for i in range(len(demands))
+        ],
+        "vendors": used,
+        "solver": stats,
+    }
@@ -0,0 +1,112 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from page_cache import PageCache, file_hash
+from pdf_backend import page_fingerprints
+
+# Amended RFQ versions ("Amendment No. 1") usually reissue the whole PDF with
+# a few pages changed. Pages are matched to the previous version by
+# fingerprint, their cached extraction is copied to the new document hash and
+# only the changed pages are decoded again; the parsed result is then diffed
+# against the previous one so only new or changed line items are re-matched.
+
+# Line-item fields that identify an item across versions; the item number is
+# left out because inserting an item renumbers everything after it
+ITEM_IDENTITY = ('inn_name', 'dosage', 'form')
+ITEM_IGNORED = {'line_item_id'}
+
+
+def match_pages(previous: List[str], current: List[str]) -> Dict[int, int]:
+    """New page number -> previous page number for every page whose fingerprint is unchanged."""
+    unused: Dict[str, List[int]] = {}
+    for number, fingerprint in enumerate(previous, start=1):
+        unused.setdefault(fingerprint, []).append(number)
+    page_map = {}
+    for number, fingerprint in enumerate(current, start=1):
+        candidates = unused.get(fingerprint)
+        if candidates:
+            # Prefer the same position, otherwise the first unused occurrence
+            old = number if number in candidates else candidates[0]
+            candidates.remove(old)
+            page_map[number] = old
+    return page_map
+
+
+def prepare_amendment(cache: PageCache, file_path: str, previous_hash: str,
+                      doc_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Seeds the page cache of `file_path` with the unchanged pages of the
+    previously parsed `previous_hash`, so parsing it decodes only the changed
+    pages. Returns the new document hash and which pages changed.
+    """
+    doc_hash = doc_hash or file_hash(file_path)
+    current = page_fingerprints(file_path)
+    cache.store_fingerprints(doc_hash, current)
+    previous = cache.fingerprints(previous_hash)
+
+    page_map = match_pages(previous, current) if previous else {}
+    if doc_hash != previous_hash and page_map:
+        cache.seed(doc_hash, previous_hash, page_map, len(current), source_path=file_path)
+    return {
+        "document_hash": doc_hash,
+        "previous_hash": previous_hash,
+        "pages_total": len(current),
+        "pages_reused": len(page_map),
+        "changed_pages": [n for n in range(1, len(current) + 1) if n not in page_map],
+        # Without stored fingerprints the previous version cannot be compared page by page
+        "previous_known": previous is not None,
+    }
+
+
+def diff_fields(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Top-level keys added, removed and changed between two dicts."""
+    old, new = old or {}, new or {}
+    return {
+        "added": {k: new[k] for k in new if k not in old},
+        "removed": {k: old[k] for k in old if k not in new},
+        "changed": {k: {"old": old[k], "new": new[k]} for k in new if k in old and old[k] != new[k]},
+    }
+
+
+def _norm(value: Any) -> str:
+    return re.sub(r'\s+', ' ', str(value or '')).strip().lower()
+
+
+def _keyed(items: List[Dict[str, Any]]) -> Dict[Tuple, Dict[str, Any]]:
+    # Repeated identities (same product requested twice) are told apart by occurrence
+    keyed, seen = {}, {}
+    for item in items:
+        identity = tuple(_norm(item.get(f)) for f in ITEM_IDENTITY)
+        seen[identity] = seen.get(identity, 0) + 1
+        keyed[identity + (seen[identity],)] = item
+    return keyed
+
+
+def diff_line_items(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Line items added, removed and changed (same identity, other fields such as
+    quantity differ), plus the count of unchanged ones. Changed entries list
+    the differing fields.
+    """
+    old_keyed, new_keyed = _keyed(old or []), _keyed(new or [])
+    added = [item for key, item in new_keyed.items() if key not in old_keyed]
+    removed = [item for key, item in old_keyed.items() if key not in new_keyed]
+    changed, unchanged = [], 0
+    for key, item in new_keyed.items():
+        previous = old_keyed.get(key)
+        if previous is None:
+            continue
+        fields = sorted(
+            f for f in set(item) | set(previous)
+            if f not in ITEM_IGNORED and item.get(f) != previous.get(f)
+        )
+        if fields:
+            changed.append({"old": previous, "new": item, "fields": fields})
+        else:
+            unchanged += 1
+    return {"added": added, "removed": removed, "changed": changed, "unchanged": unchanged}
+
+
+def items_to_rematch(line_item_diff: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """New versions of the items whose vendor matches may differ: added and changed ones."""
+    return line_item_diff["added"] + [c["new"] for c in line_item_diff["changed"]]
@@ -0,0 +1,297 @@
+"""
+Bulk-parse a directory or manifest of RFQ PDFs without going through the API.
+
+    python batch_parse.py archive/ --output archive.jsonl --workers 8
+    python batch_parse.py --manifest manifest.txt --output archive.parquet
+
+Inputs are PDF files, directories (searched recursively) and manifests (one
+path per line, or JSONL objects with a "path" key). Finished documents are
+appended to <output>.checkpoint, so re-running the same command after an
+interruption resumes where it stopped. Parquet output is written as part files
+under the output directory, one per --batch-size documents.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable
+
+from page_cache import PageCache, DEFAULT_CACHE_PATH
+from memory_guard import exclusive_process
+from serialization import dumps
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RFQ_PARSER_DIR = os.path.join(BASE_DIR, '..', 'meow', 'backend')
+
+# Recycle workers periodically; pdfplumber holds on to decoded page objects
+MAX_TASKS_PER_WORKER = 50
+PROGRESS_EVERY = 25
+
+_worker_cache: Optional[PageCache] = None
+_worker_pipelines: Tuple[str, ...] = ()
+_worker_memory: Dict[str, Any] = {}
+
+
+def iter_inputs(paths: List[str], manifest: Optional[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith('.pdf'):
+                        yield os.path.abspath(os.path.join(root, name))
+        else:
+            yield os.path.abspath(path)
+
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                path = json.loads(line)['path'] if line.startswith('{') else line
+                yield os.path.abspath(os.path.join(base, path))
+
+
+def load_checkpoint(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def _init_worker(cache_path: Optional[str], pipelines: Tuple[str, ...], memory: Dict[str, Any]):
+    global _worker_cache, _worker_pipelines, _worker_memory
+    _worker_cache = PageCache(cache_path) if cache_path else None
+    _worker_pipelines = pipelines
+    _worker_memory = memory
+    exclusive_process()
+    if 'rfq' in pipelines and RFQ_PARSER_DIR not in sys.path:
+        sys.path.append(RFQ_PARSER_DIR)
+
+
+def _record(path: str) -> Dict[str, Any]:
+    return {"path": path, "bytes": 0, "pages": 0, "errors": {}}
+
+
+def parse_document(path: str) -> Dict[str, Any]:
+    record = _record(path)
+    start = time.perf_counter()
+    try:
+        record["bytes"] = os.path.getsize(path)
+    except OSError as e:
+        record["errors"]["input"] = str(e)
+        return record
+
+    # Both pipelines consume the same decoded pages: one decode per backend
+    from pdf_backend import run_pipeline
+    consumers, parser = [], None
+    if 'tables' in _worker_pipelines:
+        from line_items import table_consumer
+        consumers.append(table_consumer())
+    if 'rfq' in _worker_pipelines:
+        from rfq_parser import RFQParser
+        parser = RFQParser()
+        consumers.append(parser.consumer())
+    try:
+        outputs = run_pipeline(path, consumers, cache=_worker_cache, raise_errors=False, **_worker_memory)
+    except Exception as e:
+        for c in consumers:
+            record["errors"][c.name] = str(e)
+        outputs = {}
+
+    for _, _, report in outputs.values():
+        record["memory"] = report["memory"]
+
+    if 'tables' in outputs:
+        items, _, report = outputs['tables']
+        if report["backend"] is None:
+            record["errors"]["tables"] = report["error"]
+        else:
+            record["line_items"] = items
+            record["extraction"] = report
+            record["pages"] = max(record["pages"], sum(report["pages"].get(report["backend"], {}).values()))
+
+    if 'rfq' in outputs:
+        report = outputs['rfq'][2]
+        if report["backend"] is None:
+            record["errors"]["rfq"] = report["error"]
+        else:
+            record["rfq"] = parser.from_pipeline(outputs['rfq'])
+            record["pages"] = max(record["pages"], sum(report["pages"].get(report["backend"], {}).values()))
+
+    record["elapsed"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def parse_all(paths: List[str], workers: int, initargs: Tuple,
+              parse: Callable[[str], Dict[str, Any]] = parse_document) -> Iterator[Dict[str, Any]]:
+    """
+    Records of `paths` in completion order. A worker that dies (OOM-killed)
+    breaks the pool and fails every document it had in flight; those are
+    retried one per fresh pool, the one killing its worker again is recorded
+    as failed, and parsing continues on a new pool.
+    """
+    pending = deque(paths)
+    suspects: deque = deque()
+    while pending or suspects:
+        if suspects:
+            path = suspects.popleft()
+            with ProcessPoolExecutor(1, initializer=_init_worker, initargs=initargs) as pool:
+                try:
+                    record = pool.submit(parse, path).result()
+                except BrokenProcessPool:
+                    record = _record(path)
+                    record["errors"]["worker"] = "Worker process died while parsing (killed, e.g. out of memory)"
+            yield record
+            continue
+
+        in_flight = {}
+        broken = False
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs,
+                                 max_tasks_per_child=MAX_TASKS_PER_WORKER) as pool:
+            while (pending or in_flight) and not broken:
+                while pending and len(in_flight) < workers:
+                    path = pending.popleft()
+                    in_flight[pool.submit(parse, path)] = path
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        continue
+                    del in_flight[future]
+                    yield record
+        suspects.extend(in_flight.values())
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.f = open(path, 'a', encoding='utf-8')
+
+    def write(self, record: Dict[str, Any]) -> List[str]:
+        self.f.write(dumps(record).decode('utf-8') + "\n")
+        self.f.flush()
+        return [record["path"]]
+
+    def close(self) -> List[str]:
+        self.f.close()
+        return []
+
+
+class ParquetSink:
+    """Buffers records and writes one part file per batch; nested fields are stored as JSON."""
+
+    def __init__(self, directory: str, batch_size: int):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.directory = directory
+        self.batch_size = batch_size
+        self.rows: List[Dict[str, Any]] = []
+        os.makedirs(directory, exist_ok=True)
+        self.part = len([n for n in os.listdir(directory) if n.endswith('.parquet')])
+
+    def write(self, record: Dict[str, Any]) -> List[str]:
+        extraction = record.get("extraction") or (record.get("rfq") or {}).get("extraction") or {}
+        self.rows.append({
+            "path": record["path"],
+            "bytes": record["bytes"],
+            "pages": record["pages"],
+            "elapsed": record.get("elapsed"),
+            "backend": extraction.get("backend"),
+            "line_item_count": len(record.get("line_items") or []),
+            "peak_memory_mb": (record.get("memory") or {}).get("peak_delta_mb"),
+            "line_items": dumps(record.get("line_items")).decode('utf-8'),
+            "rfq": dumps(record.get("rfq")).decode('utf-8'),
+            "errors": dumps(record["errors"]).decode('utf-8'),
+        })
+        return self.flush() if len(self.rows) >= self.batch_size else []
+
+    def flush(self) -> List[str]:
+        if not self.rows:
+            return []
+        table = self.pa.Table.from_pylist(self.rows)
+        self.pq.write_table(table, os.path.join(self.directory, f"part-{self.part:05d}.parquet"), compression='zstd')
+        self.part += 1
+        done = [row["path"] for row in self.rows]
+        self.rows = []
+        return done
+
+    def close(self) -> List[str]:
+        return self.flush()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('inputs', nargs='*', help='PDF files or directories')
+    ap.add_argument('--manifest', help='file listing PDF paths (plain lines or JSONL with "path")')
+    ap.add_argument('--output', required=True, help='.jsonl file, or .parquet directory of part files')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--pipeline', choices=['tables', 'rfq', 'both'], default='both',
+                    help='tables = FastAPI line items, rfq = RFQParser document')
+    ap.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='page cache database')
+    ap.add_argument('--no-cache', action='store_true', help='do not read or populate the page cache')
+    ap.add_argument('--batch-size', type=int, default=500, help='documents per Parquet part file')
+    ap.add_argument('--low-memory', action='store_true', default=None,
+                    help='release every page once extracted (default: PARSE_LOW_MEMORY)')
+    ap.add_argument('--memory-limit-mb', type=float,
+                    help='fail documents whose parse grows past this (default: PARSE_MEMORY_LIMIT_MB)')
+    args = ap.parse_args(argv)
+
+    if not args.inputs and not args.manifest:
+        ap.error("give at least one input path or --manifest")
+
+    pipelines = ('tables', 'rfq') if args.pipeline == 'both' else (args.pipeline,)
+    checkpoint_path = args.output.rstrip('/') + '.checkpoint'
+    done = load_checkpoint(checkpoint_path)
+    todo = [p for p in dict.fromkeys(iter_inputs(args.inputs, args.manifest)) if p not in done]
+    print(f"{len(todo)} documents to parse, {len(done)} already done", file=sys.stderr)
+
+    if args.output.endswith('.parquet'):
+        sink = ParquetSink(args.output, args.batch_size)
+    else:
+        sink = JsonlSink(args.output)
+
+    start = time.perf_counter()
+    count = pages = size = failed = 0
+
+    def progress():
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        print(f"{count}/{len(todo)} docs, {failed} failed | {count / elapsed:.2f} docs/s, "
+              f"{pages / elapsed:.1f} pages/s, {size / elapsed / 1e6:.2f} MB/s", file=sys.stderr)
+
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        def mark(paths: List[str]):
+            for p in paths:
+                checkpoint.write(p + "\n")
+            checkpoint.flush()
+
+        try:
+            initargs = (None if args.no_cache else args.cache, pipelines,
+                        {"low_memory": args.low_memory, "memory_limit_mb": args.memory_limit_mb})
+            for record in parse_all(todo, args.workers, initargs):
+                count += 1
+                pages += record["pages"]
+                size += record["bytes"]
+                failed += bool(record["errors"])
+                mark(sink.write(record))
+                if count % PROGRESS_EVERY == 0:
+                    progress()
+        finally:
+            mark(sink.close())
+
+    progress()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Benchmark NameIndex.search against the brute-force scan it replaces.
+
+    python bench_name_index.py                      # synthetic catalogue
+    python bench_name_index.py --index data/master_index.json --queries rfq.json
+
+Queries default to the line items of the parsed RFQs under ../logs. Reports
+recall@k of the indexed search relative to brute force and per-query latency.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+from typing import List, Dict, Any
+
+from name_index import NameIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGS_DIR = os.path.join(BASE_DIR, '..', 'logs')
+
+FORMS = ['tablet', 'tab', 'capsule', 'injection', 'inj', 'oral suspension', 'syrup', 'vial', 'cream', 'amp']
+STRENGTHS = ['5 mg', '10 mg', '100 mg', '500 mg', '200 mg/5 ml', '1 g', '40 mg/ml']
+
+
+def load_queries(path: str = None) -> List[str]:
+    files = [path] if path else glob.glob(os.path.join(LOGS_DIR, '*.json'))
+    names = []
+    for f in files:
+        with open(f, 'r', encoding='utf-8') as fh:
+            doc = json.load(fh)
+        data = doc.get('data', doc)
+        for item in data.get('line_items') or data.get('lineitems') or []:
+            if item.get('inn_name'):
+                names.append(item['inn_name'])
+    return list(dict.fromkeys(names))
+
+
+def mutate(name: str, rng: random.Random) -> str:
+    """Catalogue-style variant of an INN name: other form/strength, casing, a typo."""
+    words = name.split()[:3]
+    if rng.random() < 0.3 and len(words[0]) > 4:
+        i = rng.randrange(1, len(words[0]) - 1)
+        words[0] = words[0][:i] + words[0][i + 1:]
+    parts = [' '.join(words), rng.choice(STRENGTHS), rng.choice(FORMS)]
+    return ' '.join(parts).upper() if rng.random() < 0.2 else ' '.join(parts)
+
+
+def synthetic_vendors(names: List[str], count: int, per_vendor: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    vocab = names + [f"Compound {i}" for i in range(2000)]
+    return [
+        {
+            'vendor_id': f'V{i:05d}',
+            'legal_name': f'Vendor {i}',
+            'primary_categories': ['Pharmaceuticals'],
+            'products': [mutate(rng.choice(vocab), rng) for _ in range(per_vendor)],
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, queries: List[str], k: int):
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(fn(q, k=k))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    return results, {"p50_ms": round(pct(0.5), 3), "p95_ms": round(pct(0.95), 3), "max_ms": round(latencies[-1] * 1000, 3)}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--index', help='master_index.json with vendor "products"')
+    ap.add_argument('--queries', help='parsed RFQ JSON to take item names from')
+    ap.add_argument('--vendors', type=int, default=2000)
+    ap.add_argument('--products', type=int, default=40, help='products per synthetic vendor')
+    ap.add_argument('-k', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    queries = load_queries(args.queries)
+    if not queries:
+        print("No query names found", file=sys.stderr)
+        return 1
+
+    if args.index:
+        with open(args.index, 'r', encoding='utf-8') as f:
+            vendors = json.load(f).get('vendors', [])
+    else:
+        vendors = synthetic_vendors(queries, args.vendors, args.products)
+
+    start = time.perf_counter()
+    index = NameIndex.build(vendors)
+    build_s = time.perf_counter() - start
+
+    indexed, indexed_lat = timed(index.search, queries, args.k)
+    brute, brute_lat = timed(index.search_brute_force, queries, args.k)
+
+    found = expected = 0
+    for got, want in zip(indexed, brute):
+        want_ids = {v for _, v, _ in want}
+        expected += len(want_ids)
+        found += len(want_ids & {v for _, v, _ in got})
+
+    print(json.dumps({
+        "entries": len(index),
+        "queries": len(queries),
+        "build_s": round(build_s, 3),
+        "recall_at_k": round(found / expected, 4) if expected else 1.0,
+        "indexed": indexed_lat,
+        "brute_force": brute_lat,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Benchmark response and storage encoding of parse and match payloads.
+
+    python bench_serialization.py                       # line items from ../logs
+    python bench_serialization.py --pdf rfq.pdf --vendors 2000
+
+Compares the encoding the endpoints used before (FastAPI's jsonable_encoder +
+json.dumps, Flask's jsonify and the indented extracted_data/ dump) with
+serialization.py, and reports each as a share of the request: the warm-cache
+parse of --pdf for /api/parse, matching against synthetic vendors for
+/api/match-all.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+from typing import List, Dict, Any, Callable, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from serialization import FastJSONResponse, dumps, write_json, orjson
+from bench_name_index import load_queries, synthetic_vendors
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGS_DIR = os.path.join(BASE_DIR, '..', 'logs')
+
+
+def load_items(path: str = None) -> List[Dict[str, Any]]:
+    files = [path] if path else [os.path.join(LOGS_DIR, f) for f in sorted(os.listdir(LOGS_DIR)) if f.endswith('.json')]
+    for f in files:
+        with open(f, 'r', encoding='utf-8') as fh:
+            doc = json.load(fh)
+        data = doc.get('data', doc)
+        items = data.get('line_items') or data.get('lineitems')
+        if items:
+            return items
+    return []
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    """Fastest of `repeat` runs in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def flask_jsonify(payload: Dict[str, Any]) -> bytes:
+    # Flask's default provider: json.dumps with sort_keys, then the response body
+    return json.dumps(payload, sort_keys=True, ensure_ascii=True, default=str).encode('utf-8')
+
+
+def write_indented(path: str, payload: Dict[str, Any]):
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+
+
+def encoders(tmp: str) -> Dict[str, Dict[str, Callable[[Dict[str, Any]], Any]]]:
+    return {
+        "before": {
+            "fastapi_response": lambda p: JSONResponse(jsonable_encoder(p)).body,
+            "flask_jsonify": flask_jsonify,
+            "store_indented": lambda p: write_indented(os.path.join(tmp, 'indented.json'), p),
+        },
+        "after": {
+            "fastapi_response": lambda p: FastJSONResponse(p).body,
+            "flask_jsonify": lambda p: dumps(p),
+            "store_compact": lambda p: write_json(os.path.join(tmp, 'compact.json'), p),
+            "store_gzip": lambda p: write_json(os.path.join(tmp, 'compact.json.gz'), p),
+        },
+    }
+
+
+def run(payload: Dict[str, Any], work_ms: float, tmp: str, repeat: int) -> Dict[str, Any]:
+    result = {"payload_bytes": len(dumps(payload)), "work_ms": round(work_ms, 2)}
+    for phase, fns in encoders(tmp).items():
+        timings = {}
+        for key, fn in fns.items():
+            ms = best_of(lambda: fn(payload), repeat)
+            timings[key] = {"ms": round(ms, 2), "share": round(ms / (work_ms + ms), 3) if work_ms else None}
+        result[phase] = timings
+    result["stored_bytes"] = {
+        f: os.path.getsize(os.path.join(tmp, f)) for f in ('indented.json', 'compact.json', 'compact.json.gz')
+    }
+    return result
+
+
+def parse_payload(args) -> Tuple[Dict[str, Any], float]:
+    if not args.pdf:
+        items = load_items(args.items)
+        return {"document_id": "bench", "data": {"line_items": items}}, 0.0
+
+    from main import parse_pdf_file
+    from page_cache import PageCache
+    cache = PageCache(os.path.join(args.tmp, 'page_cache.sqlite3'))
+    parse_pdf_file(args.pdf, cache=cache)
+    report, stats = {}, {}
+    start = time.perf_counter()
+    items = parse_pdf_file(args.pdf, stats=stats, report=report, cache=cache)
+    work_ms = (time.perf_counter() - start) * 1000
+    payload = {"document_id": "bench", "data": {"line_items": items}, "page_filter": stats, "extraction": report}
+    return payload, work_ms
+
+
+def match_payload(items: List[Dict[str, Any]], args) -> Tuple[Dict[str, Any], float]:
+    from matcher import match_item
+    from name_index import NameIndex
+
+    names = [item.get('inn_name') for item in items if item.get('inn_name')] or load_queries()
+    vendors = synthetic_vendors(names, args.vendors, args.products)
+    index = NameIndex.build(vendors)
+    start = time.perf_counter()
+    results = []
+    for item in items:
+        matches = match_item(item, vendors, [], limit=args.top_k, name_index=index)
+        results.append({
+            "medicine": item.get('inn_name') or 'Unknown',
+            "quantity": item.get('quantity', 1),
+            "top_vendor": matches[0] if matches else None,
+            "other_vendors": matches[1:],
+        })
+    work_ms = (time.perf_counter() - start) * 1000
+    return {"matches": results}, work_ms
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--pdf', help='RFQ PDF to parse for the /api/parse payload')
+    ap.add_argument('--items', help='parsed RFQ JSON to take line items from (without --pdf)')
+    ap.add_argument('--vendors', type=int, default=2000)
+    ap.add_argument('--products', type=int, default=40, help='products per synthetic vendor')
+    ap.add_argument('--top-k', type=int, default=20)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.tmp = tmp
+        parse, parse_ms = parse_payload(args)
+        items = parse["data"]["line_items"]
+        if not items:
+            print("No line items found", file=sys.stderr)
+            return 1
+        match, match_ms = match_payload(items, args)
+
+        print(json.dumps({
+            "encoder": "orjson" if orjson is not None else "json",
+            "items": len(items),
+            "parse": run(parse, parse_ms, tmp, args.repeat),
+            "match_all": run(match, match_ms, tmp, args.repeat),
+        }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
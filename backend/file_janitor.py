@@ -0,0 +1,241 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Any
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MANIFEST_PATH = os.environ.get('FILE_MANIFEST_PATH', os.path.join(BASE_DIR, 'data', 'file_manifest.sqlite3'))
+
+# Expiry of uploaded PDFs and extracted JSON. Every stored file is recorded in
+# an on-disk manifest with its expiry time; the expiry index makes the manifest
+# a persistent min-heap, so one periodic sweep pops the expired files in
+# batches instead of a sleeping task per upload, and a restart loses nothing.
+# When the tracked files exceed the disk cap, the ones expiring soonest go
+# first. Both services share the manifest, so the cap covers their files together.
+# Files being parsed are leased and skipped by both until released.
+# Every server process (gunicorn workers, the Flask reloader, both services)
+# starts a janitor, but only the one holding the manifest's lock file sweeps;
+# the others retry the lock on every interval and take over if it exits.
+# With a page cache attached, each sweep also prunes the cached page contents
+# of documents (page_cache.PageCache.prune), which outlive their uploads.
+
+SWEEP_INTERVAL = int(os.environ.get('JANITOR_INTERVAL', '60'))
+MAX_BYTES = int(os.environ.get('JANITOR_MAX_BYTES', str(2 * 1024 ** 3)))
+# Files deleted per manifest transaction
+BATCH_SIZE = 500
+# Longest a lease protects a file, in case its holder died without releasing it
+LEASE_TTL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    added_at REAL NOT NULL,
+    leased_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS files_expiry ON files (expires_at);
+"""
+
+# Manifests created before leases lack the column
+MIGRATIONS = {
+    "leased_until": "ALTER TABLE files ADD COLUMN leased_until REAL NOT NULL DEFAULT 0",
+}
+
+
+class FileJanitor:
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH, max_bytes: int = MAX_BYTES,
+                 batch_size: int = BATCH_SIZE, page_cache=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.page_cache = page_cache
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        self.last_sweep: Dict[str, Any] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(files)").fetchall()}
+            if columns:
+                for column, ddl in MIGRATIONS.items():
+                    if column not in columns:
+                        conn.execute(ddl)
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def track(self, file_path: str, ttl: float):
+        """Records a stored file to be deleted `ttl` seconds from now (re-tracking extends it)."""
+        file_path = os.path.abspath(file_path)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, expires_at, added_at) VALUES (?, ?, ?, ?)",
+                (file_path, os.path.getsize(file_path), now + ttl, now)
+            )
+
+    def lease(self, file_path: str, ttl: float = LEASE_TTL):
+        """Protects a tracked file from expiry and eviction while it is in use (e.g. being parsed)."""
+        with self._connect() as conn:
+            conn.execute("UPDATE files SET leased_until = ? WHERE path = ?",
+                         (time.time() + ttl, os.path.abspath(file_path)))
+
+    def release(self, file_path: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE files SET leased_until = 0 WHERE path = ?", (os.path.abspath(file_path),))
+
+    @contextmanager
+    def leased(self, file_path: str, ttl: float = LEASE_TTL):
+        self.lease(file_path, ttl)
+        try:
+            yield
+        finally:
+            self.release(file_path)
+
+    def forget(self, file_path: str):
+        """Drops a file from the manifest, e.g. after the service deleted it itself."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(file_path),))
+
+    def adopt(self, directory: str, ttl: float) -> int:
+        """
+        Tracks files under `directory` (including sharded subdirectories) the
+        manifest does not know yet (stored before it existed or by another
+        writer), expiring `ttl` after their modification time. Returns the
+        number adopted.
+        """
+        directory = os.path.abspath(directory)
+        manifest = os.path.abspath(self.path)
+        rows = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if path.startswith(manifest):
+                    continue
+                stat = os.stat(path)
+                rows.append((path, stat.st_size, stat.st_mtime + ttl, stat.st_mtime))
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO files (path, size, expires_at, added_at) VALUES (?, ?, ?, ?)", rows
+            )
+            return conn.total_changes - before
+
+    def _delete(self, conn: sqlite3.Connection, paths: List[str]) -> int:
+        """Deletes files and their manifest rows; returns the rows removed (files already gone included)."""
+        removed = 0
+        for p in paths:
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Still in use or not ours to delete; retried on the next sweep
+                continue
+            conn.execute("DELETE FROM files WHERE path = ?", (p,))
+            removed += 1
+        return removed
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Deletes expired files, then the soonest-expiring ones while over the disk cap; leased files stay."""
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        stats = {"expired": 0, "evicted": 0}
+        with self._connect() as conn:
+            # Keyset paging on (expires_at, path): rows that could not be
+            # deleted are stepped over instead of being read again
+            after = (float('-inf'), '')
+            while True:
+                rows = conn.execute(
+                    "SELECT path, expires_at FROM files WHERE expires_at <= ? AND leased_until <= ? "
+                    "AND (expires_at, path) > (?, ?) ORDER BY expires_at, path LIMIT ?",
+                    (now, now) + after + (self.batch_size,)
+                ).fetchall()
+                if not rows:
+                    break
+                stats["expired"] += self._delete(conn, [r[0] for r in rows])
+                conn.commit()
+                after = (rows[-1][1], rows[-1][0])
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+            after = (float('-inf'), '')
+            while total > self.max_bytes:
+                rows = conn.execute(
+                    "SELECT path, size, expires_at FROM files WHERE leased_until <= ? "
+                    "AND (expires_at, path) > (?, ?) ORDER BY expires_at, path LIMIT ?",
+                    (now,) + after + (self.batch_size,)
+                ).fetchall()
+                if not rows:
+                    break
+                victims, freed = [], 0
+                for p, size, _ in rows:
+                    if total - freed <= self.max_bytes:
+                        break
+                    victims.append(p)
+                    freed += size
+                stats["evicted"] += self._delete(conn, victims)
+                conn.commit()
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+                last = rows[len(victims) - 1]
+                after = (last[2], last[0])
+            stats.update(
+                tracked=conn.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+                tracked_bytes=total,
+            )
+        if self.page_cache is not None:
+            stats["page_cache"] = self.page_cache.prune(now)
+        stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.last_sweep = stats
+        return stats
+
+    def leader(self) -> bool:
+        """Whether this process sweeps: True once it holds the manifest's lock file (always without fcntl)."""
+        if self._lock_file is not None or fcntl is None:
+            return True
+        lock_file = open(f"{self.path}.lock", 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            if not self.leader():
+                continue
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"File janitor sweep failed: {e}")
+
+    def start(self, interval: float = SWEEP_INTERVAL):
+        """Sweeps once now if this process is the leader, then every `interval` seconds on a daemon thread."""
+        if self._thread is not None:
+            return
+        if self.leader():
+            self.sweep()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="file-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._lock_file is not None:
+            # Another process's janitor takes over on its next interval
+            self._lock_file.close()
+            self._lock_file = None
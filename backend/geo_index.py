@@ -0,0 +1,196 @@
+import math
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple
+
+# Spatial pre-filter for vendor matching. Vendors with coordinates
+# (`latitude`/`longitude`, same fields as the hospitals table) are bucketed in
+# a fixed-degree grid and serve everything within `service_radius_km` of their
+# location; vendors without coordinates are bucketed by `countries_served`.
+# A delivery point only visits the grid cells within the largest service
+# radius, so the candidate set does not grow with the catalogue.
+
+GRID_DEGREES = 1.0
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.2
+DEFAULT_SERVICE_RADIUS_KM = 300.0
+# "Local vendors only": vendor located within this distance of the delivery point
+LOCAL_RADIUS_KM = 100.0
+# Delivery-day estimate from distance: handling time plus road freight per day
+HANDLING_DAYS = 1
+KM_PER_DAY = 400.0
+WORLDWIDE = {'global', 'worldwide', 'international', 'all'}
+
+
+class Delivery(NamedTuple):
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    country: Optional[str] = None
+    local_only: bool = False
+
+    @property
+    def has_point(self) -> bool:
+        return self.latitude is not None and self.longitude is not None
+
+    def cache_key(self) -> Tuple:
+        # ~1 km resolution; nearby hospitals share cached matches
+        return (
+            round(self.latitude, 2) if self.has_point else None,
+            round(self.longitude, 2) if self.has_point else None,
+            self.country,
+            self.local_only,
+        )
+
+
+def make_delivery(latitude: Optional[float] = None, longitude: Optional[float] = None,
+                  country: Optional[str] = None, location: Optional[str] = None,
+                  local_only: bool = False) -> Optional[Delivery]:
+    """
+    Delivery target from hospital coordinates and/or the RFQ's delivery_location
+    ("Beirut, Lebanon": the last part is taken as the country). None when there
+    is nothing to filter on.
+    """
+    if not country and location:
+        country = location.split(',')[-1]
+    country = _norm(country) or None
+    if latitude is None or longitude is None:
+        latitude = longitude = None
+    if latitude is None and country is None:
+        return None
+    return Delivery(latitude, longitude, country, bool(local_only))
+
+
+def _norm(country: Optional[str]) -> str:
+    return (country or '').strip().lower()
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def estimate_delivery_days(distance_km: float) -> int:
+    return HANDLING_DAYS + math.ceil(distance_km / KM_PER_DAY)
+
+
+def vendor_location(v: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    try:
+        lat, lon = float(v['latitude']), float(v['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def _cell(lat: float, lon: float) -> Tuple[int, int]:
+    return int(math.floor(lat / GRID_DEGREES)), int(math.floor(lon / GRID_DEGREES))
+
+
+class GeoIndex:
+    def __init__(self):
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.points: Dict[int, Tuple[float, float, float]] = {}
+        self.by_country: Dict[str, List[int]] = defaultdict(list)
+        self.located_by_country: Dict[str, List[int]] = defaultdict(list)
+        self.home_country: Dict[int, str] = {}
+        self.worldwide: List[int] = []
+        self.unplaced: List[int] = []
+        self.max_radius_km = 0.0
+
+    @classmethod
+    def build(cls, vendors: List[Dict[str, Any]]) -> "GeoIndex":
+        index = cls()
+        for i, v in enumerate(vendors):
+            index._add(i, v)
+        return index
+
+    def _add(self, i: int, v: Dict[str, Any]):
+        countries = [_norm(c) for c in v.get('countries_served') or [] if _norm(c)]
+        if countries:
+            self.home_country[i] = countries[0]
+        location = vendor_location(v)
+        if location:
+            radius = float(v.get('service_radius_km') or DEFAULT_SERVICE_RADIUS_KM)
+            self.points[i] = (location[0], location[1], radius)
+            self.cells[_cell(*location)].append(i)
+            self.max_radius_km = max(self.max_radius_km, radius)
+            for c in countries:
+                self.located_by_country[c].append(i)
+        elif WORLDWIDE & set(countries):
+            self.worldwide.append(i)
+        elif countries:
+            for c in countries:
+                self.by_country[c].append(i)
+        else:
+            self.unplaced.append(i)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _near(self, lat: float, lon: float, radius_km: float) -> Dict[int, float]:
+        """Located vendors within radius_km of the point, with their distance."""
+        dlat = radius_km / KM_PER_DEGREE
+        # Widest longitude offset on the circle (exact on the sphere); a circle
+        # reaching a pole spans every longitude
+        angle = radius_km / EARTH_RADIUS_KM
+        spread = math.sin(angle) / max(math.cos(math.radians(lat)), 1e-12)
+        full = abs(lat) + dlat >= 90 or angle >= math.pi / 2 or spread >= 1
+        dlon = 180.0 if full else math.degrees(math.asin(spread))
+        lat_lo, lon_lo = _cell(max(-90.0, lat - dlat), lon - dlon)
+        lat_hi, lon_hi = _cell(min(90.0, lat + dlat), lon + dlon)
+        columns = int(360 / GRID_DEGREES)
+        if full or lon_hi - lon_lo + 1 >= columns:
+            lon_lo, lon_hi = 0, columns - 1
+
+        found = {}
+        for ci in range(lat_lo, lat_hi + 1):
+            for cj in range(lon_lo, lon_hi + 1):
+                # Wrap around the antimeridian
+                cell = (ci, (cj + columns // 2) % columns - columns // 2)
+                for i in self.cells.get(cell, ()):
+                    vlat, vlon, _ = self.points[i]
+                    d = haversine_km(lat, lon, vlat, vlon)
+                    if d <= radius_km:
+                        found[i] = d
+        return found
+
+    def reach(self, delivery: Delivery) -> Dict[int, Optional[float]]:
+        """
+        Vendors that can serve `delivery`, mapped to their distance in km (None
+        when the vendor has no coordinates). Located vendors qualify by service
+        radius; the others by serving the delivery country. With local_only,
+        only vendors within LOCAL_RADIUS_KM, or based in the delivery country
+        when distances are unknown, remain.
+        """
+        reach: Dict[int, Optional[float]] = {}
+        if delivery.has_point:
+            radius = LOCAL_RADIUS_KM if delivery.local_only else self.max_radius_km
+            for i, d in self._near(delivery.latitude, delivery.longitude, radius).items():
+                if delivery.local_only or d <= self.points[i][2]:
+                    reach[i] = d
+        elif delivery.country:
+            # No point to measure from: located vendors qualify by country
+            for i in self.located_by_country.get(delivery.country, ()):
+                if not delivery.local_only or self.home_country.get(i) == delivery.country:
+                    reach[i] = None
+
+        if delivery.local_only:
+            if delivery.country:
+                for i in self.by_country.get(delivery.country, ()):
+                    if self.home_country.get(i) == delivery.country:
+                        reach[i] = None
+            return reach
+
+        if delivery.country:
+            for i in self.by_country.get(delivery.country, ()):
+                reach[i] = None
+        else:
+            # Country unknown: unlocated vendors cannot be ruled out
+            for ids in self.by_country.values():
+                for i in ids:
+                    reach[i] = None
+        for i in self.worldwide + self.unplaced:
+            reach[i] = None
+        return reach
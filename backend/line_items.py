@@ -0,0 +1,145 @@
+import re
+from typing import List, Dict, Any, Optional, Iterator
+
+from pdf_backend import Consumer, TABLE_BACKENDS
+
+# Table stages of the parse pipeline (see pdf_backend.run_pipeline): the cells
+# of extracted pages are cleaned into rows, field rules turn a row into a line
+# item (description, quantity, unit) and the item is classified by keyword.
+
+
+def clean_text(text: Optional[str]) -> str:
+    return text.replace('\n', ' ').strip() if text else ""
+
+
+def is_garbage_row(row_text: str) -> bool:
+    blacklist = [
+        "click or tap",
+        "enter text",
+        "rfq reference",
+        "signature",
+        "date:",
+        "authorized by",
+        "page ",
+        "payment terms"
+    ]
+    t = row_text.lower()
+    return any(bad in t for bad in blacklist)
+
+
+def determine_item_type(description: str, form: str) -> str:
+    """
+    Determines the category of the item based on its description and form/unit.
+    Categories: Pharmaceuticals, Medical Supplies, Medical Equipment.
+    """
+    text = (description + " " + form).lower()
+    
+    # Priority 1: Medical Supplies (Consumables)
+    # Check these first to handle cases like "Insulin Syringe" (Supply) vs "Insulin" (Pharma)
+    supplies_keywords = [
+        'syringe', 'needle', 'cannula', 'catheter', 'glove', 'mask', 'gauze', 
+        'bandage', 'dressing', 'cotton', 'swab', 'lancet', 'strip', 'test kit', 
+        'blade', 'suture', 'plaster', 'gown', 'sheet', 'bag', 'alcohol', 
+        'disinfectant', 'sanitizer', 'tongue depressor', 'specula', 'paper',
+        'wipes', 'apron', 'cap', 'shoe cover', 'tape'
+    ]
+    if any(k in text for k in supplies_keywords):
+        return 'Medical Supplies'
+
+    # Priority 2: Medical Equipment (Devices/Durable)
+    equipment_keywords = [
+        'thermometer', 'sphygmomanometer', 'stethoscope', 'oximeter', 
+        'glucometer', 'nebulizer', 'otoscope', 'penlight', 'monitor', 
+        'scale', 'microscope', 'centrifuge', 'refrigerator', 'cool box',
+        'freezer', 'lamp', 'bed', 'chair', 'pump', 'bp machine', 'device'
+    ]
+    if any(k in text for k in equipment_keywords):
+        return 'Medical Equipment'
+
+    # Priority 3: Pharmaceuticals (Medicines/Drugs)
+    pharma_keywords = [
+        'tablet', 'capsule', 'cap', 'tab', 'syrup', 'suspension', 'susp', 
+        'injection', 'inj', 'ampoule', 'amp', 'vial', 'cream', 'ointment', 
+        'gel', 'suppository', 'supp', 'drops', 'inhaler', 'vaccine', 'sera', 
+        'insulin', 'medicine', 'drug', 'mg', 'ml', 'mcg', 'iu', 'dose',
+        'solution', 'infusion', 'spray', 'lozenge'
+    ]
+    if any(k in text for k in pharma_keywords):
+        return 'Pharmaceuticals'
+
+    # Fallback
+    return 'Medical Supplies'
+
+
+def table_rows(pages: List[Dict[str, Any]]) -> Iterator[List[str]]:
+    """Row stage: non-empty cleaned cells of every table row, minus boilerplate and header rows."""
+    for page in pages:
+        for table in page["tables"] or []:
+            for row in table:
+                cleaned_row = [clean_text(cell) for cell in row if cell is not None and clean_text(cell) != ""]
+                if not cleaned_row: continue
+                
+                row_text = " ".join(cleaned_row)
+                if is_garbage_row(row_text): continue
+                if "description" in row_text.lower() and "qty" in row_text.lower(): continue
+                yield cleaned_row
+
+
+def row_to_item(cleaned_row: List[str]) -> Optional[Dict[str, Any]]:
+    """Field rules: quantity, description and unit columns of a row; None when it is not a line item."""
+    qty = 1
+    qty_idx = -1
+    # Attempt to find the Quantity column (usually a number towards the end)
+    for i in range(len(cleaned_row) - 1, -1, -1):
+        val = cleaned_row[i].replace(',', '').replace('.', '')
+        if val.isdigit() and int(val) < 1000000:
+            qty = int(val)
+            qty_idx = i
+            break
+    
+    if qty_idx == -1: return None
+
+    # Attempt to find Description
+    desc_idx = 0
+    # If first col is just a number (Item No), skip it
+    if re.match(r'^\d+\.?$', cleaned_row[0]) and len(cleaned_row) > 1:
+        desc_idx = 1
+    
+    description = cleaned_row[desc_idx]
+    if re.match(r'^\d+$', description): return None
+    if is_garbage_row(description): return None
+
+    # Attempt to find Unit/Form
+    unit = "Unit"
+    if qty_idx > 0 and qty_idx > desc_idx:
+        # Usually the column before Qty is Unit
+        potential_unit = cleaned_row[qty_idx - 1]
+        if len(potential_unit) < 20 and potential_unit != description:
+            unit = potential_unit
+
+    return {
+        "inn_name": description,
+        "quantity": qty,
+        "form": unit,
+        "dosage": "",
+        # Classification stage
+        "type": determine_item_type(description, unit)
+    }
+
+
+def tables_to_items(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turns the table cells of extracted pages (see pdf_backend) into line items."""
+    extracted_items = []
+    for cleaned_row in table_rows(pages):
+        try:
+            item = row_to_item(cleaned_row)
+        except Exception:
+            continue
+        if item is not None:
+            extracted_items.append(item)
+    return extracted_items
+
+
+def table_consumer(backends: Optional[List[str]] = None) -> Consumer:
+    """Line items from table cells as a run_pipeline consumer (falls back to pdfplumber when empty)."""
+    return Consumer('tables', tables_to_items, backends or TABLE_BACKENDS, bool, tables=True)
@@ -2,14 +2,32 @@ import os
 import json
 import uuid
 import math
-import re
 import shutil
+import time
 import asyncio
-import pdfplumber
-from typing import List, Dict, Optional, Any
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Any, Tuple
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from page_classifier import summarize_pages
+from pdf_backend import run_pipeline
+from line_items import table_consumer
+from page_cache import PageCache
+from match_cache import MatchCache, match_key
+from matcher import item_candidates, merge_weights, MAX_MATCHES
+from name_index import NameIndex
+from geo_index import GeoIndex, make_delivery
+from match_pool import MatchPool, CHUNKS_PER_WORKER
+from allocation import allocate
+from match_session import CandidateTable, MatchSession, SessionStore
+from amendment import prepare_amendment, diff_line_items, items_to_rematch
+from file_janitor import FileJanitor
+from admission import AdmissionController, Rejected, document_cost, client_key
+from memory_guard import MemoryLimitExceeded, exclusive_process
+from serialization import FastJSONResponse, dumps
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'uploaded')
@@ -17,144 +35,121 @@ MASTER_INDEX_PATH = os.path.join(BASE_DIR, 'data', 'master_index.json')
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Upper bound for the per-request number of vendors returned per item
+MAX_TOP_K = 50
+# Items matched between flushes of /api/match-all/stream
+STREAM_BATCH_SIZE = 16
+# Matches per item considered by /api/allocate
+ALLOCATION_CANDIDATES = 20
+# Uploads not parsed within this many seconds are deleted by the janitor
+UPLOAD_TTL = 600
+# Parses running at once; admission control bounds how many may wait for one
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', '0')) or os.cpu_count() or 1
+
 _MASTER_INDEX_CACHE = {}
+_MASTER_INDEX_MTIME = None
+_MASTER_INDEX_VERSION = 0
+_PAGE_CACHE: Optional[PageCache] = None
+_MATCH_CACHE = MatchCache()
+_NAME_INDEX = NameIndex()
+_GEO_INDEX = GeoIndex()
+_MATCH_POOL = MatchPool()
+_MATCH_SESSIONS = SessionStore()
+_JANITOR = FileJanitor()
+_ADMISSION = AdmissionController()
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
 
 def load_master_index():
-    global _MASTER_INDEX_CACHE
-    if _MASTER_INDEX_CACHE: return _MASTER_INDEX_CACHE
-    if os.path.exists(MASTER_INDEX_PATH):
+    """Returns the cached index, reloading it (and dropping cached matches) when the file changes."""
+    global _MASTER_INDEX_CACHE, _MASTER_INDEX_MTIME, _MASTER_INDEX_VERSION, _NAME_INDEX, _GEO_INDEX
+    mtime = os.path.getmtime(MASTER_INDEX_PATH) if os.path.exists(MASTER_INDEX_PATH) else None
+    if _MASTER_INDEX_CACHE and mtime == _MASTER_INDEX_MTIME: return _MASTER_INDEX_CACHE
+    if mtime is not None:
         with open(MASTER_INDEX_PATH, 'r', encoding='utf-8') as f:
             _MASTER_INDEX_CACHE = json.load(f)
+        _NAME_INDEX = NameIndex.build(_MASTER_INDEX_CACHE.get('vendors', []))
+        _GEO_INDEX = GeoIndex.build(_MASTER_INDEX_CACHE.get('vendors', []))
+        _MASTER_INDEX_MTIME = mtime
+        _MASTER_INDEX_VERSION += 1
+        _MATCH_CACHE.invalidate(_MASTER_INDEX_VERSION)
+        _MATCH_SESSIONS.clear()
     return _MASTER_INDEX_CACHE
 
-def clean_text(text: Optional[str]) -> str:
-    return text.replace('\n', ' ').strip() if text else ""
-
-def is_garbage_row(row_text: str) -> bool:
-    blacklist = [
-        "click or tap",
-        "enter text",
-        "rfq reference",
-        "signature",
-        "date:",
-        "authorized by",
-        "page ",
-        "payment terms"
-    ]
-    t = row_text.lower()
-    return any(bad in t for bad in blacklist)
-
-def determine_item_type(description: str, form: str) -> str:
-    """
-    Determines the category of the item based on its description and form/unit.
-    Categories: Pharmaceuticals, Medical Supplies, Medical Equipment.
-    """
-    text = (description + " " + form).lower()
-    
-    # Priority 1: Medical Supplies (Consumables)
-    # Check these first to handle cases like "Insulin Syringe" (Supply) vs "Insulin" (Pharma)
-    supplies_keywords = [
-        'syringe', 'needle', 'cannula', 'catheter', 'glove', 'mask', 'gauze', 
-        'bandage', 'dressing', 'cotton', 'swab', 'lancet', 'strip', 'test kit', 
-        'blade', 'suture', 'plaster', 'gown', 'sheet', 'bag', 'alcohol', 
-        'disinfectant', 'sanitizer', 'tongue depressor', 'specula', 'paper',
-        'wipes', 'apron', 'cap', 'shoe cover', 'tape'
-    ]
-    if any(k in text for k in supplies_keywords):
-        return 'Medical Supplies'
-
-    # Priority 2: Medical Equipment (Devices/Durable)
-    equipment_keywords = [
-        'thermometer', 'sphygmomanometer', 'stethoscope', 'oximeter', 
-        'glucometer', 'nebulizer', 'otoscope', 'penlight', 'monitor', 
-        'scale', 'microscope', 'centrifuge', 'refrigerator', 'cool box',
-        'freezer', 'lamp', 'bed', 'chair', 'pump', 'bp machine', 'device'
-    ]
-    if any(k in text for k in equipment_keywords):
-        return 'Medical Equipment'
-
-    # Priority 3: Pharmaceuticals (Medicines/Drugs)
-    pharma_keywords = [
-        'tablet', 'capsule', 'cap', 'tab', 'syrup', 'suspension', 'susp', 
-        'injection', 'inj', 'ampoule', 'amp', 'vial', 'cream', 'ointment', 
-        'gel', 'suppository', 'supp', 'drops', 'inhaler', 'vaccine', 'sera', 
-        'insulin', 'medicine', 'drug', 'mg', 'ml', 'mcg', 'iu', 'dose',
-        'solution', 'infusion', 'spray', 'lozenge'
-    ]
-    if any(k in text for k in pharma_keywords):
-        return 'Pharmaceuticals'
-
-    # Fallback
-    return 'Medical Supplies'
-
-async def delete_file_safety_net(file_path: str, delay: int = 600):
-    await asyncio.sleep(delay)
+def get_page_cache() -> PageCache:
+    global _PAGE_CACHE
+    if _PAGE_CACHE is None:
+        _PAGE_CACHE = PageCache()
+    return _PAGE_CACHE
+
+def remove_upload(file_path: str):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    _JANITOR.forget(file_path)
+
+def parse_pdf_file(file_path: Optional[str], stats: Optional[Dict[str, Any]] = None, prefilter: bool = True,
+                   report: Optional[Dict[str, Any]] = None, backends: Optional[List[str]] = None,
+                   cache: Optional[PageCache] = None, doc_hash: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Extracts line items from the tables of a PDF.
+    Tries the fast backend first and falls back to pdfplumber when it yields no
+    line items; pass a dict as `report` to receive the backend used and its timings.
+    With prefilter enabled, pages that cannot hold line-item tables are skipped
+    before table extraction; pass a dict as `stats` to receive the skip counts.
+    With a PageCache only uncached pages are decoded; file_path may then be
+    None to re-derive the items of `doc_hash` from the cache alone.
+    """
+    outputs = run_pipeline(file_path, [table_consumer(backends)], prefilter=prefilter, cache=cache, doc_hash=doc_hash)
+    items, pages, extraction = outputs['tables']
+    if stats is not None:
+        stats.update(summarize_pages(pages))
+    if report is not None:
+        report.update(extraction)
+    return items
+
+def parse_upload(file_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any], Dict[str, Any]]:
+    """parse_pdf_file through the page cache; runs in a parse worker. Returns (items, page_stats, extraction)."""
+    page_stats, extraction = {}, {}
+    items = parse_pdf_file(file_path, stats=page_stats, report=extraction, cache=get_page_cache())
+    return items, page_stats, extraction
+
+class PreviousVersionNotFound(LookupError):
+    pass
+
+def parse_amended_upload(file_path: str, previous_hash: str):
+    """
+    Re-derives the previous version's items from the page cache, seeds the
+    cache from it and parses the amended upload; runs in a parse worker.
+    Returns (previous_items, amendment, items, page_stats, extraction).
+    """
+    cache = get_page_cache()
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception:
-        pass
-
-def parse_pdf_file(file_path: str) -> List[Dict[str, Any]]:
-    extracted_items = []
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables:
-                for row in table:
-                    cleaned_row = [clean_text(cell) for cell in row if cell is not None and clean_text(cell) != ""]
-                    if not cleaned_row: continue
-                    
-                    row_text = " ".join(cleaned_row)
-                    if is_garbage_row(row_text): continue
-                    if "description" in row_text.lower() and "qty" in row_text.lower(): continue
-                    
-                    try:
-                        qty = 1
-                        qty_idx = -1
-                        # Attempt to find the Quantity column (usually a number towards the end)
-                        for i in range(len(cleaned_row) - 1, -1, -1):
-                            val = cleaned_row[i].replace(',', '').replace('.', '')
-                            if val.isdigit() and int(val) < 1000000:
-                                qty = int(val)
-                                qty_idx = i
-                                break
-                        
-                        if qty_idx == -1: continue
-
-                        # Attempt to find Description
-                        desc_idx = 0
-                        # If first col is just a number (Item No), skip it
-                        if re.match(r'^\d+\.?$', cleaned_row[0]) and len(cleaned_row) > 1:
-                            desc_idx = 1
-                        
-                        description = cleaned_row[desc_idx]
-                        if re.match(r'^\d+$', description): continue
-                        if is_garbage_row(description): continue
-
-                        # Attempt to find Unit/Form
-                        unit = "Unit"
-                        if qty_idx > 0 and qty_idx > desc_idx:
-                            # Usually the column before Qty is Unit
-                            potential_unit = cleaned_row[qty_idx - 1]
-                            if len(potential_unit) < 20 and potential_unit != description:
-                                unit = potential_unit
-
-                        # Determine Category
-                        item_type = determine_item_type(description, unit)
-
-                        extracted_items.append({
-                            "inn_name": description,
-                            "quantity": qty,
-                            "form": unit,
-                            "dosage": "",
-                            "type": item_type 
-                        })
-                    except Exception:
-                        continue
-    return extracted_items
-
-app = FastAPI()
+        previous_items = parse_pdf_file(None, cache=cache, doc_hash=previous_hash)
+    except Exception as e:
+        raise PreviousVersionNotFound(previous_hash) from e
+    amendment = prepare_amendment(cache, file_path, previous_hash)
+    page_stats, extraction = {}, {}
+    items = parse_pdf_file(file_path, stats=page_stats, report=extraction, cache=cache,
+                           doc_hash=amendment["document_hash"])
+    return previous_items, amendment, items, page_stats, extraction
+
+async def run_parse(request: Request, file_path: str, fn, *args):
+    """
+    Runs fn on the parse pool once admission control grants the upload a slot.
+    Raises 429 with Retry-After when the parse queue is full; the upload is
+    kept so the client can retry. The janitor leaves the upload alone meanwhile.
+    """
+    await asyncio.to_thread(_JANITOR.lease, file_path)
+    try:
+        client = client_key(request.client.host if request.client else None)
+        cost = await asyncio.to_thread(document_cost, file_path)
+        async with _ADMISSION.admit_async(client, cost):
+            return await asyncio.get_running_loop().run_in_executor(_PARSE_POOL, fn, *args)
+    except Rejected as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    finally:
+        await asyncio.to_thread(_JANITOR.release, file_path)
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -165,10 +160,28 @@ app.add_middleware(
 
 @app.on_event("startup")
 def startup():
+    global _PARSE_POOL
     load_master_index()
+    # The janitor's sweeps also expire the cached pages of old uploads
+    _JANITOR.page_cache = get_page_cache()
+    # Uploads left over from before a restart expire by their modification time
+    # (adopted by the one process on the host that sweeps)
+    if _JANITOR.leader():
+        _JANITOR.adopt(DATA_DIR, UPLOAD_TTL)
+    _JANITOR.start()
+    # Forked workers inherit the page cache and parser modules already imported
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    _PARSE_POOL = ProcessPoolExecutor(PARSE_WORKERS, mp_context=context, initializer=exclusive_process)
+
+@app.on_event("shutdown")
+def shutdown():
+    _MATCH_POOL.shutdown()
+    if _PARSE_POOL is not None:
+        _PARSE_POOL.shutdown(wait=False, cancel_futures=True)
+    _JANITOR.stop()
 
 @app.post("/api/upload")
-async def upload_document(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...)):
     doc_id = str(uuid.uuid4())
     filename = f"{doc_id}.pdf"
     file_path = os.path.join(DATA_DIR, filename)
@@ -176,68 +189,284 @@ async def upload_document(background_tasks: BackgroundTasks, file: UploadFile =
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
-    background_tasks.add_task(delete_file_safety_net, file_path, 600)
+    _JANITOR.track(file_path, UPLOAD_TTL)
         
     return {"document_id": doc_id, "message": "Upload successful"}
 
 @app.post("/api/parse/{document_id}")
-async def parse_document(document_id: str):
+async def parse_document(document_id: str, request: Request):
     file_path = os.path.join(DATA_DIR, f"{document_id}.pdf")
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        items = parse_pdf_file(file_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        return {
+        items, page_stats, extraction = await run_parse(request, file_path, parse_upload, file_path)
+        remove_upload(file_path)
+        # Large payloads are returned as a response so they skip jsonable_encoder
+        return FastJSONResponse({
             "document_id": document_id,
-            "data": { "line_items": items }
-        }
+            "data": { "line_items": items },
+            "page_filter": page_stats,
+            "extraction": extraction
+        })
+    except HTTPException:
+        raise
+    except MemoryLimitExceeded as e:
+        remove_upload(file_path)
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        remove_upload(file_path)
         raise HTTPException(status_code=500, detail="Parsing failed")
 
+class DeliveryTarget(BaseModel):
+    # Hospital coordinates and/or the RFQ's delivery_location / local_only
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    country: Optional[str] = None
+    location: Optional[str] = None
+    local_only: bool = False
+
 class MatchRequest(BaseModel):
     items: List[Dict[str, Any]]
     preferences: List[str] = []
+    top_k: int = Field(MAX_MATCHES, ge=1, le=MAX_TOP_K)
+    delivery: Optional[DeliveryTarget] = None
+
+async def iter_matches(req: MatchRequest, batch_size: Optional[int] = None):
+    """
+    Yields (item, quantity, matches, cached) for every requested item, in input
+    order. Items are resolved batch by batch: candidate tables from the cache
+    first, then the misses (identical keys computed once), on the worker pool
+    for large requests. Each item is then ranked at its own quantity, so the
+    matches equal matcher.match_item's. With a delivery target only vendors
+    that can serve it are scored.
+    """
+    index = load_master_index()
+    vendors = index.get('vendors', [])
+    version = _MASTER_INDEX_VERSION
+    parallel = _MATCH_POOL.should_use(len(req.items))
+    batch_size = batch_size or len(req.items) or 1
+    delivery = make_delivery(**req.delivery.model_dump()) if req.delivery else None
+    delivery_key = delivery.cache_key() if delivery else None
+    by_name = len(_NAME_INDEX) > 0
+    w = merge_weights(req.preferences)
+    reach = None
+    weighed, ranked = {}, {}
+
+    for start in range(0, len(req.items), batch_size):
+        batch = req.items[start:start + batch_size]
+        keys, quantities, found, pending = [], [], {}, {}
+        for item in batch:
+            key = match_key(item, version, delivery_key, by_name)
+            keys.append(key)
+            quantities.append(int(item.get('quantity', 1)))
+            if key in found or key in pending:
+                continue
+            table = _MATCH_CACHE.get(key)
+            if table is None:
+                pending[key] = item
+            else:
+                found[key] = table
+        cached = set(found)
+
+        tasks = list(pending.values())
+        if parallel and tasks:
+            computed = await _MATCH_POOL.map(tasks, version, vendors, _NAME_INDEX, _GEO_INDEX, delivery)
+        else:
+            if delivery and reach is None and tasks:
+                reach = _GEO_INDEX.reach(delivery)
+            computed = [CandidateTable(item_candidates(item, vendors, _NAME_INDEX, reach), vendors, reach)
+                        for item in tasks]
+        for key, table in zip(pending, computed):
+            _MATCH_CACHE.put(key, table)
+            found[key] = table
+
+        for item, key, qty in zip(batch, keys, quantities):
+            if (key, qty) not in ranked:
+                table = found[key]
+                if key not in weighed and table.needs_weights():
+                    weighed[key] = table.weigh(w)
+                ranked[(key, qty)] = table.matches(vendors, w, weighed.get(key), qty, req.top_k)
+            yield item, qty, ranked[(key, qty)], key in cached
+
+def match_result(item: Dict[str, Any], qty: int, matches: List[Dict]) -> Dict[str, Any]:
+    return {
+        "medicine": item.get('inn_name') or 'Unknown',
+        "quantity": qty,
+        "top_vendor": matches[0] if matches else None,
+        "other_vendors": matches[1:]
+    }
 
 @app.post("/api/match-all")
 async def match_all(req: MatchRequest):
+    results = [match_result(item, qty, matches) async for item, qty, matches, _ in iter_matches(req)]
+    return FastJSONResponse({"matches": results})
+
+@app.post("/api/match-all/stream")
+async def match_all_stream(req: MatchRequest, format: str = Query("ndjson", pattern="^(ndjson|sse)$")):
+    """
+    Same matches as /api/match-all, emitted one item per record as soon as its
+    batch is matched: NDJSON lines, or server-sent events with format=sse.
+    Records are {"type": "match", "index": i, ...}; the last one is a summary.
+    """
+    batch_size = max(STREAM_BATCH_SIZE, _MATCH_POOL.workers * CHUNKS_PER_WORKER)
+
+    def encode(record: Dict[str, Any]) -> bytes:
+        data = dumps(record)
+        return b"event: %s\ndata: %s\n\n" % (record['type'].encode(), data) if format == 'sse' else data + b"\n"
+
+    async def records():
+        start = time.perf_counter()
+        count = matched = cache_hits = 0
+        async for item, qty, matches, cached in iter_matches(req, batch_size):
+            count += 1
+            matched += bool(matches)
+            cache_hits += cached
+            yield encode({"type": "match", "index": count - 1, **match_result(item, qty, matches)})
+        yield encode({
+            "type": "summary",
+            "items": count,
+            "matched": matched,
+            "unmatched": count - matched,
+            "cache_hits": cache_hits,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+
+    media_type = "text/event-stream" if format == 'sse' else "application/x-ndjson"
+    return StreamingResponse(records(), media_type=media_type)
+
+class AllocateRequest(MatchRequest):
+    top_k: int = Field(ALLOCATION_CANDIDATES, ge=1, le=MAX_TOP_K)
+    vendors_to_select: Optional[int] = Field(None, ge=1)
+    time_budget_ms: int = Field(200, ge=10, le=5000)
+
+@app.post("/api/allocate")
+async def allocate_rfq(req: AllocateRequest):
+    """
+    Splits the quantities of the whole RFQ across vendors, respecting the stock
+    shared between items and at most `vendors_to_select` distinct vendors.
+    Each item's top_k matches are the candidates.
+    """
+    items, demands, candidates = [], [], []
+    async for item, qty, matches, _ in iter_matches(req):
+        items.append(item)
+        demands.append(qty)
+        candidates.append(matches)
+
+    result = await asyncio.to_thread(allocate, demands, candidates, req.vendors_to_select,
+                                     req.time_budget_ms / 1000)
+    for item, qty, allocation in zip(items, demands, result["items"]):
+        allocation["medicine"] = item.get('inn_name') or 'Unknown'
+        allocation["quantity"] = qty
+    return FastJSONResponse(result)
+
+class RescoreRequest(BaseModel):
+    preferences: List[str] = []
+    top_k: int = Field(MAX_MATCHES, ge=1, le=MAX_TOP_K)
+
+def session_response(session_id: str, session: MatchSession, preferences: List[str], top_k: int) -> FastJSONResponse:
+    start = time.perf_counter()
+    ranked = session.rescore(preferences, top_k)
+    return FastJSONResponse({
+        "session_id": session_id,
+        "matches": [
+            match_result(item, int(item.get('quantity', 1)), matches)
+            for item, matches in zip(session.items, ranked)
+        ],
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    })
+
+@app.post("/api/match-sessions")
+async def create_match_session(req: MatchRequest):
+    """
+    Matches like /api/match-all and keeps every item's candidates and their
+    sub-scores, so /rescore can re-rank under other preferences in milliseconds.
+    Sessions expire after 30 minutes idle and when the master index changes.
+    """
     index = load_master_index()
     vendors = index.get('vendors', [])
-    results = []
-    
-    for item in req.items:
-        name = item.get('inn_name') or 'Unknown'
-        qty = int(item.get('quantity', 1))
-        
-        matches = []
-        for v in vendors:
-            cats = [c.lower() for c in v.get('primary_categories', [])]
-            # Simple matching logic - can be expanded to use item['type'] if needed
-            if 'pharmaceuticals' in cats or 'medical devices' in cats or 'medical supplies' in cats:
-                 matches.append({
-                    'vendor_id': v.get('vendor_id'),
-                    'name': v.get('legal_name'),
-                    'country': (v.get('countries_served') or ['Unknown'])[0],
-                    'landedCost': v.get('landedCost', 10),
-                    'deliveryDays': v.get('deliveryDays', 5),
-                    'availableQty': v.get('availableQty', 1000),
-                    'qualityScore': v.get('confidence_score', 80) / 10.0,
-                    'reliabilityScore': 5,
-                    'score': 9.5
-                })
-
-        results.append({
-            "medicine": name,
-            "quantity": qty,
-            "top_vendor": matches[0] if matches else None,
-            "other_vendors": matches[1:5] if len(matches) > 1 else []
-        })
+    delivery = make_delivery(**req.delivery.model_dump()) if req.delivery else None
+    reach = _GEO_INDEX.reach(delivery) if delivery else None
+    target_qtys = [int(item.get('quantity', 1)) for item in req.items]
+    session = MatchSession(req.items, target_qtys, vendors, _NAME_INDEX, reach, _MASTER_INDEX_VERSION)
+    session_id = _MATCH_SESSIONS.create(session)
+    return session_response(session_id, session, req.preferences, req.top_k)
+
+@app.post("/api/match-sessions/{session_id}/rescore")
+async def rescore_match_session(session_id: str, req: RescoreRequest):
+    session = _MATCH_SESSIONS.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Match session not found or expired")
+    return session_response(session_id, session, req.preferences, req.top_k)
+
+@app.delete("/api/match-sessions/{session_id}")
+async def delete_match_session(session_id: str):
+    if not _MATCH_SESSIONS.delete(session_id):
+        raise HTTPException(status_code=404, detail="Match session not found or expired")
+    return {"session_id": session_id, "deleted": True}
+
+class AmendRequest(BaseModel):
+    # extraction.document_hash of the version being amended
+    previous_hash: str
+    preferences: List[str] = []
+    top_k: int = Field(MAX_MATCHES, ge=1, le=MAX_TOP_K)
+    delivery: Optional[DeliveryTarget] = None
+
+@app.post("/api/parse/{document_id}/amend")
+async def parse_amendment(document_id: str, req: AmendRequest, request: Request):
+    """
+    Parses an amended version of a previously parsed RFQ. Pages unchanged since
+    `previous_hash` come from the page cache; the line items are diffed against
+    the previous version and only added or changed items are re-matched.
+    """
+    file_path = os.path.join(DATA_DIR, f"{document_id}.pdf")
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        previous_items, amendment, items, page_stats, extraction = await run_parse(
+            request, file_path, parse_amended_upload, file_path, req.previous_hash
+        )
+    except HTTPException:
+        raise
+    except PreviousVersionNotFound:
+        remove_upload(file_path)
+        raise HTTPException(status_code=404, detail="Previous version not found")
+    except MemoryLimitExceeded as e:
+        remove_upload(file_path)
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception:
+        remove_upload(file_path)
+        raise HTTPException(status_code=500, detail="Parsing failed")
+    remove_upload(file_path)
+
+    diff = diff_line_items(previous_items, items)
+    rematch = MatchRequest(items=items_to_rematch(diff), preferences=req.preferences, top_k=req.top_k,
+                           delivery=req.delivery)
+    matches = [match_result(item, qty, found) async for item, qty, found, _ in iter_matches(rematch)]
+    return FastJSONResponse({
+        "document_id": document_id,
+        "data": {"line_items": items},
+        "amendment": amendment,
+        "diff": {"line_items": diff},
+        "matches": matches,
+        "page_filter": page_stats,
+        "extraction": extraction
+    })
+
+@app.get("/api/metrics/match-cache")
+async def match_cache_metrics():
+    return _MATCH_CACHE.stats()
+
+@app.get("/api/metrics/admission")
+async def admission_metrics():
+    """Parse admission: running and queued cost, rejections and queue wait percentiles."""
+    return _ADMISSION.stats()
 
-    return {"matches": results}
+@app.get("/api/metrics/janitor")
+async def janitor_metrics():
+    """Result of the last upload cleanup sweep (files deleted, tracked files and bytes)."""
+    return _JANITOR.last_sweep
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,79 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Hashable
+
+# Memoizes per-item vendor candidates. The same INN names recur across almost
+# every RFQ, so a repeat item skips the scan over the vendor index. Entries
+# hold what does not depend on the request (the candidate set and its fixed
+# sub-scores, see match_session.CandidateTable); the quantity score and the
+# ranking are computed at each item's own quantity and preferences on read.
+
+DEFAULT_MAX_ENTRIES = 4096
+
+_NON_WORD = re.compile(r'[^a-z0-9%/.]+')
+
+
+def normalize_name(name: str) -> str:
+    return _NON_WORD.sub(' ', (name or '').lower()).strip()
+
+
+def match_key(item: Dict[str, Any], index_version: int, delivery: Hashable = None,
+              by_name: bool = True) -> Tuple[Hashable, ...]:
+    """Key of an item's candidates; without name search (by_name off) every item shares them."""
+    return (
+        normalize_name(item.get('inn_name') or '') if by_name else None,
+        index_version,
+        delivery,
+    )
+
+
+class MatchCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version: int):
+        """Drops every entry; called when the master index is reloaded."""
+        with self._lock:
+            self._entries.clear()
+            self.version = version
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "index_version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
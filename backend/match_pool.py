@@ -0,0 +1,72 @@
+import os
+import math
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from matcher import item_candidates
+from match_session import CandidateTable
+from name_index import NameIndex
+from geo_index import GeoIndex, Delivery
+
+# Matches large RFQs (framework agreements with hundreds of line items) on
+# several cores. The vendor list and name/geo indexes are published in a module
+# global before the pool is created; workers are forked from this process and
+# inherit them copy-on-write, so nothing but the items and their candidate
+# tables is pickled; the tables are cached and ranked in the server process.
+# A new master index version gets a new pool.
+
+PARALLEL_MIN_ITEMS = int(os.environ.get('MATCH_PARALLEL_MIN_ITEMS', '200'))
+DEFAULT_WORKERS = int(os.environ.get('MATCH_WORKERS', '0')) or os.cpu_count() or 1
+# Several chunks per worker so a slow chunk does not leave the others idle
+CHUNKS_PER_WORKER = 4
+
+_shared: Dict[str, Any] = {}
+
+
+def _candidate_chunk(chunk: List[Dict[str, Any]], delivery: Optional[Delivery]) -> List[CandidateTable]:
+    vendors, name_index = _shared['vendors'], _shared['name_index']
+    reach = _shared['geo_index'].reach(delivery) if delivery else None
+    return [CandidateTable(item_candidates(item, vendors, name_index, reach), vendors, reach) for item in chunk]
+
+
+class MatchPool:
+    def __init__(self, workers: int = DEFAULT_WORKERS, min_items: int = PARALLEL_MIN_ITEMS):
+        self.workers = workers
+        self.min_items = min_items
+        self.version: Optional[int] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def supported() -> bool:
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    def should_use(self, count: int) -> bool:
+        return self.workers > 1 and count >= self.min_items and self.supported()
+
+    def _get_executor(self, version: int, vendors: List[Dict], name_index: NameIndex,
+                      geo_index: GeoIndex) -> ProcessPoolExecutor:
+        if self._executor is None or version != self.version:
+            self.shutdown()
+            _shared.update(vendors=vendors, name_index=name_index, geo_index=geo_index)
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+            self.version = version
+        return self._executor
+
+    async def map(self, tasks: List[Dict[str, Any]], version: int, vendors: List[Dict], name_index: NameIndex,
+                  geo_index: GeoIndex, delivery: Optional[Delivery] = None) -> List[CandidateTable]:
+        """Candidate table of every item, computed in chunks on the pool, in input order."""
+        executor = self._get_executor(version, vendors, name_index, geo_index)
+        size = max(1, math.ceil(len(tasks) / (self.workers * CHUNKS_PER_WORKER)))
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(executor, _candidate_chunk, tasks[i:i + size], delivery)
+            for i in range(0, len(tasks), size)
+        ])
+        return [table for chunk in chunks for table in chunk]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
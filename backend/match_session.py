@@ -0,0 +1,169 @@
+import time
+import uuid
+import heapq
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from matcher import (
+    item_candidates, match_terms, sub_scores, quantity_score, combine_scores, merge_weights, vendor_match,
+)
+from name_index import NameIndex
+
+# Session-scoped match results for what-if re-weighting. Candidate selection
+# (name search, category and delivery filters) does not depend on the
+# preferences, so a session keeps each item's candidates with their
+# preference-independent sub-scores; re-ranking under new weights is a dot
+# product per candidate plus a top-k, without touching the vendor index.
+
+MAX_SESSIONS = 64
+SESSION_TTL = 30 * 60
+# Tables up to this size are ranked exhaustively, larger ones by threshold walk
+EXHAUSTIVE_ROWS = 64
+
+
+class CandidateTable:
+    """Candidates shared by items with the same candidate set, with their fixed sub-scores."""
+
+    def __init__(self, candidates: List[Tuple[int, Optional[Dict], Optional[float]]], vendors: List[Dict],
+                 reach: Optional[Dict[int, Optional[float]]]):
+        self.rows = candidates
+        self.distance = [reach.get(i) if reach is not None else None for i, _, _ in candidates]
+        self.name_match = [None if sim is None else round(sim, 3) for _, _, sim in candidates]
+        self.available = []
+        # (s_cost, s_delivery, s_quality, s_reliability); s_qty depends on the item quantity
+        self.fixed = []
+        for (i, product, _), distance in zip(candidates, self.distance):
+            terms = match_terms(vendors[i], product, distance)
+            self.available.append(terms[0])
+            self.fixed.append(sub_scores(terms, 1)[1:])
+        self.uniform = all(nm is None for nm in self.name_match)
+        self.by_available = sorted(range(len(candidates)), key=self.available.__getitem__, reverse=True)
+
+    def weigh(self, w: Dict[str, float]) -> Tuple[List[float], List[int]]:
+        """Weighted fixed part of every row (the matrix-vector product) and the rows in descending order."""
+        static = [
+            (w['cost'] * c + w['delivery'] * d + w['quality'] * q + w['reliability'] * r) * (1.0 if nm is None else nm)
+            for (c, d, q, r), nm in zip(self.fixed, self.name_match)
+        ]
+        return static, sorted(range(len(static)), key=static.__getitem__, reverse=True)
+
+    def rank(self, w: Dict[str, float], weighed: Tuple[List[float], List[int]], target_qty: int,
+             k: int) -> List[Tuple[float, int]]:
+        """Top-k (score, -row) exactly as matcher.match_item ranks them."""
+        def score(pos: int) -> float:
+            return combine_scores((quantity_score(self.available[pos], target_qty),) + self.fixed[pos],
+                                  self.name_match[pos], w)
+
+        if not self.uniform or len(self.rows) <= EXHAUSTIVE_ROWS:
+            return heapq.nlargest(k, ((score(pos), -pos) for pos in range(len(self.rows))))
+
+        # Threshold algorithm: the score grows with both the weighted fixed part
+        # and the available quantity, so rows are visited in both orders and
+        # the walk stops once a row combining the current fixed part and
+        # quantity at this depth could not reach the k-th best
+        static, order = weighed
+        heap: List[Tuple[float, int]] = []
+        seen = set()
+        for depth in range(len(order)):
+            for pos in (order[depth], self.by_available[depth]):
+                if pos in seen:
+                    continue
+                seen.add(pos)
+                entry = (score(pos), -pos)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+            threshold = static[order[depth]] + w['quantity'] * quantity_score(self.available[self.by_available[depth]], target_qty)
+            # (one display unit of slack for float rounding of the threshold)
+            if len(heap) == k and round(threshold * 10, 2) + 0.01 < heap[0][0]:
+                break
+        return sorted(heap, reverse=True)
+
+    def matches(self, vendors: List[Dict], w: Dict[str, float], weighed: Optional[Tuple[List[float], List[int]]],
+                target_qty: int, k: int) -> List[Dict[str, Any]]:
+        """Match records of the top k rows at `target_qty`; `weighed` is weigh(w), needed for large uniform tables."""
+        matches = []
+        for score, neg_pos in self.rank(w, weighed, target_qty, k):
+            i, product, sim = self.rows[-neg_pos]
+            match = vendor_match(vendors[i], product, sim, self.distance[-neg_pos])
+            match['score'] = score
+            matches.append(match)
+        return matches
+
+    def needs_weights(self) -> bool:
+        return self.uniform and len(self.rows) > EXHAUSTIVE_ROWS
+
+
+class MatchSession:
+    def __init__(self, items: List[Dict[str, Any]], target_qtys: List[int], vendors: List[Dict],
+                 name_index: Optional[NameIndex], reach: Optional[Dict[int, Optional[float]]], version: int):
+        self.version = version
+        self.vendors = vendors
+        self.items = items
+        self.target_qtys = target_qtys
+        self.tables: List[CandidateTable] = []
+        self.item_tables: List[int] = []
+
+        by_name = name_index is not None and len(name_index)
+        table_ids: Dict[Optional[str], int] = {}
+        for item in items:
+            # Name search only depends on the item name; otherwise all items share one table
+            key = (item.get('inn_name') or '') if by_name else None
+            if key not in table_ids:
+                table_ids[key] = len(self.tables)
+                self.tables.append(CandidateTable(item_candidates(item, vendors, name_index, reach), vendors, reach))
+            self.item_tables.append(table_ids[key])
+
+    def rescore(self, preferences: List[str], top_k: int) -> List[List[Dict[str, Any]]]:
+        """Matches of every item under new preferences, same as match_item would return."""
+        w = merge_weights(preferences)
+        weighed: Dict[int, Tuple[List[float], List[int]]] = {}
+        ranked: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        results = []
+        for t, qty in zip(self.item_tables, self.target_qtys):
+            if (t, qty) not in ranked:
+                table = self.tables[t]
+                if t not in weighed and table.needs_weights():
+                    weighed[t] = table.weigh(w)
+                ranked[(t, qty)] = table.matches(self.vendors, w, weighed.get(t), qty, top_k)
+            results.append(ranked[(t, qty)])
+        return results
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Tuple[float, MatchSession]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, session: MatchSession) -> str:
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic(), session)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id: str) -> Optional[MatchSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions[session_id] = (time.monotonic(), entry[1])
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear(self):
+        """Drops every session; called when the master index is reloaded."""
+        with self._lock:
+            self._sessions.clear()
@@ -1,6 +1,9 @@
 import json
 import os
-from typing import List, Dict, Any
+import heapq
+from typing import List, Dict, Any, Optional, Tuple
+from name_index import NameIndex
+from geo_index import estimate_delivery_days
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'extracted')
@@ -32,35 +35,187 @@ PRESET_WEIGHTS = {
     'default': {'quantity': 0.2, 'cost': 0.2, 'delivery': 0.2, 'quality': 0.2, 'reliability': 0.2}
 }
 
-def score_vendors(vendors: List[Dict], target_qty: int, preferences: List[str]):
+def merge_weights(preferences: List[str]) -> Dict[str, float]:
     w = PRESET_WEIGHTS['default'].copy()
-    
+
     # Improved preference merging (average all selected)
     if preferences:
         active_weights = [PRESET_WEIGHTS.get(p, PRESET_WEIGHTS['default']) for p in preferences]
         if active_weights:
             for key in w:
                 w[key] = sum(aw[key] for aw in active_weights) / len(active_weights)
+    return w
+
+def quantity_score(available_qty: float, target_qty: int) -> float:
+    # Protect against ZeroDivisionError
+    return min(1.0, available_qty / target_qty) if target_qty > 0 else 0
+
+def sub_scores(terms: Tuple[float, float, float, float, float],
+               target_qty: int) -> Tuple[float, float, float, float, float]:
+    """(s_qty, s_cost, s_delivery, s_quality, s_reliability) from (availableQty, landedCost, deliveryDays, quality, reliability)."""
+    available_qty, landed_cost, delivery_days, quality, reliability = terms
+    return (
+        quantity_score(available_qty, target_qty),
+        1.0 / (1.0 + (landed_cost / 100)),
+        1.0 / (1.0 + (delivery_days / 7)),
+        quality / 10.0,
+        reliability / 10.0,
+    )
+
+def combine_scores(s: Tuple[float, float, float, float, float], name_match: Optional[float],
+                   w: Dict[str, float]) -> float:
+    """Displayed score (0-10, 2 decimals) of a sub-score vector under merged weights."""
+    s_qty, s_cost, s_delivery, s_quality, s_reliability = s
+    final_score = (
+        w['quantity'] * s_qty +
+        w['cost'] * s_cost +
+        w['delivery'] * s_delivery +
+        w['quality'] * s_quality +
+        w['reliability'] * s_reliability
+    )
+    # Product-name similarity from the catalogue index, when matched by name
+    if name_match is not None:
+        final_score *= name_match
+    return round(final_score * 10, 2)
+
+def weighted_score(terms: Tuple[float, float, float, float, float], name_match: Optional[float],
+                   target_qty: int, w: Dict[str, float]) -> float:
+    """Displayed score (0-10, 2 decimals) from (availableQty, landedCost, deliveryDays, quality, reliability)."""
+    return combine_scores(sub_scores(terms, target_qty), name_match, w)
+
+def vendor_score(v: Dict, target_qty: int, w: Dict[str, float]) -> float:
+    terms = (v.get('availableQty', 0), v.get('landedCost', 0), v.get('deliveryDays', 0),
+             v.get('qualityScore', 0), v.get('reliabilityScore', 0))
+    return weighted_score(terms, v.get('nameMatch'), target_qty, w)
+
+def score_vendors(vendors: List[Dict], target_qty: int, preferences: List[str], k: Optional[int] = None):
+    """Scored copies of `vendors`, best first; with `k`, only the top k are copied."""
+    w = merge_weights(preferences)
+    # (score, -position) keeps the stable order of equal scores
+    ranked = ((vendor_score(v, target_qty, w), -i) for i, v in enumerate(vendors))
+    top = heapq.nlargest(k, ranked) if k is not None else sorted(ranked, reverse=True)
 
     scored = []
-    for v in vendors:
-        # Protect against ZeroDivisionError
-        s_qty = min(1.0, v.get('availableQty', 0) / target_qty) if target_qty > 0 else 0
-        s_cost = 1.0 / (1.0 + (v.get('landedCost', 0) / 100)) 
-        s_delivery = 1.0 / (1.0 + (v.get('deliveryDays', 0) / 7))
-        s_quality = v.get('qualityScore', 0) / 10.0
-        s_reliability = v.get('reliabilityScore', 0) / 10.0
-
-        final_score = (
-            w['quantity'] * s_qty +
-            w['cost'] * s_cost +
-            w['delivery'] * s_delivery +
-            w['quality'] * s_quality +
-            w['reliability'] * s_reliability
-        )
-        
-        v_copy = v.copy()
-        v_copy['score'] = round(final_score * 10, 2)
+    for score, neg_i in top:
+        v_copy = vendors[-neg_i].copy()
+        v_copy['score'] = score
         scored.append(v_copy)
+    return scored
+
+# Vendors in these categories can quote for RFQ line items
+MATCH_CATEGORIES = {'pharmaceuticals', 'medical devices', 'medical supplies'}
+MAX_MATCHES = 5
+# Name-index candidates scored per item before the top MAX_MATCHES are kept
+NAME_CANDIDATES = 50
+
+def is_eligible(v: Dict) -> bool:
+    return any(c.lower() in MATCH_CATEGORIES for c in v.get('primary_categories', []))
+
+class _Eligible:
+    """Vendor indexes that may quote: in a matching category, and within `reach` when given."""
+
+    def __init__(self, vendors: List[Dict], reach: Optional[Dict[int, Optional[float]]]):
+        self.vendors = vendors
+        self.reach = reach
+
+    def __contains__(self, vendor_idx: int) -> bool:
+        return (self.reach is None or vendor_idx in self.reach) and is_eligible(self.vendors[vendor_idx])
+
+def delivery_days(v: Dict, product: Dict, distance_km: Optional[float]) -> float:
+    """Stated delivery days, at least the distance-based estimate when the distance is known."""
+    stated = product.get('deliveryDays', v.get('deliveryDays'))
+    if distance_km is None:
+        return 5 if stated is None else stated
+    estimate = estimate_delivery_days(distance_km)
+    return estimate if stated is None else max(stated, estimate)
+
+def match_terms(v: Dict, product: Optional[Dict] = None,
+                distance_km: Optional[float] = None) -> Tuple[float, float, float, float, float]:
+    """Score inputs of a vendor (availableQty, landedCost, deliveryDays, quality, reliability)."""
+    product = product or {}
+    return (
+        product.get('availableQty', v.get('availableQty', 1000)),
+        product.get('landedCost', v.get('landedCost', 10)),
+        delivery_days(v, product, distance_km),
+        v.get('confidence_score', 80) / 10.0,
+        5,
+    )
+
+def vendor_match(v: Dict, product: Optional[Dict] = None, name_match: Optional[float] = None,
+                 distance_km: Optional[float] = None) -> Dict[str, Any]:
+    """Match record for a vendor; catalogue product fields override the vendor defaults."""
+    available_qty, landed_cost, days, quality, reliability = match_terms(v, product, distance_km)
+    match = {
+        'vendor_id': v.get('vendor_id'),
+        'name': v.get('legal_name'),
+        'country': (v.get('countries_served') or ['Unknown'])[0],
+        'landedCost': landed_cost,
+        'deliveryDays': days,
+        'availableQty': available_qty,
+        'qualityScore': quality,
+        'reliabilityScore': reliability
+    }
+    if name_match is not None:
+        product = product or {}
+        match['product'] = product.get('name') or product.get('inn_name')
+        match['nameMatch'] = round(name_match, 3)
+    if distance_km is not None:
+        match['distanceKm'] = round(distance_km, 1)
+    return match
+
+def item_candidates(item: Dict[str, Any], vendors: List[Dict], name_index: Optional[NameIndex] = None,
+                    reach: Optional[Dict[int, Optional[float]]] = None) -> List[Tuple[int, Optional[Dict], Optional[float]]]:
+    """
+    (vendor index, catalogue product, name similarity) of every vendor that may
+    quote for the item, in tie-break order. Independent of the preferences.
+    Vendors with a catalogue are found by item name (the best NAME_CANDIDATES
+    among the eligible ones). Vendors without one are candidates by category
+    only when no catalogue lists the item: unscaled by a name similarity, they
+    would otherwise outrank the vendors that do list it.
+    """
+    if name_index is not None and len(name_index):
+        found = [
+            (vendor_idx, product, sim)
+            for sim, vendor_idx, product in name_index.search(item.get('inn_name') or '', k=NAME_CANDIDATES,
+                                                              vendors=_Eligible(vendors, reach))
+        ]
+        if found:
+            return found
+        if reach is None:
+            in_range = name_index.uncatalogued
+        else:
+            in_range = [i for i in sorted(reach) if i not in name_index.catalogued]
+    else:
+        in_range = sorted(reach) if reach is not None else range(len(vendors))
+    return [(i, None, None) for i in in_range if is_eligible(vendors[i])]
+
+def match_item(item: Dict[str, Any], vendors: List[Dict], preferences: List[str], limit: int = MAX_MATCHES,
+               name_index: Optional[NameIndex] = None, target_qty: Optional[int] = None,
+               reach: Optional[Dict[int, Optional[float]]] = None) -> List[Dict]:
+    """
+    Vendor matches for one RFQ line item, best first, at most `limit` of them.
+    Vendors with catalogue products are found by item name through the name
+    index; when none lists the item, every vendor without a catalogue in a
+    matching category is scored.
+    `reach` (see GeoIndex.reach) restricts candidates to the vendors that can
+    serve the delivery location and supplies their distance.
+    Candidates are ranked as (score, position) tuples in a bounded heap and
+    match records are only built for the winners.
+    """
+    qty = target_qty if target_qty is not None else int(item.get('quantity', 1))
+    w = merge_weights(preferences)
+    candidates = item_candidates(item, vendors, name_index, reach)
 
-    return sorted(scored, key=lambda x: x['score'], reverse=True)
\ No newline at end of file
+    distance = reach.get if reach is not None else lambda i: None
+    ranked = (
+        (weighted_score(match_terms(vendors[i], product, distance(i)),
+                        None if sim is None else round(sim, 3), qty, w), -pos)
+        for pos, (i, product, sim) in enumerate(candidates)
+    )
+    matches = []
+    for score, neg_pos in heapq.nlargest(limit, ranked):
+        i, product, sim = candidates[-neg_pos]
+        match = vendor_match(vendors[i], product, sim, distance(i))
+        match['score'] = score
+        matches.append(match)
+    return matches
@@ -0,0 +1,98 @@
+import os
+import gc
+import sys
+from typing import Dict, Optional, Any
+
+# Memory bounds for one document's parse. A MemoryGuard samples the resident
+# set size after every decoded page; the parse fails with MemoryLimitExceeded
+# once it grew more than the limit above the level at the start of the
+# document, instead of growing until the worker is OOM-killed. RSS belongs to
+# the whole process, so the ceiling is only enforced in processes that run one
+# parse at a time (pool workers call exclusive_process() on start); where
+# parses share a process (threaded Flask, tests) another parse's growth would
+# fail this one, so the peak is still reported but nothing is raised.
+
+# Release every page's decoded objects as soon as it is extracted
+LOW_MEMORY = os.environ.get('PARSE_LOW_MEMORY', '0') == '1'
+# Per-document ceiling on RSS growth in MB; 0 disables it
+MEMORY_LIMIT_MB = int(os.environ.get('PARSE_MEMORY_LIMIT_MB', '0'))
+
+MB = 1024 * 1024
+
+# Set in processes running a single parse at a time
+_EXCLUSIVE = False
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return None
+
+
+def exclusive_process():
+    """Marks this process as running one parse at a time; pool initializer."""
+    global _EXCLUSIVE
+    _EXCLUSIVE = True
+
+
+class MemoryLimitExceeded(Exception):
+    def __init__(self, used_mb: float, limit_mb: float, page_number: Optional[int] = None):
+        super().__init__(used_mb, limit_mb, page_number)
+        self.used_mb = used_mb
+        self.limit_mb = limit_mb
+        self.page_number = page_number
+
+    def __str__(self) -> str:
+        where = f" at page {self.page_number}" if self.page_number is not None else ""
+        return f"Parse memory limit exceeded{where}: {self.used_mb:.1f} MB used, limit {self.limit_mb:.0f} MB"
+
+
+class MemoryGuard:
+    def __init__(self, limit_mb: Optional[float] = None, low_memory: Optional[bool] = None,
+                 enforce: Optional[bool] = None):
+        self.limit_mb = MEMORY_LIMIT_MB if limit_mb is None else limit_mb
+        # RSS growth is only this parse's own in a single-parse process
+        self.enforce = _EXCLUSIVE if enforce is None else enforce
+        self.low_memory = LOW_MEMORY if low_memory is None else low_memory
+        self.baseline = rss_bytes()
+        self.peak = self.baseline
+
+    def check(self, page_number: Optional[int] = None):
+        """Records the current RSS; raises MemoryLimitExceeded over the ceiling."""
+        rss = rss_bytes()
+        if rss is None or self.baseline is None:
+            return
+        self.peak = max(self.peak, rss)
+        used_mb = (rss - self.baseline) / MB
+        if self.limit_mb and self.enforce and used_mb > self.limit_mb:
+            if self.low_memory:
+                # Garbage not yet collected is not a reason to fail
+                gc.collect()
+                used_mb = (rss_bytes() - self.baseline) / MB
+                if used_mb <= self.limit_mb:
+                    return
+            raise MemoryLimitExceeded(used_mb, self.limit_mb, page_number)
+
+    def report(self) -> Dict[str, Any]:
+        limit_mb = self.limit_mb if self.enforce else None
+        if self.peak is None:
+            return {"low_memory": self.low_memory, "limit_mb": limit_mb or None}
+        return {
+            "low_memory": self.low_memory,
+            "limit_mb": limit_mb or None,
+            "peak_rss_mb": round(self.peak / MB, 1),
+            "peak_delta_mb": round((self.peak - self.baseline) / MB, 1),
+        }
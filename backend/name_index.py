@@ -0,0 +1,208 @@
+import re
+import math
+import heapq
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple, Container
+
+# Trigram index over the product names in the vendor catalogue. Parsed INN
+# names are messy ("Albendazole Oral suspension", "Amiodarone 150 mg/3ml amp")
+# so dosage, pharmaceutical form and packaging tokens are split off before
+# indexing; the remaining name is matched by trigram Dice similarity and the
+# form/strength only adjust the score.
+
+DEFAULT_MIN_SIMILARITY = 0.5
+# Multiplier applied when both sides state a form (or strength) and they differ
+FORM_MISMATCH = 0.9
+STRENGTH_MISMATCH = 0.9
+
+FORM_SYNONYMS = {
+    'tab': 'tablet', 'tabs': 'tablet', 'tablet': 'tablet', 'tablets': 'tablet',
+    'cap': 'capsule', 'caps': 'capsule', 'capsule': 'capsule', 'capsules': 'capsule',
+    'inj': 'injection', 'injection': 'injection', 'injectable': 'injection',
+    'susp': 'suspension', 'suspension': 'suspension',
+    'amp': 'ampoule', 'amps': 'ampoule', 'ampule': 'ampoule', 'ampoule': 'ampoule',
+    'syr': 'syrup', 'syrup': 'syrup',
+    'sol': 'solution', 'soln': 'solution', 'solution': 'solution',
+    'oint': 'ointment', 'ointment': 'ointment', 'cream': 'cream', 'gel': 'gel',
+    'supp': 'suppository', 'suppository': 'suppository',
+    'drops': 'drops', 'spray': 'spray', 'inhaler': 'inhaler', 'powder': 'powder',
+    'patch': 'patch', 'lotion': 'lotion', 'sachet': 'sachet', 'vial': 'vial',
+}
+
+NOISE_TOKENS = {
+    'oral', 'for', 'in', 'of', 'with', 'per', 'or', 'any', 'other', 'equivalent',
+    'box', 'bottle', 'pack', 'tube', 'strip', 'unit', 'units', 'pcs', 'each', 'generic',
+}
+
+_UNIT = r'(?:mg|g|mcg|µg|ml|l|iu|u|%|units?|dose)'
+STRENGTH_PATTERN = re.compile(
+    r'(\d+(?:[.,]\d+)?)\s*(' + _UNIT + r')(?:\s*/\s*(\d+(?:[.,]\d+)?)?\s*(' + _UNIT + r'))?(?![a-z])'
+)
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+class ParsedName(NamedTuple):
+    key: str
+    form: Optional[str]
+    strength: Optional[str]
+
+
+def parse_name(name: str) -> ParsedName:
+    """Splits a product name into (INN key, canonical form, canonical strength)."""
+    text = (name or '').lower()
+
+    strength = None
+    m = STRENGTH_PATTERN.search(text)
+    if m:
+        strength = f"{m.group(1).replace(',', '.')}{m.group(2)}"
+        if m.group(4):
+            strength += f"/{(m.group(3) or '1').replace(',', '.')}{m.group(4)}"
+        text = STRENGTH_PATTERN.sub(' ', text)
+
+    form = None
+    words = []
+    for token in _TOKEN.findall(text):
+        if token in FORM_SYNONYMS:
+            form = form or FORM_SYNONYMS[token]
+        elif token not in NOISE_TOKENS and not token.isdigit():
+            words.append(token)
+    return ParsedName(' '.join(words), form, strength)
+
+
+def trigrams(key: str) -> frozenset:
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def dice(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+def similarity(query: ParsedName, query_grams: frozenset, entry: ParsedName, entry_grams: frozenset) -> float:
+    sim = dice(query_grams, entry_grams)
+    if query.form and entry.form and query.form != entry.form:
+        sim *= FORM_MISMATCH
+    if query.strength and entry.strength and query.strength != entry.strength:
+        sim *= STRENGTH_MISMATCH
+    return sim
+
+
+def vendor_products(vendor: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Catalogue entries of a vendor; plain strings are accepted as product names."""
+    products = []
+    for p in vendor.get('products') or []:
+        if isinstance(p, str):
+            products.append({'name': p})
+        elif isinstance(p, dict) and (p.get('name') or p.get('inn_name')):
+            products.append(p)
+    return products
+
+
+def _top_vendors(best: Dict[int, Tuple[float, int]], k: int) -> List[Tuple[int, Tuple[float, int]]]:
+    # Ties broken by vendor order so indexed and brute-force search agree
+    return heapq.nsmallest(k, best.items(), key=lambda kv: (-kv[1][0], kv[0]))
+
+
+class NameIndex:
+    """
+    Trigram postings over the distinct parsed product names; each name keeps
+    the catalogue entries (vendor index, product, parsed name) that carry it,
+    so the Dice similarity is computed once per name, not once per vendor.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[int, Dict[str, Any], ParsedName]] = []
+        self.keys: List[str] = []
+        self.key_grams: List[frozenset] = []
+        self.key_entries: List[List[int]] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        # Vendor indexes with at least one indexed product, and those without
+        self.catalogued: set = set()
+        self.uncatalogued: List[int] = []
+        self._key_ids: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, vendors: List[Dict[str, Any]]) -> "NameIndex":
+        index = cls()
+        for vendor_idx, vendor in enumerate(vendors):
+            for product in vendor_products(vendor):
+                parsed = parse_name(product.get('name') or product.get('inn_name'))
+                if parsed.key:
+                    index._add(vendor_idx, product, parsed)
+        index.uncatalogued = [i for i in range(len(vendors)) if i not in index.catalogued]
+        return index
+
+    def _add(self, vendor_idx: int, product: Dict[str, Any], parsed: ParsedName):
+        key_id = self._key_ids.get(parsed.key)
+        if key_id is None:
+            key_id = self._key_ids[parsed.key] = len(self.keys)
+            grams = trigrams(parsed.key)
+            self.keys.append(parsed.key)
+            self.key_grams.append(grams)
+            self.key_entries.append([])
+            for g in grams:
+                self.postings[g].append(key_id)
+        self.key_entries[key_id].append(len(self.entries))
+        self.entries.append((vendor_idx, product, parsed))
+        self.catalogued.add(vendor_idx)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _score_keys(self, query: ParsedName, q_grams: frozenset, key_ids, k: int, min_similarity: float,
+                    vendors: Optional[Container[int]]) -> List[Tuple[float, int, Dict[str, Any]]]:
+        best: Dict[int, Tuple[float, int]] = {}
+        for key_id in key_ids:
+            base = dice(q_grams, self.key_grams[key_id])
+            if base < min_similarity:
+                continue
+            for entry_id in self.key_entries[key_id]:
+                vendor_idx, _, parsed = self.entries[entry_id]
+                if vendors is not None and vendor_idx not in vendors:
+                    continue
+                sim = base
+                if query.form and parsed.form and query.form != parsed.form:
+                    sim *= FORM_MISMATCH
+                if query.strength and parsed.strength and query.strength != parsed.strength:
+                    sim *= STRENGTH_MISMATCH
+                if sim >= min_similarity and sim > best.get(vendor_idx, (0.0, -1))[0]:
+                    best[vendor_idx] = (sim, entry_id)
+        return [(sim, vendor_idx, self.entries[entry_id][1]) for vendor_idx, (sim, entry_id) in _top_vendors(best, k)]
+
+    def search(self, name: str, k: int = 10, min_similarity: float = DEFAULT_MIN_SIMILARITY,
+               vendors: Optional[Container[int]] = None) -> List[Tuple[float, int, Dict[str, Any]]]:
+        """
+        Top-k (similarity, vendor index, product) for a product name, best
+        product per vendor, optionally restricted to the vendor indexes in
+        `vendors`. Candidates come only from the rarest query
+        trigrams (prefix filtering): a name reaching `min_similarity` must
+        share at least one of them, so common trigrams are never scanned.
+        """
+        query = parse_name(name)
+        if not query.key or not self.entries:
+            return []
+        q_grams = trigrams(query.key)
+
+        # Dice >= t requires an overlap of at least t*|q|/(2-t) trigrams
+        min_overlap = max(1, math.ceil(min_similarity * len(q_grams) / (2 - min_similarity)))
+        ordered = sorted(q_grams, key=lambda g: len(self.postings.get(g, ())))
+        candidates = set()
+        for g in ordered[:len(ordered) - min_overlap + 1]:
+            candidates.update(self.postings.get(g, ()))
+        return self._score_keys(query, q_grams, candidates, k, min_similarity, vendors)
+
+    def search_brute_force(self, name: str, k: int = 10,
+                           min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[Tuple[float, int, Dict[str, Any]]]:
+        """Reference implementation scoring every catalogue entry; used to benchmark search()."""
+        query = parse_name(name)
+        if not query.key:
+            return []
+        q_grams = trigrams(query.key)
+        best: Dict[int, Tuple[float, int]] = {}
+        for entry_id, (vendor_idx, _, parsed) in enumerate(self.entries):
+            sim = similarity(query, q_grams, parsed, trigrams(parsed.key))
+            if sim >= min_similarity and sim > best.get(vendor_idx, (0.0, -1))[0]:
+                best[vendor_idx] = (sim, entry_id)
+        return [(sim, vendor_idx, self.entries[entry_id][1]) for vendor_idx, (sim, entry_id) in _top_vendors(best, k)]
@@ -0,0 +1,276 @@
+import os
+import time
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Optional, Any, Tuple
+
+from page_classifier import classify
+from serialization import dumps, loads
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.environ.get('PAGE_CACHE_PATH', os.path.join(BASE_DIR, 'data', 'page_cache.sqlite3'))
+# Retention: documents unused for CACHE_TTL seconds are dropped, then the least
+# recently used ones while the cached text and tables exceed CACHE_MAX_BYTES.
+# The default TTL matches the extracted JSON's, so an amendment of any document
+# the services still hold finds the previous version's pages.
+CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', str(1024 ** 3)))
+
+# Per-page extraction artifacts (raw text, table cells and the classifier
+# features) keyed by document hash, extractor and page number. PDF decoding is
+# nearly all of the parse time, so once a document is cached, rule changes in
+# tables_to_items / RFQParser only re-run the post-processing.
+# Page fingerprints (hash of each page's content stream and fonts, see
+# pdf_backend.page_fingerprints) let an amended version of a document reuse
+# the extraction of every page that did not change. The page contents are
+# copies of uploaded documents, so they are pruned with the uploads: the file
+# janitor calls prune() on every sweep.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_hash TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    source_path TEXT,
+    cached_at TEXT NOT NULL,
+    used_at REAL NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (doc_hash, extractor)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    doc_hash TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    tables TEXT,
+    ruling_edges INTEGER,
+    char_count INTEGER,
+    PRIMARY KEY (doc_hash, extractor, page_number)
+);
+CREATE TABLE IF NOT EXISTS page_fingerprints (
+    doc_hash TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (doc_hash, page_number)
+);
+CREATE INDEX IF NOT EXISTS documents_used ON documents (used_at);
+"""
+
+# Caches created before retention lack the bookkeeping columns
+MIGRATIONS = {
+    "used_at": "ALTER TABLE documents ADD COLUMN used_at REAL NOT NULL DEFAULT 0",
+    "size_bytes": "ALTER TABLE documents ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0",
+}
+
+# Bytes of the cached pages of one document and extractor
+SIZE_SQL = (
+    "SELECT COALESCE(SUM(LENGTH(CAST(text AS BLOB)) + COALESCE(LENGTH(CAST(tables AS BLOB)), 0)), 0) "
+    "FROM pages WHERE doc_hash = documents.doc_hash AND extractor = documents.extractor"
+)
+
+
+def file_hash(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PageCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(documents)").fetchall()}
+            if columns:
+                for column, ddl in MIGRATIONS.items():
+                    if column not in columns:
+                        conn.execute(ddl)
+                if 'size_bytes' not in columns:
+                    conn.execute(f"UPDATE documents SET size_bytes = ({SIZE_SQL}), used_at = ?", (time.time(),))
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps the cache safe to share
+        # between request threads and worker processes.
+        return sqlite3.connect(self.path, timeout=30)
+
+    def page_count(self, doc_hash: str, extractor: str) -> Optional[int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT page_count FROM documents WHERE doc_hash = ? AND extractor = ?", (doc_hash, extractor)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, doc_hash: str, extractor: str, tables: bool = True,
+             prefilter: bool = True) -> Tuple[Optional[List[Dict[str, Any]]], List[int]]:
+        """
+        Returns (pages, missing_page_numbers). pages is None when the document
+        was never cached for this extractor. Pages whose tables were skipped are
+        re-classified from the cached features, so a classifier change only
+        reports the pages it now wants tables for as missing.
+        """
+        count = self.page_count(doc_hash, extractor)
+        if count is None:
+            return None, []
+
+        with self._connect() as conn:
+            conn.execute("UPDATE documents SET used_at = ? WHERE doc_hash = ? AND extractor = ?",
+                         (time.time(), doc_hash, extractor))
+            rows = conn.execute(
+                "SELECT page_number, text, tables, ruling_edges, char_count FROM pages "
+                "WHERE doc_hash = ? AND extractor = ? ORDER BY page_number", (doc_hash, extractor)
+            ).fetchall()
+
+        cached = {r[0]: r for r in rows}
+        pages, missing = [], []
+        for number in range(1, count + 1):
+            row = cached.get(number)
+            if row is None:
+                missing.append(number)
+                continue
+            _, text, tables_json, ruling_edges, char_count = row
+            entry = {
+                "page_number": number, "text": text, "tables": None, "skip_reason": None,
+                "features": {"ruling_edges": ruling_edges, "char_count": char_count}
+            }
+            if tables:
+                if tables_json is not None:
+                    entry["tables"] = loads(tables_json)
+                elif prefilter and ruling_edges is not None:
+                    keep, reason = classify(ruling_edges, char_count, lambda: text)
+                    if keep:
+                        missing.append(number)
+                        continue
+                    entry["skip_reason"] = reason
+                else:
+                    missing.append(number)
+                    continue
+            pages.append(entry)
+        return pages, missing
+
+    def store(self, doc_hash: str, extractor: str, page_count: int,
+              pages: List[Dict[str, Any]], source_path: Optional[str] = None):
+        """Upserts extracted pages; table cells of a previous run are kept unless re-extracted."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_hash, extractor, page_count, source_path, cached_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_hash, extractor, page_count, source_path, datetime.now().isoformat(), time.time())
+            )
+            for page in pages:
+                features = page.get("features") or {}
+                tables_json = dumps(page["tables"]).decode('utf-8') if page.get("tables") is not None else None
+                conn.execute(
+                    "INSERT INTO pages (doc_hash, extractor, page_number, text, tables, ruling_edges, char_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (doc_hash, extractor, page_number) DO UPDATE SET "
+                    "text = excluded.text, "
+                    "tables = COALESCE(excluded.tables, pages.tables), "
+                    "ruling_edges = COALESCE(excluded.ruling_edges, pages.ruling_edges), "
+                    "char_count = COALESCE(excluded.char_count, pages.char_count)",
+                    (doc_hash, extractor, page["page_number"], page["text"], tables_json,
+                     features.get("ruling_edges"), features.get("char_count"))
+                )
+            self._update_size(conn, doc_hash, extractor)
+
+    @staticmethod
+    def _update_size(conn: sqlite3.Connection, doc_hash: str, extractor: str):
+        conn.execute(f"UPDATE documents SET size_bytes = ({SIZE_SQL}) WHERE doc_hash = ? AND extractor = ?",
+                     (doc_hash, extractor))
+
+    def _drop(self, conn: sqlite3.Connection, doc_hashes: List[str]):
+        for table in ('pages', 'documents', 'page_fingerprints'):
+            conn.executemany(f"DELETE FROM {table} WHERE doc_hash = ?", [(h,) for h in doc_hashes])
+
+    def prune(self, now: Optional[float] = None, ttl: float = CACHE_TTL,
+              max_bytes: int = CACHE_MAX_BYTES) -> Dict[str, int]:
+        """
+        Drops documents (every extractor, their pages and fingerprints) unused
+        for `ttl` seconds, then the least recently used ones while the cache
+        holds more than `max_bytes` of page text and tables.
+        """
+        now = time.time() if now is None else now
+        stats = {"expired": 0, "evicted": 0}
+        with self._connect() as conn:
+            expired = [r[0] for r in conn.execute(
+                "SELECT doc_hash FROM documents GROUP BY doc_hash HAVING MAX(used_at) <= ?", (now - ttl,)
+            ).fetchall()]
+            self._drop(conn, expired)
+            stats["expired"] = len(expired)
+
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()[0]
+            if total > max_bytes:
+                victims = []
+                for doc_hash, size in conn.execute(
+                    "SELECT doc_hash, SUM(size_bytes) FROM documents GROUP BY doc_hash ORDER BY MAX(used_at)"
+                ):
+                    if total <= max_bytes:
+                        break
+                    victims.append(doc_hash)
+                    total -= size
+                self._drop(conn, victims)
+                stats["evicted"] = len(victims)
+            stats.update(
+                documents=conn.execute("SELECT COUNT(DISTINCT doc_hash) FROM documents").fetchone()[0],
+                bytes=total,
+            )
+        return stats
+
+    def documents(self) -> List[Tuple[str, Optional[str]]]:
+        """(doc_hash, source_path) for every cached document."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT doc_hash, MAX(source_path) FROM documents GROUP BY doc_hash ORDER BY doc_hash"
+            ).fetchall()
+        return [(r[0], r[1]) for r in rows]
+
+    def fingerprints(self, doc_hash: str) -> Optional[List[str]]:
+        """Page fingerprints in page order, or None when they were never stored."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT fingerprint FROM page_fingerprints WHERE doc_hash = ? ORDER BY page_number", (doc_hash,)
+            ).fetchall()
+        return [r[0] for r in rows] or None
+
+    def store_fingerprints(self, doc_hash: str, fingerprints: List[str]):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO page_fingerprints (doc_hash, page_number, fingerprint) VALUES (?, ?, ?)",
+                [(doc_hash, n, fp) for n, fp in enumerate(fingerprints, start=1)]
+            )
+
+    def seed(self, doc_hash: str, previous_hash: str, page_map: Dict[int, int], page_count: int,
+             source_path: Optional[str] = None) -> int:
+        """
+        Copies the cached pages of `previous_hash` into `doc_hash` for every
+        extractor it was cached with; `page_map` maps new page numbers to the
+        unchanged previous pages. Pages left out stay missing, so the next
+        extraction decodes only those. Returns the number of extractors seeded.
+        """
+        now = datetime.now().isoformat()
+        used_at = time.time()
+        with self._connect() as conn:
+            extractors = [r[0] for r in conn.execute(
+                "SELECT extractor FROM documents WHERE doc_hash = ?", (previous_hash,)
+            ).fetchall()]
+            for extractor in extractors:
+                if conn.execute("SELECT 1 FROM documents WHERE doc_hash = ? AND extractor = ?",
+                                (doc_hash, extractor)).fetchone():
+                    continue
+                conn.execute(
+                    "INSERT INTO documents (doc_hash, extractor, page_count, source_path, cached_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (doc_hash, extractor, page_count, source_path, now, used_at)
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO pages "
+                    "(doc_hash, extractor, page_number, text, tables, ruling_edges, char_count) "
+                    "SELECT ?, extractor, ?, text, tables, ruling_edges, char_count FROM pages "
+                    "WHERE doc_hash = ? AND extractor = ? AND page_number = ?",
+                    [(doc_hash, new, previous_hash, extractor, old) for new, old in page_map.items()]
+                )
+                self._update_size(conn, doc_hash, extractor)
+        return len(extractors)
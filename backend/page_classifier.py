@@ -0,0 +1,76 @@
+import re
+from typing import Dict, Any, List, Tuple, Callable
+
+# Cheap pre-pass that decides whether a page can hold line-item tables before
+# paying for table extraction. Cover letters, instructions, terms & conditions
+# and signature pages are the bulk of a typical RFQ and never yield rows that
+# survive is_garbage_row anyway.
+
+# Table finders use the "lines" strategy, so a page without ruling lines
+# cannot produce a table at all.
+MIN_RULING_EDGES = 4
+
+HEADER_KEYWORDS = [
+    'schedule of requirements', 'technical specifications', 'item no',
+    'description', 'qty', 'quantity', 'unit of issue', 'dosage',
+    'nonproprietary', 'strength', 'unit price', 'total price'
+]
+
+UNIT_KEYWORDS = [
+    'box', 'bottle', 'vial', 'ampoule', 'ampule', 'tablet', 'tab', 'capsule',
+    'tube', 'sachet', 'pack', 'pcs', 'piece', 'each', 'roll', 'set', 'kit',
+    'inhaler', 'bag', 'pair', 'unit'
+]
+
+DOSAGE_PATTERN = re.compile(r'\b\d+(?:[.,]\d+)?\s*(?:mg|ml|mcg|µg|g|iu|%|units?)\b', re.IGNORECASE)
+UNIT_PATTERN = re.compile(r'\b(?:' + '|'.join(UNIT_KEYWORDS) + r')s?\b', re.IGNORECASE)
+NUMBERED_ROW_PATTERN = re.compile(r'^\s*\d{1,4}\.?\s+\S', re.MULTILINE)
+
+MIN_HEADER_HITS = 2
+MIN_NUMBERED_ROWS = 3
+MIN_ITEM_EVIDENCE = 3
+
+
+def classify(ruling_edges: int, char_count: int, get_text: Callable[[], str]) -> Tuple[bool, str]:
+    """
+    Returns (may_have_line_items, reason) from backend-neutral page features.
+    The text is only fetched once the ruling/char checks have passed.
+    """
+    if ruling_edges < MIN_RULING_EDGES:
+        return False, 'no_ruling'
+    if char_count == 0:
+        return False, 'no_text_layer'
+
+    text = get_text() or ""
+    lowered = text.lower()
+
+    header_hits = sum(1 for k in HEADER_KEYWORDS if k in lowered)
+    if header_hits >= MIN_HEADER_HITS:
+        return True, 'header'
+
+    numbered_rows = len(NUMBERED_ROW_PATTERN.findall(text))
+    evidence = len(DOSAGE_PATTERN.findall(text)) + len(UNIT_PATTERN.findall(text))
+    if numbered_rows >= MIN_NUMBERED_ROWS and evidence >= MIN_ITEM_EVIDENCE:
+        return True, 'item_rows'
+
+    return False, 'boilerplate'
+
+
+def classify_page(page) -> Tuple[bool, str]:
+    """classify() for a pdfplumber page, using the objects it has already decoded."""
+    return classify(len(page.edges), len(page.chars), page.extract_text)
+
+
+def summarize_pages(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Skip counts for pages produced by a pdf_backend extractor."""
+    stats = {"pages_total": len(pages), "pages_scanned": 0, "pages_skipped": 0, "skip_rate": 0.0, "skip_reasons": {}}
+    for page in pages:
+        reason = page.get("skip_reason")
+        if reason:
+            stats["pages_skipped"] += 1
+            stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
+        else:
+            stats["pages_scanned"] += 1
+    if pages:
+        stats["skip_rate"] = round(stats["pages_skipped"] / len(pages), 3)
+    return stats
@@ -0,0 +1,443 @@
+import os
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Callable, Tuple, NamedTuple
+
+from page_classifier import classify
+from page_cache import file_hash
+from memory_guard import MemoryGuard, MemoryLimitExceeded
+
+# PyMuPDF is the fast path. On the 17-page sample RFQ its page text takes
+# 0.12s against 0.8s for PyPDF2 and 2.0s for pdfplumber; with table finding
+# the gap narrows (1.2s vs 2.4s for pdfplumber with the page pre-filter, 1.9s
+# vs 2.5s without). Every engine is optional so a missing wheel only shortens
+# the fallback chain.
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# MuPDF is not thread-safe: threaded servers (Flask request threads, the
+# asyncio threadpool estimating parse costs) take this lock around every use
+_MUPDF_LOCK = threading.Lock()
+
+
+def _reset_mupdf_lock():
+    # A fork while another thread held the lock must not leave the child locked out
+    global _MUPDF_LOCK
+    _MUPDF_LOCK = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_mupdf_lock)
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+# Each extractor returns one dict per page:
+#   {"page_number": int, "text": str, "tables": [[[cell, ...], ...], ...] | None,
+#    "skip_reason": str | None, "features": {"ruling_edges": int, "char_count": int} | None}
+# tables is None when they were not extracted; skip_reason says why when the
+# page pre-filter decided against it. features are recorded whenever tables
+# were requested so the classifier can be re-run on cached pages.
+
+
+class PDFBackend:
+    name = ''
+    # Bump when the extractor's output changes so cached pages are not reused
+    version = 1
+    supports_tables = False
+
+    @classmethod
+    def available(cls) -> bool:
+        return False
+
+    @classmethod
+    def cache_key(cls) -> str:
+        return f"{cls.name}@{cls.version}"
+
+    def extract_pages(self, file_path: str, tables: bool = True, prefilter: bool = True,
+                      page_numbers: Optional[List[int]] = None,
+                      guard: Optional[MemoryGuard] = None) -> List[Dict[str, Any]]:
+        """
+        Extracts all pages, or only the 1-based `page_numbers` when given.
+        With a guard, memory is checked after every page (and each page's
+        decoded objects are released first in low-memory mode).
+        """
+        raise NotImplementedError
+
+
+def _page_entry(number: int, text: str) -> Dict[str, Any]:
+    return {"page_number": number, "text": text, "tables": None, "skip_reason": None, "features": None}
+
+
+def _selected(count: int, page_numbers: Optional[List[int]]) -> List[int]:
+    return list(page_numbers) if page_numbers is not None else list(range(1, count + 1))
+
+
+class PyMuPDFBackend(PDFBackend):
+    name = 'pymupdf'
+    # 2: table cells of one row stay on one text line
+    version = 2
+    supports_tables = True
+
+    @classmethod
+    def available(cls) -> bool:
+        return pymupdf is not None
+
+    @staticmethod
+    def _ruling_edges(page) -> int:
+        # Count like pdfplumber's page.edges: a rectangle contributes four edges
+        edges = 0
+        for drawing in page.get_drawings():
+            for item in drawing['items']:
+                if item[0] == 'l':
+                    edges += 1
+                elif item[0] == 're':
+                    edges += 4
+        return edges
+
+    @staticmethod
+    def _stream_text(page, tolerance: float = 1.0) -> str:
+        # MuPDF puts every table cell on its own line. Follow the PyPDF2
+        # convention instead (break only when the text moves down the page) so
+        # row-oriented regexes see one table row per line. A line moves down
+        # when it starts below the previous one: cells of a row whose text is
+        # vertically offset (item numbers centred beside a wrapped name) still
+        # overlap and stay on one line. A jump back up by more than a quarter
+        # page (footer, then the body) also starts a new line.
+        jump = page.rect.height / 4
+        parts = []
+        last_top = last_bottom = None
+        for block in page.get_text("dict")['blocks']:
+            for line in block.get('lines', []):
+                top, bottom = line['bbox'][1], line['bbox'][3]
+                if last_bottom is not None:
+                    if top > last_bottom - tolerance or last_top - top > jump:
+                        parts.append("\n")
+                    elif not parts[-1][-1:].isspace():
+                        parts.append(" ")
+                parts.append(''.join(span['text'] for span in line['spans']))
+                last_top, last_bottom = top, bottom
+        return ''.join(parts)
+
+    def extract_pages(self, file_path: str, tables: bool = True, prefilter: bool = True,
+                      page_numbers: Optional[List[int]] = None,
+                      guard: Optional[MemoryGuard] = None) -> List[Dict[str, Any]]:
+        pages = []
+        with _MUPDF_LOCK, pymupdf.open(file_path) as doc:
+            for number in _selected(doc.page_count, page_numbers):
+                page = doc[number - 1]
+                text = self._stream_text(page)
+                entry = _page_entry(number, text)
+                if tables:
+                    features = {"ruling_edges": self._ruling_edges(page), "char_count": len(text.strip())}
+                    entry["features"] = features
+                    keep, reason = (True, None)
+                    if prefilter:
+                        keep, reason = classify(features["ruling_edges"], features["char_count"], lambda: text)
+                    if keep:
+                        entry["tables"] = [t.extract() for t in page.find_tables().tables]
+                    else:
+                        entry["skip_reason"] = reason
+                pages.append(entry)
+                if guard is not None:
+                    if guard.low_memory:
+                        # MuPDF's object store keeps decoded fonts and images across pages
+                        page = None
+                        pymupdf.TOOLS.store_shrink(100)
+                    guard.check(number)
+        return pages
+
+
+class PdfplumberBackend(PDFBackend):
+    name = 'pdfplumber'
+    supports_tables = True
+
+    @classmethod
+    def available(cls) -> bool:
+        return pdfplumber is not None
+
+    @staticmethod
+    def _release(pdf, page):
+        # Cached chars/edges/layout of the page, and pdfminer's cache of parsed
+        # PDF objects (which holds the image streams of scanned pages)
+        page.close()
+        for cache in (getattr(pdf.doc, '_cached_objs', None), getattr(pdf.doc, '_parsed_objs', None)):
+            if cache is not None:
+                cache.clear()
+
+    def extract_pages(self, file_path: str, tables: bool = True, prefilter: bool = True,
+                      page_numbers: Optional[List[int]] = None,
+                      guard: Optional[MemoryGuard] = None) -> List[Dict[str, Any]]:
+        pages = []
+        with pdfplumber.open(file_path) as pdf:
+            for number in _selected(len(pdf.pages), page_numbers):
+                page = pdf.pages[number - 1]
+                text = page.extract_text() or ""
+                entry = _page_entry(number, text)
+                if tables:
+                    features = {"ruling_edges": len(page.edges), "char_count": len(page.chars)}
+                    entry["features"] = features
+                    keep, reason = (True, None)
+                    if prefilter:
+                        keep, reason = classify(features["ruling_edges"], features["char_count"], lambda: text)
+                    if keep:
+                        entry["tables"] = page.extract_tables()
+                    else:
+                        entry["skip_reason"] = reason
+                pages.append(entry)
+                if guard is not None:
+                    if guard.low_memory:
+                        self._release(pdf, page)
+                    guard.check(number)
+        return pages
+
+
+class PyPDF2Backend(PDFBackend):
+    name = 'pypdf2'
+
+    @classmethod
+    def available(cls) -> bool:
+        return PyPDF2 is not None
+
+    def extract_pages(self, file_path: str, tables: bool = True, prefilter: bool = True,
+                      page_numbers: Optional[List[int]] = None,
+                      guard: Optional[MemoryGuard] = None) -> List[Dict[str, Any]]:
+        pages = []
+        with open(file_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            for number in _selected(len(reader.pages), page_numbers):
+                pages.append(_page_entry(number, reader.pages[number - 1].extract_text() or ""))
+                if guard is not None:
+                    guard.check(number)
+        return pages
+
+
+BACKENDS = {b.name: b for b in (PyMuPDFBackend, PdfplumberBackend, PyPDF2Backend)}
+
+# Fast path first, then the extractor the table parser used originally
+TABLE_BACKENDS = ['pymupdf', 'pdfplumber']
+# RFQParser's row regexes are written against PyPDF2's reading order, which
+# PyMuPDF's text follows (_stream_text). PyMuPDF first lets a document parsed
+# for both tables and RFQ fields be decoded once; PyPDF2 is the fallback.
+TEXT_BACKENDS = ['pymupdf', 'pypdf2']
+
+
+def get_backend(name: str) -> PDFBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {name}")
+    return BACKENDS[name]()
+
+
+def page_count(file_path: str) -> Optional[int]:
+    """Number of pages, read from the page tree without decoding any page."""
+    if pymupdf is not None:
+        with _MUPDF_LOCK, pymupdf.open(file_path) as doc:
+            return doc.page_count
+    if PyPDF2 is not None:
+        with open(file_path, 'rb') as f:
+            return len(PyPDF2.PdfReader(f).pages)
+    return None
+
+
+def page_fingerprints(file_path: str) -> List[str]:
+    """
+    One hash per page over its content stream and the fonts it uses. Pages
+    that render identically from the same operators hash the same even when
+    the file around them (xref offsets, metadata, other pages) changed.
+    """
+    fingerprints = []
+    if pymupdf is not None:
+        with _MUPDF_LOCK, pymupdf.open(file_path) as doc:
+            for page in doc:
+                h = hashlib.sha256(page.read_contents())
+                for font in page.get_fonts():
+                    h.update(f"|{font[3]}|{font[4]}".encode())
+                fingerprints.append(h.hexdigest())
+        return fingerprints
+    if PyPDF2 is not None:
+        with open(file_path, 'rb') as f:
+            for page in PyPDF2.PdfReader(f).pages:
+                contents = page.get_contents()
+                h = hashlib.sha256(contents.get_data() if contents is not None else b'')
+                fonts = (page.get('/Resources') or {}).get('/Font') or {}
+                for name in sorted(fonts):
+                    h.update(f"|{name}|{fonts[name].get_object().get('/BaseFont')}".encode())
+                fingerprints.append(h.hexdigest())
+        return fingerprints
+    raise RuntimeError("No PDF backend available")
+
+
+def extract_cached(backend_cls, file_path: Optional[str], tables: bool, prefilter: bool,
+                   cache=None, doc_hash: Optional[str] = None,
+                   guard: Optional[MemoryGuard] = None) -> Tuple[Optional[List[Dict[str, Any]]], Dict[str, int]]:
+    """
+    Extracts pages through the page cache: only pages that are not cached (or
+    whose tables the classifier now wants) are decoded. With no file_path the
+    cache is the only source and None is returned for uncached documents.
+    Returns (pages, {"cached": n, "extracted": n}).
+    """
+    if cache is None:
+        pages = backend_cls().extract_pages(file_path, tables=tables, prefilter=prefilter, guard=guard)
+        return pages, {"cached": 0, "extracted": len(pages)}
+
+    key = backend_cls.cache_key()
+    pages, missing = cache.load(doc_hash, key, tables=tables, prefilter=prefilter)
+    if pages is not None and not missing:
+        return pages, {"cached": len(pages), "extracted": 0}
+    if file_path is None or not backend_cls.available():
+        return None, {"cached": 0, "extracted": 0}
+
+    if pages is None:
+        fresh = backend_cls().extract_pages(file_path, tables=tables, prefilter=prefilter, guard=guard)
+        cache.store(doc_hash, key, len(fresh), fresh, source_path=file_path)
+        return fresh, {"cached": 0, "extracted": len(fresh)}
+
+    fresh = backend_cls().extract_pages(file_path, tables=tables, prefilter=prefilter, page_numbers=missing,
+                                        guard=guard)
+    cache.store(doc_hash, key, len(pages) + len(fresh), fresh, source_path=file_path)
+    merged = sorted(pages + fresh, key=lambda p: p["page_number"])
+    return merged, {"cached": len(pages), "extracted": len(fresh)}
+
+
+class Consumer(NamedTuple):
+    """
+    One output of the parse pipeline: `derive` applies a service's row and
+    field rules to the pages of a backend, trying the backends of `chain` in
+    order until `accept` takes the result. With `tables`, text-only backends
+    are skipped.
+    """
+    name: str
+    derive: Callable[[List[Dict[str, Any]]], Any]
+    chain: List[str]
+    accept: Callable[[Any], bool] = bool
+    tables: bool = False
+
+
+def run_pipeline(
+    file_path: Optional[str],
+    consumers: List[Consumer],
+    prefilter: bool = True,
+    cache=None,
+    doc_hash: Optional[str] = None,
+    raise_errors: bool = True,
+    low_memory: Optional[bool] = None,
+    memory_limit_mb: Optional[float] = None,
+) -> Dict[str, Tuple[Any, List[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Parse pipeline shared by both services: load (document hash, page
+    fingerprints) -> page text/tables per backend -> each consumer's rows,
+    field rules and classification. Every backend decodes the document at
+    most once for all consumers, and table cells are extracted only when a
+    pending consumer uses them.
+    Returns {consumer name: (result, pages, report)}; the report names the
+    backend that produced the result and the seconds spent in every backend tried.
+    A consumer no backend produced a result for raises, or with raise_errors
+    off gets (None, [], report) with the reason in report["error"].
+    Decoding is memory-guarded (memory_guard.py): `low_memory` releases every
+    page's objects once extracted, and a document growing past
+    `memory_limit_mb` fails with MemoryLimitExceeded without trying further
+    backends. The environment defaults apply when they are None; every report
+    gets the document's peak memory in report["memory"].
+    """
+    reports = {c.name: {"backend": None, "timings": {}, "errors": {}, "fallback": False, "pages": {}}
+               for c in consumers}
+    results: Dict[str, Tuple[Any, List[Dict[str, Any]]]] = {c.name: (None, []) for c in consumers}
+    last_errors: Dict[str, Exception] = {}
+    tried = {c.name: 0 for c in consumers}
+    done = set()
+    guard = MemoryGuard(memory_limit_mb, low_memory)
+
+    # Load
+    if cache is not None and doc_hash is None:
+        doc_hash = file_hash(file_path)
+    if cache is not None:
+        for report in reports.values():
+            report["document_hash"] = doc_hash
+        # Fingerprints let a later amendment of this document reuse its pages
+        if file_path is not None and cache.fingerprints(doc_hash) is None:
+            try:
+                cache.store_fingerprints(doc_hash, page_fingerprints(file_path))
+            except Exception as e:
+                for report in reports.values():
+                    report["errors"]["fingerprints"] = str(e)
+
+    order = []
+    for c in consumers:
+        order.extend(name for name in c.chain if name not in order)
+
+    for name in order:
+        backend_cls = BACKENDS.get(name)
+        if backend_cls is None:
+            continue
+        if file_path is not None and cache is None and not backend_cls.available():
+            continue
+        pending = [
+            c for c in consumers
+            if c.name not in done and name in c.chain and (backend_cls.supports_tables or not c.tables)
+        ]
+        if not pending:
+            continue
+
+        # Page text/tables, decoded once for every pending consumer
+        tables = backend_cls.supports_tables and any(c.tables for c in pending)
+        start = time.perf_counter()
+        try:
+            backend_pages, page_counts = extract_cached(backend_cls, file_path, tables, prefilter, cache, doc_hash,
+                                                        guard)
+        except Exception as e:
+            for c in pending:
+                last_errors[c.name] = e
+                reports[c.name]["errors"][name] = str(e)
+                reports[c.name]["timings"][name] = round(time.perf_counter() - start, 4)
+                tried[c.name] += 1
+            if isinstance(e, MemoryLimitExceeded):
+                # Other backends would start from the same memory; fail the document
+                break
+            continue
+        if backend_pages is None:
+            continue
+        decode_time = time.perf_counter() - start
+
+        for c in pending:
+            report = reports[c.name]
+            start = time.perf_counter()
+            tried[c.name] += 1
+            try:
+                result = c.derive(backend_pages)
+            except Exception as e:
+                last_errors[c.name] = e
+                report["errors"][name] = str(e)
+                report["timings"][name] = round(decode_time + time.perf_counter() - start, 4)
+                continue
+            report["timings"][name] = round(decode_time + time.perf_counter() - start, 4)
+            report["pages"][name] = page_counts
+            report["backend"] = name
+            results[c.name] = (result, backend_pages)
+            if c.accept(result):
+                done.add(c.name)
+
+    outputs = {}
+    memory = guard.report()
+    for c in consumers:
+        report = reports[c.name]
+        report["memory"] = memory
+        if report["backend"] is None:
+            error = last_errors.get(c.name) or RuntimeError(
+                "No PDF backend available" if file_path is not None else "Document is not in the page cache")
+            if raise_errors:
+                raise error
+            report["error"] = str(error)
+        report["fallback"] = tried[c.name] > 1
+        outputs[c.name] = results[c.name] + (report,)
+    return outputs
+
@@ -0,0 +1,93 @@
+"""
+Re-derive parse results for every document in the page cache.
+
+After a rule change in tables_to_items or RFQParser this re-runs only the
+post-processing over the cached page text/tables, without decoding any PDF:
+
+    python rederive.py --output rederived.jsonl --workers 8
+"""
+import os
+import sys
+import time
+import argparse
+from multiprocessing import Pool
+from typing import Dict, Any, Optional, Tuple
+
+from page_cache import PageCache, DEFAULT_CACHE_PATH
+from memory_guard import exclusive_process
+from serialization import dumps
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RFQ_PARSER_DIR = os.path.join(BASE_DIR, '..', 'meow', 'backend')
+
+_worker_cache: Optional[PageCache] = None
+_worker_pipelines: Tuple[str, ...] = ()
+
+
+def _init_worker(cache_path: str, pipelines: Tuple[str, ...]):
+    global _worker_cache, _worker_pipelines
+    _worker_cache = PageCache(cache_path)
+    _worker_pipelines = pipelines
+    exclusive_process()
+
+
+def rederive_document(doc: Tuple[str, Optional[str]]) -> Dict[str, Any]:
+    doc_hash, source_path = doc
+    record = {"doc_hash": doc_hash, "source_path": source_path, "errors": {}}
+
+    if 'tables' in _worker_pipelines:
+        from main import parse_pdf_file
+        report = {}
+        try:
+            record["line_items"] = parse_pdf_file(None, report=report, cache=_worker_cache, doc_hash=doc_hash)
+            record["extraction"] = report
+        except Exception as e:
+            record["errors"]["tables"] = str(e)
+
+    if 'rfq' in _worker_pipelines:
+        if RFQ_PARSER_DIR not in sys.path:
+            sys.path.append(RFQ_PARSER_DIR)
+        from rfq_parser import RFQParser
+        parser = RFQParser()
+        parser.parse_pdf(None, cache=_worker_cache, doc_hash=doc_hash)
+        if parser.extraction:
+            record["rfq"] = parser.to_json()
+        else:
+            record["errors"]["rfq"] = "not cached"
+
+    return record
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='page cache database')
+    ap.add_argument('--output', default='-', help='JSONL output file (default: stdout)')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--pipeline', choices=['tables', 'rfq', 'both'], default='both',
+                    help='tables = FastAPI line items, rfq = RFQParser document')
+    args = ap.parse_args(argv)
+
+    pipelines = ('tables', 'rfq') if args.pipeline == 'both' else (args.pipeline,)
+    docs = PageCache(args.cache).documents()
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    start = time.perf_counter()
+    failed = 0
+    try:
+        with Pool(args.workers, initializer=_init_worker, initargs=(args.cache, pipelines)) as pool:
+            for record in pool.imap_unordered(rederive_document, docs, chunksize=4):
+                failed += bool(record["errors"])
+                out.write(dumps(record).decode('utf-8') + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    rate = len(docs) / elapsed if elapsed > 0 else 0.0
+    print(f"Re-derived {len(docs)} documents ({failed} with errors) in {elapsed:.1f}s, {rate:.1f} docs/s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+JSON encoding shared by the API responses and the documents kept on disk.
+
+orjson is used when installed (several times faster than the json module on
+parse and match payloads, and it encodes straight to bytes); the json module
+is the fallback and produces the same compact JSON. Stored documents are
+written compact, and gzip-compressed when their path ends in ".gz".
+"""
+import os
+import gzip
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# gzip level for stored documents: most of level 9's ratio at a fraction of its cost
+COMPRESS_LEVEL = 5
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """Compact UTF-8 JSON (two-space indented with indent=True)"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    if indent:
+        return json.dumps(obj, default=_default, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def write_json(path: str, obj: Any):
+    """Writes obj to path atomically; gzip-compressed when path ends in .gz"""
+    data = dumps(obj)
+    if path.endswith('.gz'):
+        data = gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str) -> Any:
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.gz'):
+        data = gzip.decompress(data)
+    return loads(data)
+
+
+try:
+    from starlette.responses import JSONResponse
+except ImportError:
+    JSONResponse = None
+
+if JSONResponse is not None:
+    class FastJSONResponse(JSONResponse):
+        """
+        JSONResponse rendered with dumps(). Returning it directly from an
+        endpoint also skips FastAPI's jsonable_encoder pass over the payload.
+        """
+
+        def render(self, content: Any) -> bytes:
+            return dumps(content)
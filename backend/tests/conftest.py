@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The backend modules import each other by bare name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# RFQParser lives with the Flask service; batch_parse.py appends it the same way
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'meow', 'backend'))
@@ -0,0 +1,136 @@
+import asyncio
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from admission import AdmissionController, Rejected, client_key, document_cost
+from pdf_backend import page_count
+
+SAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', '..', 'uploads', '*.pdf')))
+
+
+def test_round_robin_between_clients():
+    controller = AdmissionController(capacity=10, queue_capacity=100, client_queue=10)
+    order = []
+
+    async def run():
+        async def parse(client, n):
+            async with controller.admit_async(client, 10):
+                order.append(f"{client}{n}")
+                await asyncio.sleep(0.01)
+
+        # a's burst is queued before b's single request
+        tasks = [asyncio.create_task(parse('a', n)) for n in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(parse('b', 0)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order[:3] == ['a0', 'a1', 'b0']
+
+
+def test_client_over_its_share_is_rejected_others_admitted():
+    controller = AdmissionController(capacity=1, queue_capacity=100, client_queue=2)
+    release = threading.Event()
+    with ThreadPoolExecutor(4) as pool:
+        def hold(client):
+            with controller.admit(client, 1):
+                release.wait(5)
+
+        running = pool.submit(hold, 'a')
+        queued = [pool.submit(hold, 'a') for _ in range(2)]
+        other = pool.submit(hold, 'b')
+        while controller.stats()['queued'] < 3:
+            pass
+        with pytest.raises(Rejected) as e:
+            with controller.admit('a', 1):
+                pass
+        assert e.value.retry_after >= 1
+        release.set()
+        for f in [running, other] + queued:
+            f.result(5)
+    stats = controller.stats()
+    assert stats['rejected_client'] == 1 and stats['admitted'] == 4
+    assert stats['running'] == 0 and stats['queued'] == 0
+
+
+def test_full_queue_rejects():
+    controller = AdmissionController(capacity=1, queue_capacity=5, client_queue=10)
+    with controller.admit('a', 1):
+        with pytest.raises(Rejected, match='queue is full'):
+            with controller.admit('b', 6):
+                pass
+
+
+def test_wait_times_out_and_frees_the_queue():
+    controller = AdmissionController(capacity=1, max_wait=0.05)
+    with controller.admit('a', 1):
+        with pytest.raises(Rejected, match='Timed out'):
+            with controller.admit('b', 1):
+                pass
+        assert controller.stats()['queued'] == 0
+    stats = controller.stats()
+    assert stats['timed_out'] == 1 and stats['running'] == 0
+
+
+def test_oversized_document_runs_alone():
+    controller = AdmissionController(capacity=10)
+    with controller.admit('a', 50):
+        assert controller.stats()['running'] == 1
+
+
+def test_document_costlier_than_the_queue_waits_its_turn():
+    controller = AdmissionController(capacity=2000, queue_capacity=8000)
+    order = []
+
+    async def run():
+        async def parse(client, cost):
+            async with controller.admit_async(client, cost):
+                order.append(client)
+                await asyncio.sleep(0.01)
+
+        small = asyncio.create_task(parse('small', 5))
+        await asyncio.sleep(0)
+        # 150 pages x 60 MB
+        await parse('large', 9000)
+        await small
+
+    asyncio.run(run())
+    assert order == ['small', 'large']
+    assert controller.stats()['rejected_full'] == 0
+
+
+def test_cancelled_waiter_gives_back_its_place():
+    controller = AdmissionController(capacity=1)
+
+    async def run():
+        async with controller.admit_async('a', 1):
+            waiter = asyncio.create_task(controller.admit_async('b', 1).__aenter__())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        async with controller.admit_async('c', 1):
+            pass
+
+    asyncio.run(run())
+    stats = controller.stats()
+    assert stats['abandoned'] == 1 and stats['running'] == 0 and stats['queued'] == 0
+
+
+def test_client_key_is_the_peer_address():
+    assert client_key('10.0.0.1') == '10.0.0.1'
+    assert client_key(None) == 'unknown'
+
+
+@pytest.mark.skipif(not SAMPLES, reason="no sample PDFs")
+def test_cost_estimates_are_safe_from_threads():
+    expected = page_count(SAMPLES[0])
+    with ThreadPoolExecutor(8) as pool:
+        counts = list(pool.map(page_count, SAMPLES[:1] * 64))
+        costs = set(pool.map(document_cost, SAMPLES[:1] * 16))
+    assert counts == [expected] * 64
+    assert costs == {max(1.0, expected * os.path.getsize(SAMPLES[0]) / (1024 * 1024))}
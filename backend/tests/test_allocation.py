@@ -0,0 +1,67 @@
+import random
+from itertools import combinations
+
+from allocation import Problem, solve, allocate
+
+
+def match(vendor_id, score, qty, product=None):
+    m = {'vendor_id': vendor_id, 'score': score, 'availableQty': qty}
+    if product:
+        m['product'] = product
+    return m
+
+
+def best_objective(problem, k):
+    vendors = range(len(problem.vendor_ids))
+    return max(problem.fill(set(c))[0] for n in range(1, k + 1) for c in combinations(vendors, n))
+
+
+def test_unrestricted_allocation_fills_from_the_best_vendor_first():
+    result = allocate([100], [[match('a', 9, 60), match('b', 5, 100)]])
+    allocations = result['items'][0]['allocations']
+    assert [(a['vendor_id'], a['allocatedQty']) for a in allocations] == [('a', 60), ('b', 40)]
+    assert result['items'][0]['unfilled'] == 0
+    assert result['items'][0]['score'] == round((9 * 60 + 5 * 40) / 100, 2)
+
+
+def test_stock_of_a_product_is_shared_between_items():
+    result = allocate([50, 50], [[match('a', 9, 60, 'x')], [match('a', 8, 60, 'x')]])
+    assert [i['unfilled'] for i in result['items']] == [0, 40]
+    assert result['solver']['fill_rate'] == 0.6
+
+
+def test_swap_improves_on_the_greedy_choice():
+    # 'wide' has the best single-vendor gain, but {a, b} covers both items better
+    candidates = [
+        [match('wide', 6, 100, 'x'), match('a', 10, 100)],
+        [match('wide', 6, 100, 'y'), match('b', 10, 100)],
+    ]
+    problem = Problem([100, 100], candidates)
+    selected, stats = solve(problem, max_vendors=2, time_budget=5)
+    assert {problem.vendor_ids[v] for v in selected} == {'a', 'b'}
+    assert stats['swaps'] == 1 and stats['greedy_objective'] == 8.0
+
+    result = allocate([100, 100], candidates, max_vendors=1, time_budget=5)
+    assert result['vendors'] == ['wide']
+
+
+def test_vendor_cap_is_respected_and_near_optimal():
+    rng = random.Random(3)
+    for _ in range(30):
+        vendors = [f"v{n}" for n in range(7)]
+        demands = [rng.randint(10, 200) for _ in range(5)]
+        candidates = [
+            [match(v, round(rng.uniform(1, 10), 2), rng.randint(0, 150)) for v in rng.sample(vendors, 4)]
+            for _ in demands
+        ]
+        problem = Problem(demands, candidates)
+        selected, _ = solve(problem, max_vendors=2, time_budget=5)
+        assert len(selected) <= 2
+        assert problem.fill(selected)[0] >= 0.95 * best_objective(problem, 2)
+        assert allocate(demands, candidates, max_vendors=2, time_budget=5)['solver']['vendors_used'] <= 2
+
+
+def test_items_without_demand_are_ignored():
+    result = allocate([0, 10], [[match('a', 9, 10)], [match('b', 7, 10)]], max_vendors=1)
+    assert result['items'][0] == {'allocations': [], 'unfilled': 0, 'score': None}
+    assert result['vendors'] == ['b']
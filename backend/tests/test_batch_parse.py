@@ -0,0 +1,21 @@
+import os
+
+import batch_parse
+
+
+def parse_or_die(path):
+    # An OOM kill takes the worker down without an exception
+    if path.endswith('oom.pdf'):
+        os._exit(137)
+    record = batch_parse._record(path)
+    record["pages"] = 1
+    return record
+
+
+def test_dead_worker_fails_only_its_document():
+    paths = [f"/docs/{n}.pdf" for n in range(6)] + ["/docs/oom.pdf"] + [f"/docs/{n}.pdf" for n in range(6, 12)]
+    records = list(batch_parse.parse_all(paths, 3, (None, (), {}), parse=parse_or_die))
+    assert sorted(r["path"] for r in records) == sorted(paths)
+    failed = [r["path"] for r in records if r["errors"]]
+    assert failed == ["/docs/oom.pdf"]
+    assert "died" in next(r for r in records if r["errors"])["errors"]["worker"]
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import time
+
+from file_janitor import FileJanitor
+
+
+def make_files(tmp_path, janitor, count, size=10, ttl=0.0):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"f{i:03d}.pdf"
+        path.write_bytes(b"x" * size)
+        janitor.track(str(path), ttl + i)
+        paths.append(str(path))
+    return paths
+
+
+def test_sweep_counts_rows_of_files_already_gone(tmp_path):
+    janitor = FileJanitor(str(tmp_path / 'manifest.sqlite3'), batch_size=3)
+    paths = make_files(tmp_path, janitor, 8)
+    for p in paths[:4]:
+        os.remove(p)
+    stats = janitor.sweep(now=time.time() + 100)
+    assert stats['expired'] == 8
+    assert stats['tracked'] == 0
+    assert not any(os.path.exists(p) for p in paths)
+
+
+def test_eviction_pages_past_files_already_gone(tmp_path):
+    # Rows whose file vanished used to shift the offset paging past live files
+    janitor = FileJanitor(str(tmp_path / 'manifest.sqlite3'), max_bytes=20, batch_size=2)
+    paths = make_files(tmp_path, janitor, 10, ttl=1000)
+    for p in paths[:3]:
+        os.remove(p)
+    stats = janitor.sweep()
+    assert stats['tracked_bytes'] <= 20
+    assert [os.path.exists(p) for p in paths] == [False] * 8 + [True] * 2
+
+
+def test_leased_files_are_neither_expired_nor_evicted(tmp_path):
+    janitor = FileJanitor(str(tmp_path / 'manifest.sqlite3'), max_bytes=10)
+    paths = make_files(tmp_path, janitor, 3)
+    with janitor.leased(paths[0]):
+        stats = janitor.sweep(now=time.time() + 100)
+        assert os.path.exists(paths[0])
+        assert stats['expired'] == 2 and stats['evicted'] == 0
+    janitor.sweep(now=time.time() + 100)
+    assert not os.path.exists(paths[0])
+
+
+def test_undeletable_files_are_skipped(tmp_path, monkeypatch):
+    janitor = FileJanitor(str(tmp_path / 'manifest.sqlite3'), batch_size=1)
+    paths = make_files(tmp_path, janitor, 3)
+    real_remove = os.remove
+
+    def remove(path):
+        if path == paths[0]:
+            raise PermissionError(path)
+        real_remove(path)
+
+    monkeypatch.setattr(os, 'remove', remove)
+    stats = janitor.sweep(now=time.time() + 100)
+    assert stats['expired'] == 2 and stats['tracked'] == 1
+    assert os.path.exists(paths[0])
+
+
+def test_old_manifest_gains_lease_column(tmp_path):
+    path = str(tmp_path / 'manifest.sqlite3')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                     "expires_at REAL NOT NULL, added_at REAL NOT NULL)")
+    FileJanitor(path).sweep()
+
+
+def test_one_janitor_per_manifest_sweeps(tmp_path):
+    path = str(tmp_path / 'manifest.sqlite3')
+    first, second = FileJanitor(path), FileJanitor(path)
+    assert first.leader()
+    assert not second.leader()
+    first.start(interval=3600)
+    first.stop()
+    assert second.leader()
+    second.stop()
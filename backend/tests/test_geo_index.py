@@ -0,0 +1,48 @@
+import random
+
+from geo_index import GeoIndex, Delivery, haversine_km, make_delivery
+
+
+def vendor(lat=None, lon=None, countries=(), radius=None):
+    v = {'countries_served': list(countries)}
+    if lat is not None:
+        v['latitude'], v['longitude'] = lat, lon
+    if radius is not None:
+        v['service_radius_km'] = radius
+    return v
+
+
+def test_reach_wraps_around_the_antimeridian():
+    vendors = [vendor(-17.8, 179.9, ['fiji']), vendor(-17.8, -179.9, ['fiji']), vendor(-17.8, 170.0, ['fiji'])]
+    index = GeoIndex.build(vendors)
+    east = index.reach(Delivery(-17.8, 179.5))
+    west = index.reach(Delivery(-17.8, -179.5))
+    assert set(east) == set(west) == {0, 1}
+    assert west[0] == haversine_km(-17.8, -179.5, -17.8, 179.9)
+
+
+def test_reach_matches_brute_force():
+    rng = random.Random(7)
+    vendors = [vendor(rng.uniform(-85, 85), rng.uniform(-180, 180), radius=rng.choice([100, 300, 1500]))
+               for _ in range(400)]
+    index = GeoIndex.build(vendors)
+    for _ in range(300):
+        lat, lon = rng.uniform(-89, 89), rng.choice([rng.uniform(-180, 180), rng.uniform(178, 180)])
+        expected = {i for i, v in enumerate(vendors)
+                    if haversine_km(lat, lon, v['latitude'], v['longitude']) <= v['service_radius_km']}
+        assert set(index.reach(Delivery(lat, lon))) == expected
+
+
+def test_unlocated_vendors_qualify_by_country():
+    vendors = [vendor(countries=['Lebanon']), vendor(countries=['Jordan']), vendor(countries=['Global']), vendor()]
+    index = GeoIndex.build(vendors)
+    assert index.reach(make_delivery(location='Beirut, Lebanon')) == {0: None, 2: None, 3: None}
+    assert set(index.reach(Delivery())) == {0, 1, 2, 3}
+
+
+def test_local_only_keeps_nearby_and_home_country_vendors():
+    vendors = [vendor(33.9, 35.5, ['lebanon'], radius=1000), vendor(31.9, 35.9, ['jordan'], radius=1000),
+               vendor(countries=['lebanon', 'syria']), vendor(countries=['syria', 'lebanon']), vendor(countries=['global'])]
+    index = GeoIndex.build(vendors)
+    assert set(index.reach(Delivery(33.89, 35.5, 'lebanon'))) == {0, 1, 2, 3, 4}
+    assert set(index.reach(Delivery(33.89, 35.5, 'lebanon', local_only=True))) == {0, 2}
@@ -0,0 +1,63 @@
+from match_cache import MatchCache, match_key
+from match_session import CandidateTable
+from matcher import item_candidates, match_item, merge_weights
+
+
+def vendor(vendor_id, available_qty, landed_cost=10):
+    return {
+        'vendor_id': vendor_id,
+        'legal_name': vendor_id,
+        'primary_categories': ['Pharmaceuticals'],
+        'availableQty': available_qty,
+        'landedCost': landed_cost,
+    }
+
+
+def ranked(table, vendors, preferences, qty, k=5):
+    w = merge_weights(preferences)
+    weighed = table.weigh(w) if table.needs_weights() else None
+    return table.matches(vendors, w, weighed, qty, k)
+
+
+def test_key_ignores_quantity_and_preferences():
+    a = match_key({'inn_name': 'Amoxicillin 500mg', 'quantity': 600}, 1)
+    b = match_key({'inn_name': 'amoxicillin  500MG', 'quantity': 1023}, 1)
+    assert a == b
+    assert match_key({'inn_name': 'Amoxicillin'}, 1) != match_key({'inn_name': 'Amoxicillin'}, 2)
+    assert match_key({'inn_name': 'A'}, 1, by_name=False) == match_key({'inn_name': 'B'}, 1, by_name=False)
+
+
+def test_cached_table_ranks_at_the_item_quantity():
+    vendors = [vendor('A', 600), vendor('B', 1000)]
+    table = CandidateTable(item_candidates({'inn_name': 'x'}, vendors), vendors, None)
+
+    at_1000 = ranked(table, vendors, ['quantity'], 1000)
+    assert [m['vendor_id'] for m in at_1000] == ['B', 'A']
+    assert at_1000[0]['score'] > at_1000[1]['score']
+    for qty in (1, 512, 600, 1000, 1023, 5000):
+        expected = match_item({'inn_name': 'x', 'quantity': qty}, vendors, ['quantity'])
+        assert ranked(table, vendors, ['quantity'], qty) == expected
+
+
+def test_large_table_matches_exhaustive_ranking():
+    vendors = [vendor(f'V{i}', (i * 37) % 2000, landed_cost=(i * 13) % 90) for i in range(300)]
+    table = CandidateTable(item_candidates({'inn_name': 'x'}, vendors), vendors, None)
+    assert table.needs_weights()
+    for preferences in ([], ['quantity'], ['resource-saving', 'time']):
+        for qty in (10, 700, 1500):
+            expected = match_item({'inn_name': 'x', 'quantity': qty}, vendors, preferences, limit=10)
+            assert ranked(table, vendors, preferences, qty, k=10) == expected
+
+
+def test_cache_evicts_least_recently_used():
+    cache = MatchCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    cache.invalidate(5)
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['index_version'] == 5
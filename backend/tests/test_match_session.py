@@ -0,0 +1,76 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from geo_index import GeoIndex, Delivery
+from match_session import CandidateTable, MatchSession, SessionStore, EXHAUSTIVE_ROWS
+from matcher import PRESET_WEIGHTS, item_candidates, match_item, merge_weights
+from name_index import NameIndex
+
+PREFERENCES = [[]] + [list(c) for n in (1, 2) for c in combinations(sorted(PRESET_WEIGHTS), n)]
+
+
+def make_vendors(n, rng, catalogue=False):
+    vendors = []
+    for i in range(n):
+        v = {
+            'vendor_id': f"v{i}",
+            'legal_name': f"Vendor {i}",
+            'primary_categories': [rng.choice(['Pharmaceuticals', 'Medical Supplies', 'Logistics'])],
+            'countries_served': ['lebanon'],
+            'latitude': rng.uniform(33, 34.5), 'longitude': rng.uniform(35, 36.5),
+            'availableQty': rng.choice([50, 200, 1000, 5000]),
+            'landedCost': round(rng.uniform(1, 80), 2),
+            'deliveryDays': rng.randint(1, 20),
+            'confidence_score': rng.randint(40, 100),
+        }
+        if catalogue and rng.random() < 0.7:
+            v['products'] = [{'name': rng.choice(['Amoxicillin 500 mg caps', 'Amoxicilin 250mg tab',
+                                                  'Paracetamol 500 mg tab', 'Ibuprofen 200 mg tab']),
+                              'availableQty': rng.choice([10, 300, 3000]),
+                              'landedCost': round(rng.uniform(1, 40), 2)}]
+        vendors.append(v)
+    return vendors
+
+
+@pytest.mark.parametrize('qty', [1, 120, 1000, 4000])
+def test_threshold_walk_ranks_like_match_item(qty):
+    rng = random.Random(qty)
+    vendors = make_vendors(400, rng)
+    item = {'inn_name': 'Amoxicillin 500 mg', 'quantity': qty}
+    table = CandidateTable(item_candidates(item, vendors), vendors, None)
+    assert table.needs_weights() and len(table.rows) > EXHAUSTIVE_ROWS
+    for preferences in PREFERENCES:
+        w = merge_weights(preferences)
+        for k in (1, 5, 20):
+            assert table.matches(vendors, w, table.weigh(w), qty, k) == match_item(item, vendors, preferences, limit=k)
+
+
+def test_session_rescore_matches_match_item():
+    rng = random.Random(11)
+    vendors = make_vendors(300, rng, catalogue=True)
+    name_index = NameIndex.build(vendors)
+    reach = GeoIndex.build(vendors).reach(Delivery(33.9, 35.5))
+    items = [{'inn_name': name, 'quantity': q} for name, q in
+             [('Amoxicillin 500mg capsules', 100), ('Paracetamol tablets', 2000),
+              ('Amoxicillin 500mg capsules', 5), ('Unknown product', 10)]]
+    session = MatchSession(items, [i['quantity'] for i in items], vendors, name_index, reach, version=1)
+    assert len(session.tables) == 3
+    for preferences in PREFERENCES:
+        assert session.rescore(preferences, 5) == [
+            match_item(item, vendors, preferences, name_index=name_index, reach=reach) for item in items
+        ]
+
+
+def test_session_store_evicts_oldest_and_expires(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('match_session.time.monotonic', lambda: now[0])
+    store = SessionStore(max_sessions=2, ttl=10)
+    first, second = store.create('a'), store.create('b')
+    assert store.get(first) == 'a'
+    third = store.create('c')
+    assert store.get(second) is None and store.get(first) == 'a'
+    now[0] = 11
+    assert store.get(third) is None
+    assert store.delete(first) is True and store.delete(first) is False
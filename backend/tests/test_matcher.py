@@ -0,0 +1,29 @@
+from matcher import item_candidates, match_item
+from name_index import NameIndex
+
+
+def vendor(vendor_id, products=None, category='Pharmaceuticals', **fields):
+    v = {'vendor_id': vendor_id, 'legal_name': vendor_id, 'primary_categories': [category], **fields}
+    if products is not None:
+        v['products'] = products
+    return v
+
+
+VENDORS = [
+    vendor('A', [{'name': 'Paracetamol 500 mg tablet', 'landedCost': 10}]),
+    vendor('B'),
+    vendor('C', [{'name': 'Ibuprofen 200 mg tablet'}]),
+    vendor('D', category='Logistics'),
+]
+
+
+def test_catalogue_hit_ranks_above_uncatalogued_vendors():
+    index = NameIndex.build(VENDORS)
+    matches = match_item({'inn_name': 'Paracetamol 500mg capsule', 'quantity': 100}, VENDORS, [], name_index=index)
+    assert [m['vendor_id'] for m in matches] == ['A']
+    assert matches[0]['nameMatch'] == 0.9
+
+
+def test_without_name_index_every_eligible_vendor_is_a_candidate():
+    assert [i for i, _, _ in item_candidates({'inn_name': 'Paracetamol'}, VENDORS)] == [0, 1, 2]
+    assert [i for i, _, _ in item_candidates({'inn_name': 'Paracetamol'}, VENDORS, reach={2: 1.0, 3: 2.0})] == [2]
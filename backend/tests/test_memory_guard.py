@@ -0,0 +1,32 @@
+import pytest
+
+import memory_guard
+from memory_guard import MemoryGuard, MemoryLimitExceeded
+
+
+def grow(guard, mb):
+    ballast = bytearray(mb * memory_guard.MB)
+    ballast[::4096] = b'x' * len(ballast[::4096])
+    guard.check(1)
+    return ballast
+
+
+def test_limit_enforced_in_single_parse_process():
+    guard = MemoryGuard(limit_mb=8, enforce=True)
+    with pytest.raises(MemoryLimitExceeded) as e:
+        grow(guard, 32)
+    assert e.value.page_number == 1 and e.value.used_mb > 8
+
+
+def test_shared_process_reports_without_raising(monkeypatch):
+    monkeypatch.setattr(memory_guard, '_EXCLUSIVE', False)
+    guard = MemoryGuard(limit_mb=8)
+    grow(guard, 32)
+    report = guard.report()
+    assert report['limit_mb'] is None and report['peak_delta_mb'] > 8
+
+
+def test_exclusive_process_turns_enforcement_on(monkeypatch):
+    monkeypatch.setattr(memory_guard, '_EXCLUSIVE', False)
+    memory_guard.exclusive_process()
+    assert MemoryGuard(limit_mb=8).enforce
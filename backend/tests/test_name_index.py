@@ -0,0 +1,69 @@
+import random
+
+from name_index import NameIndex, parse_name
+from matcher import item_candidates, match_item, NAME_CANDIDATES
+
+
+def vendor(vendor_id, products=None, categories=('Pharmaceuticals',)):
+    v = {'vendor_id': vendor_id, 'legal_name': vendor_id, 'primary_categories': list(categories)}
+    if products is not None:
+        v['products'] = products
+    return v
+
+
+def test_parse_name_splits_form_and_strength():
+    parsed = parse_name("Amiodarone 150 mg/3ml amp")
+    assert parsed.key == 'amiodarone'
+    assert parsed.form == 'ampoule'
+    assert parsed.strength == '150mg/3ml'
+    assert parse_name("Albendazole Oral suspension") == ('albendazole', 'suspension', None)
+
+
+def test_prefix_filtered_search_equals_brute_force():
+    rng = random.Random(7)
+    stems = ['amoxicillin', 'amoxiclav', 'albendazole', 'amiodarone', 'paracetamol', 'ibuprofen', 'metformin']
+    forms = ['tablet', 'capsule', 'syrup', 'injection', '']
+    vendors = [
+        vendor(f'V{i}', [f"{rng.choice(stems)} {rng.choice([250, 500])}mg {rng.choice(forms)}" for _ in range(5)])
+        for i in range(200)
+    ]
+    index = NameIndex.build(vendors)
+    for query in ['Amoxicillin 500mg tablets', 'amoxycilin', 'Paracetamol syrup', 'metformin 250 mg', 'xyz']:
+        for threshold in (0.3, 0.5, 0.8):
+            assert index.search(query, k=20, min_similarity=threshold) == \
+                index.search_brute_force(query, k=20, min_similarity=threshold)
+
+
+def test_search_restricted_to_vendor_set():
+    vendors = [vendor(f'V{i}', ['Paracetamol 500mg tablet']) for i in range(5)]
+    index = NameIndex.build(vendors)
+    assert [v for _, v, _ in index.search('paracetamol', vendors={1, 3})] == [1, 3]
+
+
+def test_vendors_without_catalogue_are_the_fallback():
+    vendors = [
+        vendor('cat', ['Paracetamol 500mg tablet']),
+        vendor('plain'),
+        vendor('plain-other-category', categories=('Logistics',)),
+        vendor('other-product', ['Ibuprofen 200mg tablet']),
+    ]
+    index = NameIndex.build(vendors)
+    assert index.uncatalogued == [1, 2]
+    candidates = item_candidates({'inn_name': 'Paracetamol 500mg'}, vendors, index)
+    assert [(i, sim is None) for i, _, sim in candidates] == [(0, False)]
+
+    matches = match_item({'inn_name': 'Unlisted drug', 'quantity': 10}, vendors, [], name_index=index)
+    assert [m['vendor_id'] for m in matches] == ['plain']
+
+    reach = {1: 12.0, 3: 40.0}
+    assert [i for i, _, _ in item_candidates({'inn_name': 'Paracetamol'}, vendors, index, reach)] == [1]
+
+
+def test_eligibility_applied_before_the_candidate_cut():
+    # Exact-name vendors outside the matching categories must not crowd out an eligible one
+    vendors = [vendor(f'X{i}', ['Paracetamol 500mg tablet'], categories=('Logistics',))
+               for i in range(NAME_CANDIDATES + 10)]
+    vendors.append(vendor('eligible', ['Paracetamol 500mg capsule']))
+    index = NameIndex.build(vendors)
+    candidates = item_candidates({'inn_name': 'Paracetamol 500mg tablet'}, vendors, index)
+    assert [vendors[i]['vendor_id'] for i, _, _ in candidates] == ['eligible']
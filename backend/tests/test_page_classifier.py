@@ -0,0 +1,47 @@
+from page_classifier import classify, summarize_pages
+
+SCHEDULE = """Schedule of Requirements
+Item No Description Qty Unit of issue
+1 Amoxicillin 500 mg capsules 1000 box"""
+
+ITEM_ROWS = """1. Paracetamol 500 mg tablet
+2. Ibuprofen 200 mg tablet
+3. Amoxicillin 250 mg capsule"""
+
+COVER_LETTER = """Dear Sir or Madam,
+You are invited to submit a sealed bid for the supply of medicines.
+1. Bids must be received before the deadline."""
+
+
+def never_called():
+    raise AssertionError("text fetched for a page rejected by its features")
+
+
+def test_page_without_ruling_is_skipped_before_reading_text():
+    assert classify(3, 500, never_called) == (False, 'no_ruling')
+
+
+def test_scanned_page_is_skipped():
+    assert classify(20, 0, never_called) == (False, 'no_text_layer')
+
+
+def test_table_header_keeps_page():
+    assert classify(20, len(SCHEDULE), lambda: SCHEDULE) == (True, 'header')
+
+
+def test_numbered_rows_with_dosages_keep_page():
+    assert classify(20, len(ITEM_ROWS), lambda: ITEM_ROWS) == (True, 'item_rows')
+
+
+def test_ruled_boilerplate_is_skipped():
+    assert classify(20, len(COVER_LETTER), lambda: COVER_LETTER) == (False, 'boilerplate')
+    assert classify(20, 10, lambda: None) == (False, 'boilerplate')
+
+
+def test_summarize_pages():
+    pages = [{}, {"skip_reason": "no_ruling"}, {"skip_reason": "no_ruling"}, {"skip_reason": "boilerplate"}]
+    assert summarize_pages(pages) == {
+        "pages_total": 4, "pages_scanned": 1, "pages_skipped": 3, "skip_rate": 0.75,
+        "skip_reasons": {"no_ruling": 2, "boilerplate": 1},
+    }
+    assert summarize_pages([])["skip_rate"] == 0.0
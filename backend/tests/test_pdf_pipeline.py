@@ -0,0 +1,93 @@
+import glob
+import os
+
+import pytest
+
+import pdf_backend
+from pdf_backend import PDFBackend, Consumer, run_pipeline
+
+SAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', '..', 'uploads', '*.pdf')))
+
+
+class FakeBackend(PDFBackend):
+    supports_tables = True
+    calls = []
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def extract_pages(self, file_path, tables=True, prefilter=True, page_numbers=None, guard=None):
+        self.calls.append((self.name, tables))
+        return [{"page_number": 1, "text": f"{self.name} text", "tables": [[["a"]]] if tables else None,
+                 "skip_reason": None, "features": None}]
+
+
+class FastBackend(FakeBackend):
+    name = 'fast'
+
+
+class TextBackend(FakeBackend):
+    name = 'text'
+    supports_tables = False
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    FakeBackend.calls = []
+    monkeypatch.setitem(pdf_backend.BACKENDS, 'fast', FastBackend)
+    monkeypatch.setitem(pdf_backend.BACKENDS, 'text', TextBackend)
+    return FakeBackend.calls
+
+
+def texts(pages):
+    return [p["text"] for p in pages]
+
+
+def test_each_backend_decodes_once_for_all_consumers(backends):
+    consumers = [
+        Consumer('tables', lambda pages: [p["tables"] for p in pages], ['fast'], tables=True),
+        Consumer('rfq', texts, ['fast', 'text']),
+    ]
+    outputs = run_pipeline('doc.pdf', consumers)
+    assert backends == [('fast', True)]
+    assert outputs['rfq'][0] == ['fast text']
+    assert outputs['rfq'][2]['backend'] == 'fast'
+
+
+def test_text_consumer_skips_table_extraction(backends):
+    run_pipeline('doc.pdf', [Consumer('rfq', texts, ['fast'])])
+    assert backends == [('fast', False)]
+
+
+def test_fallback_only_when_result_rejected(backends):
+    accept_text = lambda result: result == ['text text']
+    outputs = run_pipeline('doc.pdf', [Consumer('rfq', texts, ['fast', 'text'], accept_text)])
+    assert [name for name, _ in backends] == ['fast', 'text']
+    result, _, report = outputs['rfq']
+    assert result == ['text text'] and report['backend'] == 'text' and report['fallback']
+
+
+def test_errors_reported_without_raising(backends):
+    def broken(pages):
+        raise ValueError("no rows")
+
+    outputs = run_pipeline('doc.pdf', [Consumer('rfq', broken, ['text'])], raise_errors=False)
+    result, pages, report = outputs['rfq']
+    assert result is None and pages == []
+    assert report['error'] == 'no rows'
+    with pytest.raises(ValueError):
+        run_pipeline('doc.pdf', [Consumer('rfq', broken, ['text'])])
+
+
+@pytest.mark.skipif(not SAMPLES or not pdf_backend.PyMuPDFBackend.available(), reason="needs PyMuPDF and sample PDFs")
+def test_sample_rfq_decoded_once_for_tables_and_fields():
+    from line_items import table_consumer
+    from rfq_parser import RFQParser
+
+    parser = RFQParser()
+    outputs = run_pipeline(SAMPLES[0], [table_consumer(), parser.consumer()])
+    assert outputs['tables'][2]['timings'].keys() == {'pymupdf'}
+    assert outputs['rfq'][2]['timings'].keys() == {'pymupdf'}
+    items = parser.from_pipeline(outputs['rfq'])['line_items']
+    assert RFQParser._line_items_complete(items)
@@ -1,38 +1,63 @@
 """
 EASEMED RFQ Parser API - Flask backend
 Provides endpoints for PDF upload, parsing, and data extraction
+(asgi_app.py serves the same API for production)
 """
 
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import os
-import json
 from datetime import datetime
+from contextlib import contextmanager
 import uuid
 from werkzeug.utils import secure_filename
-from rfq_parser import RFQParser
+from rfq_service import (
+    UPLOAD_FOLDER, MAX_CONTENT_LENGTH, MEDICINE_HEADERS, registry, DocumentStore, allowed_file,
+    register_upload, parse_upload, parse_amended_upload, amendment_response, requirements_table,
+    metadata_response, medicines_csv, document_list, start_background, admission, janitor, upload_cost,
+)
+# backend/ modules (on sys.path once rfq_service is imported)
+from page_cache import file_hash
+from serialization import dumps, loads
+from admission import Rejected, client_key
+from memory_guard import MemoryLimitExceeded
+
+
+class FastJSONProvider(JSONProvider):
+    """jsonify() through serialization.dumps (orjson when installed)"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
-# Configuration
-UPLOAD_FOLDER = '../uploads'
-EXTRACTED_FOLDER = '../extracted_data'
-ALLOWED_EXTENSIONS = {'pdf'}
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-if not os.path.exists(EXTRACTED_FOLDER):
-    os.makedirs(EXTRACTED_FOLDER)
+# Parsed documents (in memory, persisted under extracted_data/)
+parsed_documents = DocumentStore()
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+start_background()
 
-# In-memory store of parsed documents
-parsed_documents = {}
+def busy(e: Rejected):
+    return jsonify({'error': e.reason}), 429, {'Retry-After': str(e.retry_after)}
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+@contextmanager
+def parse_slot(upload):
+    """
+    Blocks this request thread until admission control grants the parse a
+    slot; the janitor leaves the upload alone until the parse is done
+    """
+    client = client_key(request.remote_addr)
+    with janitor.leased(upload['path']), admission.admit(client, upload_cost(upload)):
+        yield
 
 @app.route('/api/health', methods=['GET'])
 def health():
@@ -48,23 +73,24 @@ def upload_pdf():
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
-        
+
         file = request.files['file']
-        
+
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
-        
+
         if not allowed_file(file.filename):
             return jsonify({'error': 'Only PDF files allowed'}), 400
-        
+
         # Generate unique document ID
         doc_id = str(uuid.uuid4())
         filename = secure_filename(f"{doc_id}_{file.filename}")
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
+        filepath = os.path.join(registry.shard_dir(doc_id), filename)
+
         # Save file
         file.save(filepath)
-        
+        register_upload(doc_id, filepath, file_hash(filepath))
+
         return jsonify({
             'status': 'uploaded',
             'document_id': doc_id,
@@ -72,7 +98,7 @@ def upload_pdf():
             'filepath': filepath,
             'timestamp': datetime.now().isoformat()
         }), 200
-    
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -84,54 +110,88 @@ def parse_document(document_id):
     """
     try:
         # Find the uploaded file
-        files = os.listdir(app.config['UPLOAD_FOLDER'])
-        pdf_path = None
-        
-        for f in files:
-            if f.startswith(document_id):
-                pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f)
-                break
-        
-        if not pdf_path:
+        upload = registry.get(document_id)
+        if not upload:
             return jsonify({'error': 'Document not found'}), 404
-        
-        # Parse PDF
-        parser = RFQParser()
-        extracted_data = parser.parse_pdf(pdf_path)
-        
+
+        # Parse PDF (the hash recorded at upload spares re-reading the file)
+        with parse_slot(upload):
+            extracted_data = parse_upload(upload['path'], upload['hash'])
+
         # Store parsed data
-        parsed_documents[document_id] = extracted_data
-        
-        # Save to file
-        output_path = os.path.join(EXTRACTED_FOLDER, f"{document_id}_extracted.json")
-        with open(output_path, 'w') as f:
-            json.dump(extracted_data, f, indent=2)
-        
+        parsed_documents.save(document_id, extracted_data)
+
         return jsonify({
             'status': 'parsed',
             'document_id': document_id,
             'data': extracted_data,
             'extracted_at': datetime.now().isoformat()
         }), 200
-    
+
+    except Rejected as e:
+        return busy(e)
+
+    except MemoryLimitExceeded as e:
+        return jsonify({'error': str(e)}), 413
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/parse/<document_id>/amend', methods=['POST'])
+def parse_amendment(document_id):
+    """
+    Parse an uploaded amendment of a previously parsed RFQ
+    Query: previous=<document_id of the parsed version>
+    Only pages that changed since that version are extracted again.
+    Returns: JSON with the new data, the changed pages and a diff of
+    metadata, line items and requirements
+    """
+    try:
+        previous_id = request.args.get('previous')
+        if not previous_id:
+            return jsonify({'error': 'Previous document_id required'}), 400
+
+        previous = parsed_documents.get(previous_id)
+        if previous is None:
+            return jsonify({'error': 'Previous document not found'}), 404
+        previous_hash = previous.get('extraction', {}).get('document_hash')
+        if not previous_hash:
+            return jsonify({'error': 'Previous document was parsed without the page cache'}), 409
+
+        upload = registry.get(document_id)
+        if not upload:
+            return jsonify({'error': 'Document not found'}), 404
+
+        with parse_slot(upload):
+            extracted_data, amendment = parse_amended_upload(upload['path'], previous_hash, upload['hash'])
+        parsed_documents.save(document_id, extracted_data)
+
+        return jsonify(amendment_response(document_id, previous_id, previous, extracted_data, amendment)), 200
+
+    except Rejected as e:
+        return busy(e)
+
+    except MemoryLimitExceeded as e:
+        return jsonify({'error': str(e)}), 413
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/metrics/admission', methods=['GET'])
+def admission_metrics():
+    """Parse admission: running and queued cost, rejections and queue wait percentiles"""
+    return jsonify(admission.stats()), 200
+
 @app.route('/api/document/<document_id>', methods=['GET'])
 def get_document(document_id):
     """Retrieve parsed document data"""
     try:
-        if document_id not in parsed_documents:
-            # Try to load from file
-            json_path = os.path.join(EXTRACTED_FOLDER, f"{document_id}_extracted.json")
-            if os.path.exists(json_path):
-                with open(json_path, 'r') as f:
-                    parsed_documents[document_id] = json.load(f)
-            else:
-                return jsonify({'error': 'Document not found'}), 404
-        
-        return jsonify(parsed_documents[document_id]), 200
-    
+        doc = parsed_documents.get(document_id)
+        if doc is None:
+            return jsonify({'error': 'Document not found'}), 404
+
+        return jsonify(doc), 200
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -139,68 +199,18 @@ def get_document(document_id):
 def get_vendor_requirements(document_id):
     """Get vendor requirements in table format"""
     try:
-        if document_id not in parsed_documents:
+        doc = parsed_documents.get(document_id)
+        if doc is None:
             return jsonify({'error': 'Document not found'}), 404
-        
-        doc = parsed_documents[document_id]
-        vendor_reqs = doc['vendor_requirements']
-        
-        # Convert to table format
-        requirements_table = []
-        
-        # Legal requirements
-        for req in vendor_reqs.get('legal_requirements', []):
-            requirements_table.append({
-                'category': 'Legal',
-                'requirement': req.replace('_', ' ').title(),
-                'mandatory': True
-            })
-        
-        # Technical requirements
-        for req in vendor_reqs.get('technical_requirements', []):
-            if isinstance(req, dict):
-                requirements_table.append({
-                    'category': 'Technical',
-                    'requirement': req.get('type', '').replace('_', ' ').title(),
-                    'value': req.get('value') or req.get('count'),
-                    'mandatory': True
-                })
-            else:
-                requirements_table.append({
-                    'category': 'Technical',
-                    'requirement': req.replace('_', ' ').title(),
-                    'mandatory': True
-                })
-        
-        # Financial requirements
-        for req in vendor_reqs.get('financial_requirements', []):
-            if isinstance(req, dict):
-                requirements_table.append({
-                    'category': 'Financial',
-                    'requirement': f"{req.get('percentage')}% within {req.get('days')} days",
-                    'mandatory': True
-                })
-            else:
-                requirements_table.append({
-                    'category': 'Financial',
-                    'requirement': req.replace('_', ' ').title(),
-                    'mandatory': True
-                })
-        
-        # Mandatory documents
-        for doc_req in vendor_reqs.get('mandatory_documents', []):
-            requirements_table.append({
-                'category': 'Document',
-                'requirement': doc_req.replace('_', ' ').title(),
-                'mandatory': True
-            })
-        
+
+        requirements = requirements_table(doc['vendor_requirements'])
+
         return jsonify({
             'document_id': document_id,
-            'requirements': requirements_table,
-            'total': len(requirements_table)
+            'requirements': requirements,
+            'total': len(requirements)
         }), 200
-    
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -208,28 +218,19 @@ def get_vendor_requirements(document_id):
 def get_medicines_table(document_id):
     """Get medicines/line items in table format"""
     try:
-        if document_id not in parsed_documents:
+        doc = parsed_documents.get(document_id)
+        if doc is None:
             return jsonify({'error': 'Document not found'}), 404
-        
-        doc = parsed_documents[document_id]
+
         line_items = doc['line_items']
-        
+
         return jsonify({
             'document_id': document_id,
             'medicines': line_items,
             'total': len(line_items),
-            'headers': [
-                'Item No',
-                'INN Name',
-                'Dosage',
-                'Form',
-                'Quantity',
-                'Unit of Issue',
-                'Brand Allowed',
-                'Generic Allowed'
-            ]
+            'headers': MEDICINE_HEADERS
         }), 200
-    
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -237,19 +238,12 @@ def get_medicines_table(document_id):
 def get_metadata(document_id):
     """Get RFQ metadata"""
     try:
-        if document_id not in parsed_documents:
+        doc = parsed_documents.get(document_id)
+        if doc is None:
             return jsonify({'error': 'Document not found'}), 404
-        
-        doc = parsed_documents[document_id]
-        
-        return jsonify({
-            'document_id': document_id,
-            'metadata': doc['metadata'],
-            'delivery_requirements': doc['delivery_requirements'],
-            'evaluation_criteria': doc['evaluation_criteria'],
-            'summary': doc['summary']
-        }), 200
-    
+
+        return jsonify(metadata_response(document_id, doc)), 200
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -257,20 +251,19 @@ def get_metadata(document_id):
 def export_json(document_id):
     """Export complete parsed data as JSON file"""
     try:
-        if document_id not in parsed_documents:
+        doc = parsed_documents.get(document_id)
+        if doc is None:
             return jsonify({'error': 'Document not found'}), 404
-        
-        doc = parsed_documents[document_id]
-        
+
         # Add export timestamp
         export_data = {
             **doc,
             'export_timestamp': datetime.now().isoformat()
         }
-        
+
         # Create response with JSON data
         response = app.response_class(
-            response=json.dumps(export_data, indent=2),
+            response=dumps(export_data, indent=True),
             status=200,
             mimetype='application/json',
             headers={
@@ -279,7 +272,7 @@ def export_json(document_id):
             }
         )
         return response
-    
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -287,36 +280,13 @@ def export_json(document_id):
 def export_csv(document_id):
     """Export medicines as CSV format"""
     try:
-        if document_id not in parsed_documents:
+        doc = parsed_documents.get(document_id)
+        if doc is None:
             return jsonify({'error': 'Document not found'}), 404
-        
-        doc = parsed_documents[document_id]
-        line_items = doc['line_items']
-        
-        # Build CSV content
-        csv_content = []
-        headers = ['Item No', 'INN Name', 'Dosage', 'Form', 'Quantity', 'Brand Name', 'Brand Allowed', 'Generic Allowed', 'Unit of Issue']
-        csv_content.append(','.join([f'"{h}"' for h in headers]))
-        
-        for item in line_items:
-            row = [
-                str(item.get('line_item_id', '')),
-                item.get('inn_name', '').replace('"', '""'),
-                item.get('dosage', '').replace('"', '""'),
-                item.get('form', ''),
-                str(item.get('quantity', 0)),
-                item.get('brand_name', '').replace('"', '""'),
-                str(item.get('brand_allowed', 'True')),
-                str(item.get('generic_allowed', 'True')),
-                item.get('unit_of_issue', '')
-            ]
-            csv_content.append(','.join([f'"{field}"' for field in row]))
-        
-        csv_text = '\n'.join(csv_content)
-        
+
         # Create response with CSV data
         response = app.response_class(
-            response=csv_text,
+            response=medicines_csv(doc['line_items']),
             status=200,
             mimetype='text/csv',
             headers={
@@ -325,7 +295,7 @@ def export_csv(document_id):
             }
         )
         return response
-    
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -333,22 +303,8 @@ def export_csv(document_id):
 def list_documents():
     """List all parsed documents"""
     try:
-        doc_list = []
-        
-        for doc_id, doc_data in parsed_documents.items():
-            doc_list.append({
-                'document_id': doc_id,
-                'rfq_id': doc_data.get('metadata', {}).get('rfq_id'),
-                'issuer_org': doc_data.get('metadata', {}).get('issuer_org'),
-                'total_line_items': doc_data.get('summary', {}).get('total_line_items'),
-                'extracted_at': doc_data.get('extracted_at')
-            })
-        
-        return jsonify({
-            'total_documents': len(doc_list),
-            'documents': doc_list
-        }), 200
-    
+        return jsonify(document_list(parsed_documents)), 200
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,315 @@
+"""
+EASEMED RFQ Parser API - ASGI backend
+Same endpoints and responses as the Flask app (app.py), served by uvicorn
+workers: reads never wait behind a parse, and RFQParser runs on a bounded
+process pool so concurrent parses do not contend for the GIL
+Run: gunicorn -c gunicorn.conf.py asgi_app:app
+"""
+
+import os
+import uuid
+import asyncio
+import hashlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any
+
+from fastapi import FastAPI, UploadFile, File, Request
+from fastapi.responses import JSONResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
+from werkzeug.utils import secure_filename
+
+from rfq_service import (
+    MAX_CONTENT_LENGTH, MEDICINE_HEADERS, registry, DocumentStore, allowed_file, register_upload,
+    parse_upload, parse_amended_upload, amendment_response, requirements_table, metadata_response,
+    medicines_csv, document_list, start_background, janitor, admission, upload_cost,
+)
+from admission import Rejected, client_key
+from memory_guard import MemoryLimitExceeded, exclusive_process
+from serialization import FastJSONResponse, dumps
+
+# Parses running at once per server process; further requests wait for a worker
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', '0')) or os.cpu_count() or 1
+UPLOAD_CHUNK = 1 << 20
+
+app = FastAPI(default_response_class=FastJSONResponse)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Parsed documents (in memory, persisted under extracted_data/)
+parsed_documents = DocumentStore()
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def error(message: str, status: int, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({'error': message}, status_code=status, headers=headers)
+
+
+async def run_parse(request: Request, upload: Dict[str, Any], fn, *args):
+    """
+    Runs a parse function on the worker pool once admission control grants a
+    slot; raises Rejected. The janitor leaves the upload alone meanwhile.
+    """
+    client = client_key(request.client.host if request.client else None)
+    await asyncio.to_thread(janitor.lease, upload['path'])
+    try:
+        cost = await asyncio.to_thread(upload_cost, upload)
+        async with admission.admit_async(client, cost):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_PARSE_POOL, fn, *args)
+    finally:
+        await asyncio.to_thread(janitor.release, upload['path'])
+
+
+def busy(e: Rejected) -> JSONResponse:
+    return error(e.reason, 429, {'Retry-After': str(e.retry_after)})
+
+
+async def load_document(document_id: str) -> Optional[Dict[str, Any]]:
+    # Memory hit without leaving the event loop; disk reads on a thread
+    doc = parsed_documents.cached(document_id)
+    if doc is None:
+        doc = await asyncio.to_thread(parsed_documents.get, document_id)
+    return doc
+
+
+@app.on_event("startup")
+def startup():
+    global _PARSE_POOL
+    start_background()
+    # Forked workers inherit the page cache and parser modules already imported
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    _PARSE_POOL = ProcessPoolExecutor(PARSE_WORKERS, mp_context=context, initializer=exclusive_process)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    if _PARSE_POOL is not None:
+        _PARSE_POOL.shutdown(wait=False, cancel_futures=True)
+    janitor.stop()
+
+
+@app.get('/api/health')
+async def health():
+    """Health check endpoint"""
+    return {'status': 'ok', 'service': 'EASEMED RFQ Parser'}
+
+
+@app.post('/api/upload')
+async def upload_pdf(file: UploadFile = File(None)):
+    """
+    Upload RFQ PDF for parsing
+    Returns: document_id for tracking
+    """
+    try:
+        if file is None:
+            return error('No file provided', 400)
+
+        if not file.filename:
+            return error('No file selected', 400)
+
+        if not allowed_file(file.filename):
+            return error('Only PDF files allowed', 400)
+
+        # Generate unique document ID
+        doc_id = str(uuid.uuid4())
+        filename = secure_filename(f"{doc_id}_{file.filename}")
+        filepath = os.path.join(registry.shard_dir(doc_id), filename)
+
+        # Stream to disk, hashing on the way so the file is not read twice
+        h, size = hashlib.sha256(), 0
+        with open(filepath, 'wb') as out:
+            while chunk := await file.read(UPLOAD_CHUNK):
+                size += len(chunk)
+                if size > MAX_CONTENT_LENGTH:
+                    break
+                h.update(chunk)
+                out.write(chunk)
+        if size > MAX_CONTENT_LENGTH:
+            os.remove(filepath)
+            return error('File too large', 413)
+        await asyncio.to_thread(register_upload, doc_id, filepath, h.hexdigest())
+
+        return {
+            'status': 'uploaded',
+            'document_id': doc_id,
+            'filename': file.filename,
+            'filepath': filepath,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.post('/api/parse/{document_id}')
+async def parse_document(document_id: str, request: Request):
+    """
+    Parse uploaded PDF and extract RFQ data
+    Returns: JSON with all extracted data
+    """
+    try:
+        upload = await asyncio.to_thread(registry.get, document_id)
+        if not upload:
+            return error('Document not found', 404)
+
+        extracted_data = await run_parse(request, upload, parse_upload, upload['path'], upload['hash'])
+        await asyncio.to_thread(parsed_documents.save, document_id, extracted_data)
+
+        # Returned as a response so the payload skips jsonable_encoder
+        return FastJSONResponse({
+            'status': 'parsed',
+            'document_id': document_id,
+            'data': extracted_data,
+            'extracted_at': datetime.now().isoformat()
+        })
+
+    except Rejected as e:
+        return busy(e)
+
+    except MemoryLimitExceeded as e:
+        return error(str(e), 413)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.post('/api/parse/{document_id}/amend')
+async def parse_amendment(document_id: str, request: Request, previous: Optional[str] = None):
+    """
+    Parse an uploaded amendment of a previously parsed RFQ
+    Query: previous=<document_id of the parsed version>
+    """
+    try:
+        if not previous:
+            return error('Previous document_id required', 400)
+
+        previous_doc = await load_document(previous)
+        if previous_doc is None:
+            return error('Previous document not found', 404)
+        previous_hash = previous_doc.get('extraction', {}).get('document_hash')
+        if not previous_hash:
+            return error('Previous document was parsed without the page cache', 409)
+
+        upload = await asyncio.to_thread(registry.get, document_id)
+        if not upload:
+            return error('Document not found', 404)
+
+        extracted_data, amendment = await run_parse(request, upload, parse_amended_upload, upload['path'],
+                                                    previous_hash, upload['hash'])
+        await asyncio.to_thread(parsed_documents.save, document_id, extracted_data)
+
+        return FastJSONResponse(amendment_response(document_id, previous, previous_doc, extracted_data, amendment))
+
+    except Rejected as e:
+        return busy(e)
+
+    except MemoryLimitExceeded as e:
+        return error(str(e), 413)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.get('/api/metrics/admission')
+async def admission_metrics():
+    """Parse admission: running and queued cost, rejections and queue wait percentiles"""
+    return admission.stats()
+
+
+@app.get('/api/document/{document_id}')
+async def get_document(document_id: str):
+    """Retrieve parsed document data"""
+    doc = await load_document(document_id)
+    if doc is None:
+        return error('Document not found', 404)
+    return FastJSONResponse(doc)
+
+
+@app.get('/api/document/{document_id}/requirements')
+async def get_vendor_requirements(document_id: str):
+    """Get vendor requirements in table format"""
+    doc = await load_document(document_id)
+    if doc is None:
+        return error('Document not found', 404)
+
+    requirements = requirements_table(doc['vendor_requirements'])
+    return {
+        'document_id': document_id,
+        'requirements': requirements,
+        'total': len(requirements)
+    }
+
+
+@app.get('/api/document/{document_id}/medicines')
+async def get_medicines_table(document_id: str):
+    """Get medicines/line items in table format"""
+    doc = await load_document(document_id)
+    if doc is None:
+        return error('Document not found', 404)
+
+    line_items = doc['line_items']
+    return FastJSONResponse({
+        'document_id': document_id,
+        'medicines': line_items,
+        'total': len(line_items),
+        'headers': MEDICINE_HEADERS
+    })
+
+
+@app.get('/api/document/{document_id}/metadata')
+async def get_metadata(document_id: str):
+    """Get RFQ metadata"""
+    doc = await load_document(document_id)
+    if doc is None:
+        return error('Document not found', 404)
+    return metadata_response(document_id, doc)
+
+
+@app.get('/api/document/{document_id}/export/json')
+async def export_json(document_id: str):
+    """Export complete parsed data as JSON file"""
+    doc = await load_document(document_id)
+    if doc is None:
+        return error('Document not found', 404)
+
+    export_data = {
+        **doc,
+        'export_timestamp': datetime.now().isoformat()
+    }
+    return Response(
+        dumps(export_data, indent=True),
+        media_type='application/json',
+        headers={'Content-Disposition': f'attachment; filename=rfq-{document_id[:8]}.json'}
+    )
+
+
+@app.get('/api/document/{document_id}/export/csv')
+async def export_csv(document_id: str):
+    """Export medicines as CSV format"""
+    doc = await load_document(document_id)
+    if doc is None:
+        return error('Document not found', 404)
+
+    return Response(
+        medicines_csv(doc['line_items']),
+        media_type='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=medicines-{document_id[:8]}.csv'}
+    )
+
+
+@app.get('/api/documents')
+async def list_documents():
+    """List all parsed documents"""
+    return document_list(parsed_documents)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5001)
@@ -0,0 +1,113 @@
+"""
+Document Registry - Maps uploaded document ids to their stored PDF
+Keeps an in-memory map backed by a small SQLite index, and lays uploads out in
+sharded subdirectories so no single directory grows unbounded
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT,
+    uploaded_at TEXT NOT NULL
+);
+"""
+
+# Two levels of 256 shards: 65536 directories before any one of them fills up
+SHARD_LEVELS = 2
+
+UUID_PREFIX = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+class DocumentRegistry:
+    def __init__(self, path: str, upload_folder: str):
+        self.path = path
+        self.upload_folder = upload_folder
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            rows = conn.execute("SELECT document_id, path, size, hash FROM documents").fetchall()
+        self._documents: Dict[str, Dict[str, Any]] = {
+            r[0]: {'path': r[1], 'size': r[2], 'hash': r[3]} for r in rows
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def shard_dir(self, document_id: str) -> str:
+        """Upload directory of a document id, e.g. uploads/4a/7b/ (created on demand)"""
+        key = document_id.replace('-', '')
+        parts = [key[2 * i:2 * i + 2] for i in range(SHARD_LEVELS)]
+        directory = os.path.join(self.upload_folder, *parts)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def register(self, document_id: str, path: str, file_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Records a stored upload; returns its entry"""
+        entry = {'path': path, 'size': os.path.getsize(path), 'hash': file_hash}
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (document_id, path, size, hash, uploaded_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (document_id, path, entry['size'], file_hash, datetime.now().isoformat())
+                )
+            self._documents[document_id] = entry
+        return entry
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Entry {path, size, hash} of a document whose file still exists, else None"""
+        entry = self._documents.get(document_id)
+        if entry is None:
+            # Registered by another worker process since this one started
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT path, size, hash FROM documents WHERE document_id = ?", (document_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            entry = {'path': row[0], 'size': row[1], 'hash': row[2]}
+            with self._lock:
+                self._documents[document_id] = entry
+        if not os.path.exists(entry['path']):
+            # Expired and removed by the janitor
+            self.remove(document_id)
+            return None
+        return entry
+
+    def remove(self, document_id: str):
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+            self._documents.pop(document_id, None)
+
+    def adopt_flat_uploads(self) -> int:
+        """
+        Registers uploads saved directly in the upload folder as
+        "<document_id>_<filename>" before the registry existed (one scan at
+        startup). Their hash is computed by the page cache on first parse.
+        """
+        now = datetime.now().isoformat()
+        rows = []
+        for entry in os.scandir(self.upload_folder):
+            match = UUID_PREFIX.match(entry.name)
+            if entry.is_file() and match and match.group(0) not in self._documents:
+                rows.append((match.group(0), entry.path, entry.stat().st_size, None, now))
+        with self._lock:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO documents (document_id, path, size, hash, uploaded_at) "
+                    "VALUES (?, ?, ?, ?, ?)", rows
+                )
+            for document_id, path, size, _, _ in rows:
+                self._documents[document_id] = {'path': path, 'size': size, 'hash': None}
+        return len(rows)
@@ -0,0 +1,21 @@
+"""
+Production server for the ASGI parser service:
+    gunicorn -c gunicorn.conf.py asgi_app:app
+Each uvicorn worker handles requests concurrently and runs parses on its own
+pool of PARSE_WORKERS processes; size WEB_CONCURRENCY x PARSE_WORKERS to the cores.
+"""
+
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+# Large RFQs can take a while to parse on a busy pool
+timeout = int(os.environ.get('WORKER_TIMEOUT', '180'))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically to bound memory growth from PDF decoding
+max_requests = 1000
+max_requests_jitter = 100
+accesslog = '-'
+errorlog = '-'
@@ -3,11 +3,21 @@ RFQ PDF Parser - Extracts structured data from Request for Quotation PDFs
 Handles medicines/requirements tables, eligibility rules, and vendor requirements
 """
 
+import os
 import re
+import sys
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
-import PyPDF2
+
+# The PDF backends are shared with the FastAPI service in /backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend'))
+from pdf_backend import run_pipeline, Consumer, TEXT_BACKENDS
+from memory_guard import MemoryLimitExceeded
+
+# Share of item numbers 1..N that must be present before a backend's text
+# layout is trusted; a scrambled reading order leaves gaps in the numbering.
+MIN_ITEM_NUMBER_COVERAGE = 0.9
 
 
 class RFQParser:
@@ -18,30 +28,72 @@ class RFQParser:
         self.line_items = []
         self.delivery_requirements = {}
         self.evaluation_criteria = {}
-        
-    def parse_pdf(self, pdf_path: str) -> Dict[str, Any]:
-        """Main parse function - extract all RFQ data"""
-        self.text = self._extract_text_from_pdf(pdf_path)
-        
+        self.extraction = {}
+        
+    def parse_pdf(self, pdf_path: Optional[str], backends: Optional[List[str]] = None,
+                  cache=None, doc_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Main parse function - extract all RFQ data
+        With a PageCache only uncached pages are decoded; pdf_path may then be
+        None to re-run the rules over the cached text of doc_hash.
+        """
+        self.text = self._extract_text_from_pdf(pdf_path, backends, cache, doc_hash)
+        return self._apply_rules()
+    
+    def consumer(self, backends: Optional[List[str]] = None) -> Consumer:
+        """
+        This parser's stage of the shared parse pipeline (pdf_backend.run_pipeline):
+        page text -> (text, line items). Backends are tried in order until one
+        yields a complete set of line items (see TEXT_BACKENDS).
+        """
+        self.text = ""
+        self.line_items = []
+        self.extraction = {}
+        return Consumer('rfq', self._line_items_from_pages, backends or TEXT_BACKENDS,
+                        lambda result: self._line_items_complete(result[1]))
+    
+    def from_pipeline(self, output: Tuple[Any, List[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """Finishes a parse from this parser's run_pipeline output (result, pages, report)"""
+        result, _, self.extraction = output
+        self.text, self.line_items = result or ("", [])
+        return self._apply_rules()
+    
+    def _apply_rules(self) -> Dict[str, Any]:
         self.metadata = self._extract_metadata()
         self.vendor_requirements = self._extract_vendor_requirements()
-        self.line_items = self._extract_line_items()
+        if not self.line_items:
+            self.line_items = self._extract_line_items(self.text)
         self.delivery_requirements = self._extract_delivery_requirements()
         self.evaluation_criteria = self._extract_evaluation_criteria()
         
         return self.to_json()
     
-    def _extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract raw text from PDF"""
-        text = ""
+    def _extract_text_from_pdf(self, pdf_path: Optional[str], backends: Optional[List[str]] = None,
+                               cache=None, doc_hash: Optional[str] = None) -> str:
+        """Extract raw text from PDF through the shared parse pipeline"""
+        consumer = self.consumer(backends)
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+            result, _, self.extraction = run_pipeline(
+                pdf_path, [consumer], cache=cache, doc_hash=doc_hash
+            )['rfq']
+            self.text, self.line_items = result
+        except MemoryLimitExceeded:
+            # Not a broken PDF: the caller reports it instead of an empty parse
+            raise
         except Exception as e:
             print(f"Error reading PDF: {e}")
-        return text
+        return self.text
+
+    def _line_items_from_pages(self, pages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        text = "".join(page["text"] + "\n" for page in pages)
+        return text, self._extract_line_items(text)
+
+    @staticmethod
+    def _line_items_complete(items: List[Dict[str, Any]]) -> bool:
+        if not items:
+            return False
+        numbers = {item['line_item_id'] for item in items if item['line_item_id'] <= len(items)}
+        return len(numbers) >= MIN_ITEM_NUMBER_COVERAGE * len(items)
     
     def _extract_metadata(self) -> Dict[str, Any]:
         """Extract RFQ metadata: ID, dates, org, currency, etc."""
@@ -188,7 +240,7 @@ class RFQParser:
         
         return requirements
     
-    def _extract_line_items(self) -> List[Dict[str, Any]]:
+    def _extract_line_items(self, text: str) -> List[Dict[str, Any]]:
         """Extract medicines/requirements table (line items) - Enhanced for complex tables"""
         line_items = []
         
@@ -203,7 +255,7 @@ class RFQParser:
         
         table_start = -1
         for marker in table_markers:
-            pos = self.text.find(marker)
+            pos = text.find(marker)
             if pos != -1:
                 table_start = pos
                 break
@@ -212,7 +264,7 @@ class RFQParser:
             return line_items
         
         # Extract large section after table start
-        table_section = self.text[table_start:table_start + 30000]
+        table_section = text[table_start:table_start + 30000]
         
         # Parse using improved multi-pass approach
         line_items = self._parse_medicine_table_multipass(table_section)
@@ -452,6 +504,7 @@ class RFQParser:
             'line_items': self.line_items,
             'delivery_requirements': self.delivery_requirements,
             'evaluation_criteria': self.evaluation_criteria,
+            'extraction': self.extraction,
             'extracted_at': datetime.now().isoformat(),
             'summary': {
                 'total_line_items': len(self.line_items),
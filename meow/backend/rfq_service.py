@@ -0,0 +1,261 @@
+"""
+EASEMED RFQ Parser - Service layer shared by the Flask (app.py) and ASGI
+(asgi_app.py) servers: storage locations, upload registry, parsed-document
+store and the response builders both APIs return
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from rfq_parser import RFQParser
+from page_cache import PageCache
+from amendment import prepare_amendment, diff_fields, diff_line_items, items_to_rematch
+from file_janitor import FileJanitor
+from document_registry import DocumentRegistry
+from admission import AdmissionController, document_cost
+from serialization import write_json, read_json
+
+# Configuration
+UPLOAD_FOLDER = '../uploads'
+EXTRACTED_FOLDER = '../extracted_data'
+ALLOWED_EXTENSIONS = {'pdf'}
+MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
+# Retention of uploaded PDFs and extracted JSON (seconds)
+UPLOAD_TTL = int(os.environ.get('UPLOAD_TTL', str(24 * 3600)))
+EXTRACTED_TTL = int(os.environ.get('EXTRACTED_TTL', str(7 * 24 * 3600)))
+# Store extracted JSON gzip-compressed (<id>_extracted.json.gz)
+EXTRACTED_COMPRESS = os.environ.get('EXTRACTED_COMPRESS', '0') == '1'
+
+if not os.path.exists(UPLOAD_FOLDER):
+    os.makedirs(UPLOAD_FOLDER)
+if not os.path.exists(EXTRACTED_FOLDER):
+    os.makedirs(EXTRACTED_FOLDER)
+
+# Per-page extraction cache shared with the FastAPI service
+page_cache = PageCache()
+
+# Document id -> stored upload (path, size, hash); uploads are sharded by id
+registry = DocumentRegistry('../document_registry.sqlite3', UPLOAD_FOLDER)
+
+# Periodic cleanup of uploads/ and extracted_data/ under the shared disk cap,
+# and of the page cache's copies of their contents
+janitor = FileJanitor(page_cache=page_cache)
+
+# Bounds the parses running and waiting in this server process by estimated cost
+admission = AdmissionController()
+
+MEDICINE_HEADERS = [
+    'Item No', 'INN Name', 'Dosage', 'Form', 'Quantity', 'Unit of Issue', 'Brand Allowed', 'Generic Allowed'
+]
+CSV_HEADERS = [
+    'Item No', 'INN Name', 'Dosage', 'Form', 'Quantity', 'Brand Name', 'Brand Allowed', 'Generic Allowed',
+    'Unit of Issue'
+]
+
+
+def start_background():
+    """
+    Starts the janitor; the process that wins its lock (one per host, see
+    file_janitor.py) first adopts uploads/extracted JSON stored before a restart
+    """
+    if janitor.leader():
+        registry.adopt_flat_uploads()
+        janitor.adopt(UPLOAD_FOLDER, UPLOAD_TTL)
+        janitor.adopt(EXTRACTED_FOLDER, EXTRACTED_TTL)
+    janitor.start()
+
+
+def allowed_file(filename: str) -> bool:
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def register_upload(doc_id: str, filepath: str, file_hash: str) -> Dict[str, Any]:
+    entry = registry.register(doc_id, filepath, file_hash)
+    janitor.track(filepath, UPLOAD_TTL)
+    return entry
+
+
+def upload_cost(upload: Dict[str, Any]) -> float:
+    """Admission cost of a registered upload"""
+    return document_cost(upload['path'], upload['size'])
+
+
+def parse_upload(pdf_path: str, doc_hash: Optional[str] = None) -> Dict[str, Any]:
+    """RFQParser over a stored upload; safe to run in a worker process"""
+    return RFQParser().parse_pdf(pdf_path, cache=page_cache, doc_hash=doc_hash)
+
+
+def parse_amended_upload(pdf_path: str, previous_hash: str,
+                         doc_hash: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Seeds the page cache from the previous version, then parses; returns (data, amendment report)"""
+    amendment = prepare_amendment(page_cache, pdf_path, previous_hash, doc_hash=doc_hash)
+    return parse_upload(pdf_path, amendment['document_hash']), amendment
+
+
+class DocumentStore:
+    """
+    Parsed documents in memory, persisted as compact JSON in
+    extracted_data/<id>_extracted.json (.json.gz when compressed)
+    """
+
+    def __init__(self, folder: str = EXTRACTED_FOLDER, compress: bool = EXTRACTED_COMPRESS):
+        self.folder = folder
+        self.compress = compress
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, document_id: str, compressed: bool) -> str:
+        suffix = '.json.gz' if compressed else '.json'
+        return os.path.join(self.folder, f"{document_id}_extracted{suffix}")
+
+    def cached(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """In-memory lookup only (no disk access)"""
+        return self._documents.get(document_id)
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Parsed document, loaded from disk when another process or run parsed it"""
+        doc = self._documents.get(document_id)
+        if doc is None:
+            # Either format may be on disk if EXTRACTED_COMPRESS changed since
+            for compressed in (self.compress, not self.compress):
+                json_path = self._path(document_id, compressed)
+                if os.path.exists(json_path):
+                    break
+            else:
+                return None
+            doc = read_json(json_path)
+            with self._lock:
+                self._documents[document_id] = doc
+        return doc
+
+    def save(self, document_id: str, data: Dict[str, Any]):
+        with self._lock:
+            self._documents[document_id] = data
+        output_path = self._path(document_id, self.compress)
+        write_json(output_path, data)
+        janitor.track(output_path, EXTRACTED_TTL)
+
+    def items(self):
+        return list(self._documents.items())
+
+
+def amendment_response(document_id: str, previous_id: str, previous: Dict[str, Any],
+                       extracted_data: Dict[str, Any], amendment: Dict[str, Any]) -> Dict[str, Any]:
+    line_items = diff_line_items(previous.get('line_items', []), extracted_data['line_items'])
+    return {
+        'status': 'parsed',
+        'document_id': document_id,
+        'previous_document_id': previous_id,
+        'data': extracted_data,
+        'amendment': amendment,
+        'diff': {
+            'metadata': diff_fields(previous.get('metadata'), extracted_data['metadata']),
+            'line_items': line_items,
+            'vendor_requirements': diff_fields(previous.get('vendor_requirements'),
+                                               extracted_data['vendor_requirements']),
+            'delivery_requirements': diff_fields(previous.get('delivery_requirements'),
+                                                 extracted_data['delivery_requirements']),
+            'evaluation_criteria': diff_fields(previous.get('evaluation_criteria'),
+                                               extracted_data['evaluation_criteria']),
+        },
+        'rematch_items': items_to_rematch(line_items),
+        'extracted_at': datetime.now().isoformat()
+    }
+
+
+def requirements_table(vendor_reqs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Vendor requirements flattened to table rows"""
+    requirements_table = []
+
+    # Legal requirements
+    for req in vendor_reqs.get('legal_requirements', []):
+        requirements_table.append({
+            'category': 'Legal',
+            'requirement': req.replace('_', ' ').title(),
+            'mandatory': True
+        })
+
+    # Technical requirements
+    for req in vendor_reqs.get('technical_requirements', []):
+        if isinstance(req, dict):
+            requirements_table.append({
+                'category': 'Technical',
+                'requirement': req.get('type', '').replace('_', ' ').title(),
+                'value': req.get('value') or req.get('count'),
+                'mandatory': True
+            })
+        else:
+            requirements_table.append({
+                'category': 'Technical',
+                'requirement': req.replace('_', ' ').title(),
+                'mandatory': True
+            })
+
+    # Financial requirements
+    for req in vendor_reqs.get('financial_requirements', []):
+        if isinstance(req, dict):
+            requirements_table.append({
+                'category': 'Financial',
+                'requirement': f"{req.get('percentage')}% within {req.get('days')} days",
+                'mandatory': True
+            })
+        else:
+            requirements_table.append({
+                'category': 'Financial',
+                'requirement': req.replace('_', ' ').title(),
+                'mandatory': True
+            })
+
+    # Mandatory documents
+    for doc_req in vendor_reqs.get('mandatory_documents', []):
+        requirements_table.append({
+            'category': 'Document',
+            'requirement': doc_req.replace('_', ' ').title(),
+            'mandatory': True
+        })
+
+    return requirements_table
+
+
+def metadata_response(document_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'document_id': document_id,
+        'metadata': doc['metadata'],
+        'delivery_requirements': doc['delivery_requirements'],
+        'evaluation_criteria': doc['evaluation_criteria'],
+        'summary': doc['summary']
+    }
+
+
+def medicines_csv(line_items: List[Dict[str, Any]]) -> str:
+    csv_content = [','.join([f'"{h}"' for h in CSV_HEADERS])]
+    for item in line_items:
+        row = [
+            str(item.get('line_item_id', '')),
+            item.get('inn_name', '').replace('"', '""'),
+            item.get('dosage', '').replace('"', '""'),
+            item.get('form', ''),
+            str(item.get('quantity', 0)),
+            item.get('brand_name', '').replace('"', '""'),
+            str(item.get('brand_allowed', 'True')),
+            str(item.get('generic_allowed', 'True')),
+            item.get('unit_of_issue', '')
+        ]
+        csv_content.append(','.join([f'"{field}"' for field in row]))
+    return '\n'.join(csv_content)
+
+
+def document_list(store: DocumentStore) -> Dict[str, Any]:
+    doc_list = [
+        {
+            'document_id': doc_id,
+            'rfq_id': doc_data.get('metadata', {}).get('rfq_id'),
+            'issuer_org': doc_data.get('metadata', {}).get('issuer_org'),
+            'total_line_items': doc_data.get('summary', {}).get('total_line_items'),
+            'extracted_at': doc_data.get('extracted_at')
+        }
+        for doc_id, doc_data in store.items()
+    ]
+    return {'total_documents': len(doc_list), 'documents': doc_list}